@@ -1,12 +1,18 @@
 # app.py - Complete Court Data Fetcher Flask Application
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
-import asyncio
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, send_file, Response
 import json
 import os
 import logging
 from datetime import datetime
-from scraper import fetch_case_data
-from database import init_db, log_query, get_recent_queries, search_cases, get_database_stats, get_query_by_id
+from runtime import run_db, run_scrape, get_scrape_queue
+from response_cache import case_cache, case_etag, CASE_CACHE_MAX_AGE
+from maintenance import start_background_maintenance
+import notifications
+import orders
+import order_index
+from courts import available_courts, get_court
+from database import init_db, get_recent_queries, get_database_stats, get_query_by_id, get_queries_by_ids, get_current_case, get_current_cases, get_case_history
+import json_codec
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,75 +24,192 @@ app = Flask(__name__,
             static_url_path='/static',
             template_folder='templates')
 
+# Upper bound on case keys (or query ids) accepted by /api/cases in one request
+API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', '1000'))
+
 # Secret key for session management and flash messages
-app.secret_key = 'court_data_fetcher_secret_key_2025_change_in_production'
-
-# Enable debug mode for development
-app.config['DEBUG'] = True
-
-# Updated case types specifically for Delhi High Court
-CASE_TYPES = [
-    ("W.P.(C)", "Writ Petition (Civil)"),
-    ("W.P.(CRL)", "Writ Petition (Criminal)"),
-    ("CRL.A.", "Criminal Appeal"),
-    ("CRL.M.C.", "Criminal Miscellaneous Case"),
-    ("CRL.REV.P.", "Criminal Revision Petition"),
-    ("C.M.", "Civil Miscellaneous"),
-    ("C.S.(OS)", "Civil Suit (Original Side)"),
-    ("C.S.(COMM)", "Civil Suit (Commercial)"),
-    ("FAO(OS)", "First Appeal from Original Side"),
-    ("FAO(COMM)", "First Appeal (Commercial)"),
-    ("RFA", "Regular First Appeal"),
-    ("ARB.A.", "Arbitration Appeal"),
-    ("ARB.P.", "Arbitration Petition"),
-    ("COMP.CAS(IB)", "Company Case (Insolvency & Bankruptcy)"),
-    ("C.P.", "Company Petition"),
-    ("MAT.APP.", "Mat Appeal"),
-    ("L.P.A.", "Letters Patent Appeal"),
-    ("C.O.", "Contempt of Court"),
-    ("BAIL APPLN.", "Bail Application"),
-    ("EA", "Execution Application"),
-    ("EC", "Execution Case"),
-    ("EP", "Election Petition"),
-    ("EXE", "Execution"),
-    ("GA", "General Application"),
-    ("MA", "Miscellaneous Application"),
-    ("O", "Original"),
-    ("P", "Petition"),
-    ("SA", "Second Appeal"),
-    ("U", "Under")
-]
+app.secret_key = os.environ.get('SECRET_KEY', 'court_data_fetcher_secret_key_2025_change_in_production')
+
+# Debug mode is opt-in (FLASK_DEBUG=1); production servers must never run with it on
+app.config['DEBUG'] = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+# Maintenance, order downloads, indexing and notifications run on threads in each
+# worker; BACKGROUND_TASKS=0 leaves them to the CLI tools (or turns them off for benchmarks)
+app.config['BACKGROUND_TASKS'] = os.environ.get('BACKGROUND_TASKS', '1') != '0'
+
+def order_links(case_orders):
+    """Orders in the shape results.html expects, linking to our cached copies."""
+    return [{
+        'date': order['order_date'],
+        'description': order['description'],
+        'pdf_link': url_for('order_document', order_id=order['id']),
+    } for order in case_orders]
+
+def case_page_kind(digest):
+    """Cache kind of a results page; pages carry the case's orders, so their state is part of the key."""
+    return f'html:{digest}'
+
+def cache_case_page(row, case_orders=()):
+    """Render results.html for a stored successful query row and cache it by query id and orders."""
+    data = row.get('parsed_data')
+    if data is None:
+        data = json.loads(row['parsed_data_json'])
+    if case_orders:
+        data = dict(data, orders=order_links(case_orders))
+    case_info = {
+        'court': row['court'],
+        'court_name': court_name(row['court']),
+        'case_type': row['case_type'],
+        'case_number': row['case_number'],
+        'case_year': row['case_year'],
+        'query_id': row['id'],
+        'source': 'database',
+        'timestamp': row['timestamp']
+    }
+    body = render_template('results.html', data=data, case_info=case_info)
+    kind = case_page_kind(orders.orders_digest(case_orders))
+    return case_cache.set(kind, row['id'], body, case_etag(row, kind), 'text/html')
+
+def court_name(code):
+    try:
+        return get_court(code).name
+    except KeyError:
+        return code
+
+def cached_response(entry, conditional=True, revalidate=False):
+    """Build a response from a cache entry, answering If-None-Match with 304.
+
+    ``revalidate`` is for pages that change when new orders arrive: clients
+    must check the ETag on every use instead of keeping them for max-age.
+    """
+    response = Response(entry.body, mimetype=entry.mimetype)
+    if conditional:
+        response.set_etag(entry.etag)
+        response.cache_control.public = True
+        if revalidate:
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.max_age = CASE_CACHE_MAX_AGE
+        response.make_conditional(request)
+    return response
+
+def case_document(row):
+    """JSON-ready representation of a stored query row."""
+    data = None
+    if row.get('parsed_data_json'):
+        try:
+            data = json_codec.loads(row['parsed_data_json'])
+        except json_codec.JSONDecodeError:
+            data = None
+    return {
+        'id': row['id'],
+        'timestamp': row['timestamp'],
+        'court': row['court'],
+        'case_type': row['case_type'],
+        'case_number': row['case_number'],
+        'case_year': row['case_year'],
+        'was_successful': bool(row['was_successful']),
+        'error_message': row['error_message'],
+        'data': data
+    }
+
+def parse_fields(value):
+    """Split a ``fields=`` parameter into a tuple; empty means everything."""
+    if not value:
+        return ()
+    return tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+
+def project_document(doc, fields):
+    """Keep only the requested fields; names not at the top level select from ``data``."""
+    if not fields:
+        return doc
+    projected = {'id': doc['id']}
+    data = doc.get('data') or {}
+    picked = {}
+    for field in fields:
+        if field in doc:
+            projected[field] = doc[field]
+        elif field in data:
+            picked[field] = data[field]
+    if picked:
+        projected['data'] = picked
+    return projected
+
+def parse_case_key(value):
+    """``[court:]case_type/case_number/case_year`` -> (court, case_type, case_number, case_year).
+
+    The court defaults to the registry's default.  Raises ValueError for a
+    malformed key and KeyError for an unknown court.
+    """
+    court, sep, rest = value.partition(':')
+    if not sep:
+        court, rest = None, value
+    parts = [part.strip() for part in rest.rsplit('/', 2)]
+    if len(parts) != 3 or not all(parts):
+        raise ValueError(f'Case keys look like W.P.(C)/1234/2024 or delhi_hc:W.P.(C)/1234/2024, got {value!r}')
+    return (get_court(court or None).code, *parts)
+
+def format_case_key(key):
+    court, case_type, case_number, case_year = key
+    return f'{court}:{case_type}/{case_number}/{case_year}'
+
+def json_response(payload, status=200):
+    return Response(json_codec.dumps_bytes(payload), status=status, mimetype='application/json')
+
+@app.before_request
+def ensure_background_tasks():
+    """Start per-process background work lazily, after any worker fork."""
+    if not app.config['BACKGROUND_TASKS']:
+        return
+    start_background_maintenance()
+    notifications.start_background_dispatch()
+    orders.start_background_fetch()
+    order_index.start_background_indexing()
+
+def selected_court(code):
+    """Adapter for a court chosen in the UI, falling back to the default court."""
+    try:
+        return get_court(code)
+    except KeyError:
+        return get_court()
 
 @app.route('/')
-def index():
+async def index():
     """Renders the main page with the search form and recent queries."""
     try:
         logger.info("Loading home page")
+        court = selected_court(request.args.get('court'))
         
         # Get recent queries for dashboard
-        recent_queries = get_recent_queries(10)
+        recent_queries = await run_db(get_recent_queries, 10)
         
         # Get database statistics
-        stats = get_database_stats()
+        stats = await run_db(get_database_stats)
         
         logger.info(f"Loaded {len(recent_queries)} recent queries and stats: {stats}")
         
         return render_template('index.html', 
-                             case_types=CASE_TYPES, 
+                             court=court,
+                             courts=available_courts(),
+                             case_types=court.case_types, 
                              recent_queries=recent_queries,
                              stats=stats)
     except Exception as e:
         logger.error(f"Error loading index page: {e}")
+        court = get_court()
         return render_template('index.html', 
-                             case_types=CASE_TYPES, 
+                             court=court,
+                             courts=available_courts(),
+                             case_types=court.case_types, 
                              recent_queries=[],
                              stats={})
 
 @app.route('/search', methods=['POST'])
-def search():
+async def search():
     """Handles the form submission, runs the scraper, and shows results."""
     try:
         # Get form data
+        court_code = request.form.get('court') or None
         case_type = request.form.get('case_type')
         case_number = request.form.get('case_number')
         case_year = request.form.get('case_year')
@@ -97,7 +220,16 @@ def search():
         # Enhanced validation
         if not all([case_type, case_number, case_year]):
             flash("All fields are required.", "error")
+            return redirect(url_for('index', court=court_code))
+        
+        try:
+            court = get_court(court_code)
+        except KeyError:
+            flash("Please select a supported court.", "error")
             return redirect(url_for('index'))
+        if not court.has_case_type(case_type):
+            flash(f"{case_type} is not a case type of the {court.name}.", "error")
+            return redirect(url_for('index', court=court.code))
         
         # Validate case number (basic)
         if not case_number.isdigit():
@@ -118,28 +250,22 @@ def search():
         # Check if case already exists in database
         logger.info("🔍 Checking database for existing case...")
         try:
-            existing_cases = search_cases(case_type, case_number, case_year)
-            if existing_cases and existing_cases[0]['was_successful']:
-                logger.info(f"📋 Found existing case in database (ID: {existing_cases[0]['id']})")
+            # One primary-key read of the latest successful version
+            existing = await run_db(get_current_case, case_type, case_number, case_year, court=court.code)
+            if existing:
+                logger.info(f"📋 Found existing case in database (ID: {existing['id']})")
                 
-                # Parse the stored data
+                # Reuse the rendered page for this query if we have it
                 try:
-                    existing_data = json.loads(existing_cases[0]['parsed_data_json'])
-                    flash(f"Case found in database (queried on {existing_cases[0]['timestamp'][:19]})", "info")
-                    
-                    case_info = {
-                        'case_type': case_type,
-                        'case_number': case_number,
-                        'case_year': case_year,
-                        'query_id': existing_cases[0]['id'],
-                        'source': 'database',
-                        'timestamp': existing_cases[0]['timestamp']
-                    }
-                    
-                    return render_template('results.html', 
-                                         data=existing_data,
-                                         case_info=case_info)
-                except (json.JSONDecodeError, KeyError) as e:
+                    digest = await run_db(orders.query_orders_digest, existing['id'])
+                    entry = case_cache.get(case_page_kind(digest), existing['id'])
+                    if entry is None:
+                        case_orders = await run_db(orders.get_case_orders, case_type, case_number, case_year,
+                                                   court=court.code)
+                        entry = cache_case_page(existing, case_orders)
+                    flash(f"Case found in database (queried on {existing['timestamp'][:19]})", "info")
+                    return cached_response(entry, conditional=False)
+                except (json.JSONDecodeError, KeyError, TypeError) as e:
                     logger.warning(f"⚠️  Stored data is corrupted: {e}, re-scraping...")
         except Exception as e:
             logger.warning(f"⚠️  Error checking database: {e}")
@@ -149,8 +275,8 @@ def search():
         print("🚀 Starting web scraper...")
         
         try:
-            # Run the async scraper function
-            result = asyncio.run(fetch_case_data(case_type, case_number, case_year))
+            # Queue the scrape; a worker runs it and logs the attempt to the database
+            result = await run_scrape(case_type, case_number, case_year, court.code)
             logger.info(f"✅ Scraper completed. Success: {result.get('error') is None}")
             print(f"✅ Scraper completed. Success: {result.get('error') is None}")
             
@@ -160,18 +286,14 @@ def search():
             result = {
                 "data": None, 
                 "raw_html": None, 
+                "query_id": None,
                 "error": f"Scraper failed: {str(e)}"
             }
 
-        # Log the attempt to the database
-        try:
-            query_id = log_query(case_type, case_number, case_year, result)
+        query_id = result.get('query_id')
+        if query_id is not None:
             logger.info(f"📝 Logged query to database with ID: {query_id}")
             print(f"📝 Logged query to database with ID: {query_id}")
-        except Exception as e:
-            logger.error(f"❌ Database logging failed: {e}")
-            print(f"❌ Database logging failed: {e}")
-            query_id = None
 
         # Handle results
         if result.get('error'):
@@ -189,12 +311,18 @@ def search():
             flash("No case details found. Please verify the case number exists and try again.", "warning")
             return redirect(url_for('index'))
 
+        # List and download its orders in the background
+        if data.get('orders_url'):
+            orders.wake()
+
         # Success - render results
         logger.info(f"✅ Displaying results for case {case_type} {case_number}/{case_year}")
         print(f"✅ Displaying results for case {case_type} {case_number}/{case_year}")
         flash(f"Successfully retrieved case data for {case_type} {case_number}/{case_year}", "success")
         
         case_info = {
+            'court': court.code,
+            'court_name': court.name,
             'case_type': case_type,
             'case_number': case_number,
             'case_year': case_year,
@@ -214,29 +342,26 @@ def search():
         return redirect(url_for('index'))
 
 @app.route('/case/<int:query_id>')
-def view_case(query_id):
+async def view_case(query_id):
     """View a specific case by query ID"""
     try:
+        # Stored queries never change, but their orders do: the page is cached per orders state
+        digest = await run_db(orders.query_orders_digest, query_id)
+        entry = case_cache.get(case_page_kind(digest), query_id)
+        if entry is not None:
+            return cached_response(entry, revalidate=True)
+        
         logger.info(f"Loading case with query ID: {query_id}")
-        case_data = get_query_by_id(query_id)
+        case_data = await run_db(get_query_by_id, query_id, include_raw_html=False)
         
         if not case_data:
             flash("Case not found.", "error")
             return redirect(url_for('index'))
         
         if case_data['was_successful'] and case_data.get('parsed_data'):
-            case_info = {
-                'case_type': case_data['case_type'],
-                'case_number': case_data['case_number'],
-                'case_year': case_data['case_year'],
-                'query_id': query_id,
-                'source': 'database',
-                'timestamp': case_data['timestamp']
-            }
-            
-            return render_template('results.html',
-                                 data=case_data['parsed_data'],
-                                 case_info=case_info)
+            case_orders = await run_db(orders.get_case_orders, case_data['case_type'], case_data['case_number'],
+                                       case_data['case_year'], court=case_data['court'])
+            return cached_response(cache_case_page(case_data, case_orders), revalidate=True)
         else:
             flash(f"Case query failed: {case_data.get('error_message', 'Unknown error')}", "error")
             return redirect(url_for('index'))
@@ -246,32 +371,258 @@ def view_case(query_id):
         flash(f"Error loading case: {str(e)}", "error")
         return redirect(url_for('index'))
 
+@app.route('/orders/<int:order_id>')
+async def order_document(order_id):
+    """Serve an order from our cache, falling back to the court's copy until it is downloaded"""
+    order = await run_db(orders.get_order, order_id)
+    if order is None:
+        flash("Order not found.", "error")
+        return redirect(url_for('index'))
+    path = orders.blob_path(order['sha256']) if order['sha256'] else None
+    if order['status'] != 'cached' or not os.path.exists(path):
+        try:
+            on_court_site = get_court(order['court']).owns_url(order['source_url'])
+        except KeyError:
+            on_court_site = False
+        if not on_court_site:
+            # Never bounce visitors to wherever a scraped link happened to point
+            flash("This order is not available yet.", "error")
+            return redirect(url_for('index'))
+        return redirect(order['source_url'])
+    name = f"{order['case_type']}-{order['case_number']}-{order['case_year']}-{order['order_date'] or order_id}.pdf"
+    # Files are content-addressed, so the digest is a strong ETag
+    return send_file(os.path.abspath(path), mimetype=order['content_type'] or 'application/pdf',
+                     conditional=True, etag=order['sha256'], max_age=CASE_CACHE_MAX_AGE,
+                     download_name=name.replace('/', '_'))
+
 @app.route('/about')
 def about():
     """About page with system information"""
     return render_template('about.html')
 
 @app.route('/api/stats')
-def api_stats():
+async def api_stats():
     """API endpoint for database statistics"""
     try:
-        stats = get_database_stats()
+        stats = await run_db(get_database_stats)
         return jsonify(stats)
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/queue')
+async def api_queue():
+    """Scrape job queue depth by state"""
+    try:
+        queue = await run_db(get_scrape_queue)
+        return json_response(await run_db(queue.stats))
+    except Exception as e:
+        logger.error(f"Error getting queue stats: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/courts')
+def api_courts():
+    """Registered courts and their case types"""
+    return json_response({'default': get_court().code,
+                          'courts': [court.describe() for court in available_courts()]})
+
 @app.route('/api/recent')
-def api_recent():
+async def api_recent():
     """API endpoint for recent queries"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        recent = get_recent_queries(limit)
+        recent = await run_db(get_recent_queries, limit)
         return jsonify(recent)
     except Exception as e:
         logger.error(f"Error getting recent queries: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/case/<int:query_id>')
+async def api_case(query_id):
+    """JSON for one stored query, optionally projected with ?fields=a,b"""
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        kind = 'json:' + ','.join(fields)
+        entry = case_cache.get(kind, query_id)
+        if entry is None:
+            row = await run_db(get_query_by_id, query_id, include_raw_html=False)
+            if not row:
+                return json_response({'error': 'Case not found'}, 404)
+            body = json_codec.dumps_bytes(project_document(case_document(row), fields))
+            entry = case_cache.set(kind, query_id, body, case_etag(row, kind), 'application/json')
+        return cached_response(entry)
+    except Exception as e:
+        logger.error(f"Error getting case {query_id}: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/cases')
+async def api_cases():
+    """Batch JSON for many cases in one round trip.
+
+    ``?keys=W.P.(C)/1234/2024,delhi_hc:CRL.A./5/2023`` returns the current
+    state of each case (its latest successful scrape).  ``?ids=1,2,3`` returns
+    stored query rows instead: single scrape attempts, failed or superseded
+    ones included.  Both take ``&fields=a,b``.
+    """
+    try:
+        param = 'ids' if 'ids' in request.args else 'keys'
+        raw_keys = [k.strip() for k in request.args.get(param, '').split(',') if k.strip()]
+        if not raw_keys:
+            return json_response({'error': 'keys (or ids) parameter is required'}, 400)
+        if len(raw_keys) > API_MAX_BATCH:
+            return json_response({'error': f'At most {API_MAX_BATCH} {param} per request'}, 400)
+        fields = parse_fields(request.args.get('fields'))
+        
+        if param == 'ids':
+            try:
+                ids = list(dict.fromkeys(int(k) for k in raw_keys))
+            except ValueError:
+                return json_response({'error': 'ids must be query ids'}, 400)
+            rows = await run_db(get_queries_by_ids, ids)
+            cases = [project_document(case_document(rows[i]), fields) for i in ids if i in rows]
+            return json_response({'cases': cases, 'missing': [i for i in ids if i not in rows]})
+        
+        try:
+            keys = {raw: parse_case_key(raw) for raw in raw_keys}
+        except KeyError as e:
+            return json_response({'error': str(e.args[0])}, 400)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        rows = await run_db(get_current_cases, keys.values())
+        cases, missing = [], []
+        for raw, key in keys.items():
+            if key in rows:
+                cases.append({'key': format_case_key(key), **project_document(case_document(rows[key]), fields)})
+            else:
+                missing.append(raw)
+        return json_response({'cases': cases, 'missing': missing})
+    except Exception as e:
+        logger.error(f"Error getting cases: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/case-history')
+async def api_case_history():
+    """Field changes between scrapes: ?case_type=..&case_number=..&case_year=..[&court=..]"""
+    try:
+        case_type = request.args.get('case_type')
+        case_number = request.args.get('case_number')
+        case_year = request.args.get('case_year')
+        if not all([case_type, case_number, case_year]):
+            return json_response({'error': 'case_type, case_number and case_year are required'}, 400)
+        try:
+            court = get_court(request.args.get('court'))
+        except KeyError as e:
+            return json_response({'error': str(e.args[0])}, 400)
+        limit = request.args.get('limit', 100, type=int)
+        history = await run_db(get_case_history, case_type, case_number, case_year, limit, court=court.code)
+        return json_response({'history': history})
+    except Exception as e:
+        logger.error(f"Error getting case history: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/case-orders')
+async def api_case_orders():
+    """Orders of one case: ?case_type=..&case_number=..&case_year=..[&court=..]"""
+    try:
+        case_type = request.args.get('case_type')
+        case_number = request.args.get('case_number')
+        case_year = request.args.get('case_year')
+        if not all([case_type, case_number, case_year]):
+            return json_response({'error': 'case_type, case_number and case_year are required'}, 400)
+        try:
+            court = get_court(request.args.get('court'))
+        except KeyError as e:
+            return json_response({'error': str(e.args[0])}, 400)
+        case_orders = await run_db(orders.get_case_orders, case_type, case_number, case_year, court=court.code)
+        for order in case_orders:
+            order['url'] = url_for('order_document', order_id=order['id'])
+        return json_response({'orders': case_orders})
+    except Exception as e:
+        logger.error(f"Error getting case orders: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/orders/search')
+async def api_search_orders():
+    """Full-text search inside order documents: ?q=section 138[&limit=..&court=..]"""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return json_response({'error': 'q parameter is required'}, 400)
+    limit = min(request.args.get('limit', 20, type=int), API_MAX_BATCH)
+    try:
+        hits = await run_db(order_index.search_orders, query, limit, request.args.get('court'))
+    except ValueError as e:
+        # Malformed FTS5 query syntax; other database errors are server errors below
+        return json_response({'error': f'Invalid search query: {e}'}, 400)
+    except Exception as e:
+        logger.error(f"Error searching orders: {e}")
+        return json_response({'error': str(e)}, 500)
+    for hit in hits:
+        hit['url'] = url_for('order_document', order_id=hit['order_id'])
+    return json_response({'query': query, 'hits': hits})
+
+@app.route('/api/orders/index-stats')
+async def api_order_index_stats():
+    """Size of the order text index and last indexing throughput"""
+    try:
+        return json_response(await run_db(order_index.index_stats))
+    except Exception as e:
+        logger.error(f"Error getting order index stats: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/subscriptions', methods=['GET', 'POST'])
+async def api_subscriptions():
+    """List subscriptions, or create one from a JSON body:
+    {"channel": "webhook|file|outbox", "target": "...", "party": "..."} or
+    {"channel": ..., "target": ..., "case_type": ..., "case_number": ..., "case_year": ...}
+    Either form takes an optional "court" code.  "file" targets must lie under
+    NOTIFY_FILE_DIR and webhooks must be public http(s) URLs; anything else
+    has to be set up with ``notifications.py subscribe``.
+    """
+    try:
+        if request.method == 'GET':
+            return json_response({'subscriptions': await run_db(notifications.list_subscriptions)})
+        
+        body = request.get_json(silent=True) or {}
+        if body.get('court'):
+            try:
+                get_court(body['court'])
+            except KeyError as e:
+                return json_response({'error': str(e.args[0])}, 400)
+        try:
+            subscription_id = await run_db(
+                notifications.add_subscription,
+                body.get('channel'), body.get('target'),
+                body.get('case_type'), body.get('case_number'), body.get('case_year'),
+                body.get('party'), body.get('court'))
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        return json_response({'id': subscription_id}, 201)
+    except Exception as e:
+        logger.error(f"Error handling subscriptions: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/api/subscriptions/<int:subscription_id>', methods=['DELETE'])
+async def api_remove_subscription(subscription_id):
+    """Deactivate a subscription"""
+    if await run_db(notifications.remove_subscription, subscription_id):
+        return json_response({'removed': subscription_id})
+    return json_response({'error': 'Subscription not found'}, 404)
+
+@app.route('/api/subscriptions/<int:subscription_id>/outbox', methods=['GET', 'POST'])
+async def api_outbox(subscription_id):
+    """Read pending events for an outbox subscription; POST {"ack": [outbox ids]} to acknowledge"""
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            acked = await run_db(notifications.ack_outbox, subscription_id, body.get('ack', []))
+            return json_response({'acknowledged': acked})
+        limit = request.args.get('limit', notifications.NOTIFY_BATCH_SIZE, type=int)
+        events = await run_db(notifications.read_outbox, subscription_id, limit)
+        return json_response({'events': events})
+    except Exception as e:
+        logger.error(f"Error reading outbox for subscription {subscription_id}: {e}")
+        return json_response({'error': str(e)}, 500)
+
 # Static file serving (for development)
 @app.route('/static/<path:filename>')
 def static_files(filename):
@@ -314,7 +665,12 @@ def truncate_html_filter(value, length=100):
 
 # Application startup
 def create_app():
-    """Create and configure the Flask application"""
+    """Create and configure the Flask application
+
+    Safe to call in a pre-fork master: it starts no threads or event loops.
+    The scraper loop, browser pool and DB thread pool are created lazily in
+    each worker process (see runtime.py).
+    """
     
     # Initialize the database when the app starts
     try:
@@ -354,13 +710,15 @@ if __name__ == '__main__':
     # Create the app
     app = create_app()
     
-    print("🌐 Starting Flask web server...")
+    print("🌐 Starting Flask development server...")
     print("📍 Access the application at: http://localhost:5000")
+    print("🏭 For production use: gunicorn -c gunicorn.conf.py wsgi:app")
+    print("                   or: uvicorn asgi:app --workers 4")
     print("=" * 60)
     
     # Run the Flask app
     try:
-        app.run(debug=True, host='127.0.0.1', port=5000, threaded=True)
+        app.run(debug=app.config['DEBUG'], host='127.0.0.1', port=5000, threaded=True)
     except Exception as e:
         print(f"❌ Failed to start web server: {e}")
         logger.error(f"Failed to start web server: {e}")
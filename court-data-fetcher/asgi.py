@@ -0,0 +1,10 @@
+# asgi.py - ASGI entry point for production servers
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+#
+# Requires: pip install "flask[async]" uvicorn
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+app = WsgiToAsgi(create_app())
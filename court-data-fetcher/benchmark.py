@@ -0,0 +1,531 @@
+# benchmark.py - Performance harness for the Court Data Fetcher
+"""
+Replays recorded court pages through the extractor, drives the database
+helpers at increasing table sizes and load-tests the Flask routes, then writes
+the numbers to a JSON file so two runs can be compared.
+
+Usage:
+    python benchmark.py record-fixtures            # snapshot raw HTML from queries.sqlite3
+    python benchmark.py extraction
+    python benchmark.py database --rows 1000,10000,100000,1000000
+    python benchmark.py routes --requests 500 --concurrency 8 [--search-requests 20]
+    python benchmark.py scraper --cases 40 --concurrency 4   # needs Playwright's Chromium
+    python benchmark.py all --output bench_results/run.json --compare bench_results/baseline.json
+
+Every benchmark works on a temporary database; the production
+``queries.sqlite3`` is only ever read (by ``record-fixtures``).
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import database
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BASE_DIR, 'fixtures')
+RESULTS_DIR = os.path.join(BASE_DIR, 'bench_results')
+
+# Relative change allowed before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.15
+
+
+def _metric(value, unit, higher_is_better):
+    return {'value': round(value, 4), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_metrics(prefix, samples):
+    """Summarise a list of per-call durations (seconds) as ms percentiles."""
+    return {
+        f'{prefix}_p50_ms': _metric(_percentile(samples, 50) * 1000, 'ms', False),
+        f'{prefix}_p95_ms': _metric(_percentile(samples, 95) * 1000, 'ms', False),
+        f'{prefix}_mean_ms': _metric(statistics.mean(samples) * 1000 if samples else 0, 'ms', False),
+    }
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """Point the database module at a throwaway file for the duration of a benchmark."""
+    original = database.DB_NAME
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DB_NAME = os.path.join(tmp_dir, 'bench.sqlite3')
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.init_db()
+            yield database.DB_NAME
+        finally:
+            database.DB_NAME = original
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def record_fixtures(db_path=None, limit=20):
+    """Copy stored ``raw_response_html`` rows into gzipped JSON fixtures."""
+    db_path = db_path or os.path.join(BASE_DIR, database.DB_NAME)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    rows = conn.execute('''
+        SELECT id, court, case_type, case_number, case_year, raw_response_html
+        FROM queries
+        WHERE raw_response_html IS NOT NULL AND length(raw_response_html) > 0
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+    conn.close()
+
+    written = 0
+    for query_id, court, case_type, case_number, case_year, html in rows:
+        path = os.path.join(FIXTURES_DIR, f'query_{query_id}.json.gz')
+        fixture = {
+            'court': court,
+            'case_type': case_type,
+            'case_number': case_number,
+            'case_year': case_year,
+            'html': html,
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False)
+        written += 1
+
+    print(f"📁 Recorded {written} fixtures in {FIXTURES_DIR}")
+    return written
+
+
+def load_fixtures():
+    """Load every recorded page from the fixtures directory."""
+    fixtures = []
+    if not os.path.isdir(FIXTURES_DIR):
+        return fixtures
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        path = os.path.join(FIXTURES_DIR, name)
+        if name.endswith('.json.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                fixtures.append(json.load(f))
+        elif name.endswith('.json'):
+            with open(path, encoding='utf-8') as f:
+                fixtures.append(json.load(f))
+    return fixtures
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def bench_extraction(iterations=20):
+    """Parses/sec and peak memory for replaying fixtures through the extractor."""
+    from courts import get_court
+
+    fixtures = load_fixtures()
+    if not fixtures:
+        print("⚠️  No fixtures found - run 'python benchmark.py record-fixtures' first")
+        return {}
+
+    def parse(fixture):
+        # Fixtures recorded before courts were pluggable are Delhi High Court pages
+        return get_court(fixture.get('court')).extract(fixture['html'], fixture['case_type'],
+                                                       fixture['case_number'], fixture['case_year'],
+                                                       verbose=False)
+
+    # Warm up regex caches before timing; also counts the pages the extractor still finds a case on
+    found = sum(bool(parse(fixture).get('petitioner')) for fixture in fixtures)
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for fixture in fixtures:
+            t0 = time.perf_counter()
+            parse(fixture)
+            samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for fixture in fixtures:
+        parse(fixture)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_bytes = sum(len(f['html']) for f in fixtures) * iterations
+    metrics = {
+        'parses_per_sec': _metric(len(samples) / elapsed, 'ops/s', True),
+        'mb_per_sec': _metric(total_bytes / elapsed / 1e6, 'MB/s', True),
+        'peak_memory_mb': _metric(peak / 1e6, 'MB', False),
+        'cases_found': _metric(found, 'pages', True),
+    }
+    metrics.update(_latency_metrics('parse', samples))
+    return metrics
+
+
+def seed_queries(db_path, rows, html_bytes=2000, distinct_cases=None):
+    """Bulk-insert synthetic query rows shaped like real scraper output."""
+    distinct_cases = distinct_cases or max(1, rows // 4)
+    html = '<html>' + 'x' * max(0, html_bytes - 13) + '</html>'
+    start = datetime(2024, 1, 1)
+
+    def generate():
+        for i in range(rows):
+            case_no = str(i % distinct_cases + 1)
+            ok = i % 10 != 0
+            data = json.dumps({
+                'petitioner': f'PETITIONER {case_no}',
+                'respondent': f'RESPONDENT {case_no}',
+                'case_status': 'PENDING',
+                'next_hearing_date': '15/01/2026',
+                'orders': [],
+            }) if ok else None
+            yield (
+                (start + timedelta(seconds=i)).isoformat(), 'W.P.(C)', case_no, '2024',
+                ok, None if ok else 'Timeout', data, html,
+            )
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO queries (
+            timestamp, case_type, case_number, case_year,
+            was_successful, error_message, parsed_data_json, raw_response_html
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', generate())
+    # Rebuild the one-row-per-case table the way log_query would have left it
+    conn.execute('''
+        INSERT OR REPLACE INTO case_current
+            (court, case_type, case_number, case_year, query_id, timestamp, parsed_data_json)
+        SELECT court, case_type, case_number, case_year, id, timestamp, parsed_data_json
+        FROM queries WHERE was_successful = 1 ORDER BY timestamp
+    ''')
+    conn.commit()
+    conn.close()
+    return distinct_cases
+
+
+def bench_database(row_counts=(1000, 10000, 100000), samples=200, html_bytes=2000):
+    """Latency of the database helpers as the queries table grows."""
+    metrics = {}
+    sample_result = {
+        'data': {'petitioner': 'BENCH PETITIONER', 'respondent': 'BENCH RESPONDENT', 'orders': []},
+        'raw_html': '<html>' + 'x' * html_bytes + '</html>',
+        'error': None,
+    }
+    rng = random.Random(42)
+
+    for rows in row_counts:
+        with temporary_database() as db_path:
+            t0 = time.perf_counter()
+            distinct_cases = seed_queries(db_path, rows, html_bytes=html_bytes)
+            seed_seconds = time.perf_counter() - t0
+            db_mb = os.path.getsize(db_path) / 1e6
+
+            search_samples, current_samples, stats_samples, log_samples = [], [], [], []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(samples):
+                    case_no = str(rng.randint(1, distinct_cases))
+                    t0 = time.perf_counter()
+                    database.search_cases('W.P.(C)', case_no, '2024')
+                    search_samples.append(time.perf_counter() - t0)
+                    t0 = time.perf_counter()
+                    database.get_current_case('W.P.(C)', case_no, '2024')
+                    current_samples.append(time.perf_counter() - t0)
+
+                for _ in range(max(1, samples // 10)):
+                    t0 = time.perf_counter()
+                    database.get_database_stats()
+                    stats_samples.append(time.perf_counter() - t0)
+
+                for i in range(samples):
+                    t0 = time.perf_counter()
+                    database.log_query('W.P.(C)', f'B{i}', '2024', sample_result)
+                    log_samples.append(time.perf_counter() - t0)
+
+            prefix = f'rows_{rows}'
+            metrics[f'{prefix}_seed_rows_per_sec'] = _metric(rows / seed_seconds, 'rows/s', True)
+            metrics[f'{prefix}_db_size_mb'] = _metric(db_mb, 'MB', False)
+            metrics.update(_latency_metrics(f'{prefix}_search_cases', search_samples))
+            metrics.update(_latency_metrics(f'{prefix}_get_current_case', current_samples))
+            metrics.update(_latency_metrics(f'{prefix}_get_database_stats', stats_samples))
+            metrics.update(_latency_metrics(f'{prefix}_log_query', log_samples))
+            print(f"   {rows:>9} rows: search p50 "
+                  f"{metrics[f'{prefix}_search_cases_p50_ms']['value']} ms, current p50 "
+                  f"{metrics[f'{prefix}_get_current_case_p50_ms']['value']} ms, stats p50 "
+                  f"{metrics[f'{prefix}_get_database_stats_p50_ms']['value']} ms")
+
+    return metrics
+
+
+def _load_test(client, paths, total_requests, concurrency):
+    """Fire ``total_requests`` GETs spread over ``paths`` from a thread pool."""
+    def hit(i):
+        path = paths[i % len(paths)]
+        t0 = time.perf_counter()
+        response = client.get(path)
+        return time.perf_counter() - t0, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(hit, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    samples = [duration for duration, _ in results]
+    errors = sum(1 for _, status in results if status >= 500)
+    return samples, elapsed, errors
+
+
+def bench_routes(total_requests=500, concurrency=8, rows=10000, search_requests=0):
+    """
+    Requests/sec and latency for the read-only Flask routes.
+
+    With ``search_requests`` set, ``POST /search`` is also driven end to end
+    against the mock court site (needs Playwright's Chromium).
+    """
+    from app import app
+
+    app.config['TESTING'] = True
+    # Maintenance and the order/notification threads would archive and vacuum the seeded rows mid-run
+    app.config['BACKGROUND_TASKS'] = False
+    metrics = {}
+    with temporary_database() as db_path:
+        seed_queries(db_path, rows)
+        # Flask test clients are not thread-safe, so each load thread gets its own
+        local = threading.local()
+
+        class _ThreadClient:
+            def get(self, path):
+                if not hasattr(local, 'client'):
+                    local.client = app.test_client()
+                return local.client.get(path)
+
+        client = _ThreadClient()
+        routes = {
+            'index': ['/'],
+            'view_case': [f'/case/{i}' for i in range(2, rows, max(1, rows // 50))],
+            'api_stats': ['/api/stats'],
+            'api_recent': ['/api/recent?limit=10'],
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, paths in routes.items():
+                samples, elapsed, errors = _load_test(client, paths, total_requests, concurrency)
+                metrics[f'{name}_requests_per_sec'] = _metric(total_requests / elapsed, 'req/s', True)
+                metrics[f'{name}_errors'] = _metric(errors, 'count', False)
+                metrics.update(_latency_metrics(name, samples))
+
+        if search_requests:
+            with mock_court_site():
+                search_client = app.test_client()
+                samples = []
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for i in range(search_requests):
+                        t0 = time.perf_counter()
+                        search_client.post('/search', data={
+                            'case_type': 'W.P.(C)', 'case_number': str(5000 + i), 'case_year': '2024'})
+                        samples.append(time.perf_counter() - t0)
+                elapsed = time.perf_counter() - started
+            metrics['search_requests_per_sec'] = _metric(search_requests / elapsed, 'req/s', True)
+            metrics.update(_latency_metrics('search', samples))
+
+    return metrics
+
+
+@contextlib.contextmanager
+def mock_court_site(latency=0.0, error_rate=0.0):
+    """Run mock_court.py in-process and point the scraper at it."""
+    import scraper
+    from courts import get_court
+    from mock_court import MockCourtConfig, start_mock_court
+
+    config = MockCourtConfig(latency=latency, error_rate=error_rate, seed=42)
+    server, base_url = start_mock_court(config=config)
+    court = get_court()
+    saved_court = (court.base_url, court.min_request_interval)
+    saved = {name: getattr(scraper, name) for name in (
+        'SCRAPER_CAPTCHA_BYPASS', 'SCRAPER_HEADLESS',
+        'SCRAPER_SETTLE_SECONDS', 'SCRAPER_LINGER_SECONDS', 'SCRAPER_RESULT_TIMEOUT_MS')}
+    court.base_url = base_url
+    # The mock site has no politeness budget to respect
+    court.min_request_interval = 0
+    scraper.SCRAPER_CAPTCHA_BYPASS = config.captcha_token
+    scraper.SCRAPER_HEADLESS = True
+    scraper.SCRAPER_SETTLE_SECONDS = 0
+    scraper.SCRAPER_LINGER_SECONDS = 0
+    scraper.SCRAPER_RESULT_TIMEOUT_MS = 10000
+    try:
+        yield config
+    finally:
+        for name, value in saved.items():
+            setattr(scraper, name, value)
+        court.base_url, court.min_request_interval = saved_court
+        server.shutdown()
+        server.server_close()
+
+
+def bench_scraper(cases=40, concurrency=4, pool_size=2, latency=0.05, error_rate=0.0):
+    """End-to-end scrapes/sec through the browser pool against the mock court."""
+    import asyncio
+    import scraper
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        samples, failures = [], 0
+
+        async def one(pool, i):
+            nonlocal failures
+            async with semaphore:
+                t0 = time.perf_counter()
+                result = await scraper.fetch_case_data('W.P.(C)', str(1000 + i), '2024', pool=pool)
+                samples.append(time.perf_counter() - t0)
+                if result.get('error'):
+                    failures += 1
+
+        async with scraper.BrowserPool(size=pool_size, headless=True) as pool:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(pool, i) for i in range(cases)))
+            return samples, failures, time.perf_counter() - started
+
+    with mock_court_site(latency=latency, error_rate=error_rate):
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples, failures, elapsed = asyncio.run(run_all())
+
+    metrics = {
+        'scrapes_per_sec': _metric(cases / elapsed, 'ops/s', True),
+        'failure_rate': _metric(failures / cases, 'ratio', False),
+    }
+    metrics.update(_latency_metrics('scrape', samples))
+    return metrics
+
+
+# ---------------------------------------------------------------------------
+# Results
+# ---------------------------------------------------------------------------
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=BASE_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def write_results(results, output_path):
+    """Write benchmark results plus run metadata as JSON."""
+    payload = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'benchmarks': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"📝 Results written to {output_path}")
+    return payload
+
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return a list of human-readable regressions between two result payloads."""
+    regressions = []
+    for bench_name, metrics in current.get('benchmarks', {}).items():
+        previous = baseline.get('benchmarks', {}).get(bench_name, {})
+        for metric_name, metric in metrics.items():
+            old = previous.get(metric_name)
+            if not old or old.get('value') is None:
+                continue
+            if not old['value']:
+                # No relative change from zero: an error count that was 0 regresses on any increase
+                if not metric['higher_is_better'] and metric['value'] > 0:
+                    regressions.append(f"{bench_name}.{metric_name}: 0 -> {metric['value']} {metric['unit']}")
+                continue
+            change = (metric['value'] - old['value']) / old['value']
+            worse = -change if metric['higher_is_better'] else change
+            if worse > tolerance:
+                regressions.append(
+                    f"{bench_name}.{metric_name}: {old['value']} -> {metric['value']} "
+                    f"{metric['unit']} ({worse * 100:.1f}% worse)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Court Data Fetcher benchmarks')
+    parser.add_argument('benchmark', choices=['record-fixtures', 'extraction', 'database', 'routes', 'scraper', 'all'])
+    parser.add_argument('--iterations', type=int, default=20, help='extraction passes over the fixtures')
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma-separated table sizes for the database benchmark')
+    parser.add_argument('--samples', type=int, default=200, help='calls per database helper')
+    parser.add_argument('--requests', type=int, default=500, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent route clients / scrapes')
+    parser.add_argument('--search-requests', type=int, default=0,
+                        help='POST /search requests against the mock court (routes benchmark)')
+    parser.add_argument('--cases', type=int, default=40, help='cases scraped by the scraper benchmark')
+    parser.add_argument('--pool-size', type=int, default=2, help='browsers in the scraper benchmark pool')
+    parser.add_argument('--latency', type=float, default=0.05, help='mock court response latency (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='mock court 503 rate')
+    parser.add_argument('--output', help='results file (default: bench_results/<timestamp>.json)')
+    parser.add_argument('--compare', help='baseline results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown before failing (default 0.15)')
+    args = parser.parse_args(argv)
+
+    if args.benchmark == 'record-fixtures':
+        record_fixtures()
+        return 0
+
+    # The scraper benchmark needs a browser install, so 'all' leaves it out
+    selected = ['extraction', 'database', 'routes'] if args.benchmark == 'all' else [args.benchmark]
+    results = {}
+    for name in selected:
+        print(f"⏱️  Running {name} benchmark...")
+        if name == 'extraction':
+            results[name] = bench_extraction(args.iterations)
+        elif name == 'database':
+            row_counts = [int(r) for r in args.rows.split(',') if r.strip()]
+            results[name] = bench_database(row_counts, samples=args.samples)
+        elif name == 'routes':
+            results[name] = bench_routes(args.requests, args.concurrency,
+                                         search_requests=args.search_requests)
+        elif name == 'scraper':
+            results[name] = bench_scraper(args.cases, args.concurrency, args.pool_size,
+                                          args.latency, args.error_rate)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    payload = write_results(results, output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(payload, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"✅ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
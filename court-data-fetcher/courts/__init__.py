@@ -0,0 +1,61 @@
+# courts - Court plugin registry
+"""
+Each supported court is a ``CourtAdapter`` subclass registered here with
+``@register_court``.  Plugins are imported on first lookup, so importing this
+package stays cheap for modules that only need ``DEFAULT_COURT``.
+
+Adding a court means adding a module to this package (or any importable
+module listed in ``COURT_PLUGINS``) - the scraper, browser pool, rate
+limiter and database are shared by all of them.
+"""
+import importlib
+import os
+import threading
+
+DEFAULT_COURT = os.environ.get('DEFAULT_COURT', 'delhi_hc')
+
+_registry = {}
+_plugins_loaded = False
+# Re-entrant: a plugin may look courts up while it is being imported
+_plugins_lock = threading.RLock()
+
+
+def register_court(adapter_class):
+    """Class decorator: instantiate the adapter and register it under its code."""
+    adapter = adapter_class()
+    if not adapter.code:
+        raise ValueError(f"{adapter_class.__name__} must set a court code")
+    _registry[adapter.code] = adapter
+    return adapter_class
+
+
+def get_court(code=None):
+    """Return the registered adapter for ``code`` (default court when omitted)."""
+    code = code or DEFAULT_COURT
+    load_plugins()
+    try:
+        return _registry[code]
+    except KeyError:
+        raise KeyError(f"Unknown court '{code}'. Available: {', '.join(sorted(_registry))}") from None
+
+
+def available_courts():
+    """All registered adapters, default court first."""
+    load_plugins()
+    return sorted(_registry.values(), key=lambda adapter: (adapter.code != DEFAULT_COURT, adapter.name))
+
+
+def load_plugins():
+    """Import the built-in plugins plus any listed in COURT_PLUGINS (comma-separated modules)."""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    with _plugins_lock:
+        if _plugins_loaded:
+            return
+        modules = ['courts.delhi']
+        modules += [m.strip() for m in os.environ.get('COURT_PLUGINS', '').split(',') if m.strip()]
+        for module in modules:
+            importlib.import_module(module)
+        # Only now, so concurrent callers wait on the lock instead of seeing a partial registry
+        _plugins_loaded = True
@@ -0,0 +1,109 @@
+# courts/base.py - Interface every court plugin implements
+import html
+import os
+import re
+from urllib.parse import urljoin, urlsplit
+
+ORDER_ROW_RE = re.compile(r'<tr\b.*?</tr>', re.IGNORECASE | re.DOTALL)
+PDF_LINK_RE = re.compile(r'<a\b[^>]*\bhref\s*=\s*["\']([^"\']+)["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+DATE_RE = re.compile(r'\b(\d{2})[/.-](\d{2})[/.-](\d{4})\b')
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+class CourtAdapter:
+    """
+    Everything the scraper needs to know about one court's website.
+
+    The scraper owns the browser pool, rate limiting, CAPTCHA handling and
+    persistence; an adapter only drives its site's pages and parses results.
+    Subclasses set the class attributes and implement the four page steps.
+    """
+
+    # Registry key, also stored in the ``court`` column of every table
+    code = None
+    name = None
+    base_url = None
+    # (code, description) pairs shown in the search form
+    case_types = []
+    # Minimum seconds between two searches started against this site
+    min_request_interval = 2.0
+    # Links on the orders page matching this (href or text) point at order documents
+    order_link_pattern = re.compile(r'pdf', re.IGNORECASE)
+
+    def __init__(self):
+        # e.g. COURT_BASE_URL_DELHI_HC=http://127.0.0.1:8765 points a plugin at a mock site
+        override = os.environ.get(f'COURT_BASE_URL_{self.code.upper()}')
+        if override:
+            self.base_url = override
+        self.base_url = self.base_url.rstrip('/')
+
+    def owns_url(self, url):
+        """True if ``url`` is an http(s) URL on this court's own host."""
+        parts = urlsplit(url or '')
+        return (parts.scheme in ('http', 'https') and parts.hostname is not None
+                and parts.hostname == urlsplit(self.base_url).hostname)
+
+    def has_case_type(self, case_type):
+        return any(code == case_type for code, _ in self.case_types)
+
+    async def open_search(self, page):
+        """Navigate to the case status search form."""
+        raise NotImplementedError
+
+    async def fill_form(self, page, case_type, case_number, case_year):
+        """Fill in the search form (everything except the CAPTCHA)."""
+        raise NotImplementedError
+
+    async def submit_with_captcha(self, page, answer):
+        """Type a CAPTCHA answer and submit; only used against mock sites."""
+        await page.fill('input[name="captcha"]', answer)
+        await page.click('button[type="submit"], input[type="submit"]')
+
+    async def wait_for_results(self, page, case_type, case_number, case_year, timeout_ms):
+        """Block until the results for this case are on the page (or time out)."""
+        raise NotImplementedError
+
+    def extract(self, html_content, case_type, case_number, case_year, verbose=True):
+        """Parse a results page into the case details dict."""
+        raise NotImplementedError
+
+    def orders_url(self, html_content, case_type, case_number, case_year):
+        """URL of the page listing this case's orders, if the results page links to one."""
+        return None
+
+    def parse_orders(self, html_content, page_url):
+        """
+        List the orders on an orders page as ``{'order_date', 'description', 'url'}``.
+
+        The default reads table rows holding an order link (see
+        ``order_link_pattern``) plus a dd/mm/yyyy date, which is how most
+        Indian court sites present them.
+        """
+        orders = []
+        seen = set()
+        for row in ORDER_ROW_RE.findall(html_content):
+            for href, label in PDF_LINK_RE.findall(row):
+                href = html.unescape(href)
+                if not (self.order_link_pattern.search(href) or self.order_link_pattern.search(label)):
+                    continue
+                url = urljoin(page_url, href)
+                if url in seen:
+                    continue
+                seen.add(url)
+                text = ' '.join(html.unescape(TAG_RE.sub(' ', row)).split())
+                date = DATE_RE.search(text)
+                orders.append({
+                    # ISO dates sort correctly in SQLite
+                    'order_date': f'{date.group(3)}-{date.group(2)}-{date.group(1)}' if date else None,
+                    'description': text,
+                    'url': url,
+                })
+        return orders
+
+    def describe(self):
+        return {
+            'code': self.code,
+            'name': self.name,
+            'base_url': self.base_url,
+            'case_types': [{'code': code, 'name': name} for code, name in self.case_types],
+        }
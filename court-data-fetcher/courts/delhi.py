@@ -0,0 +1,252 @@
+# courts/delhi.py - Delhi High Court plugin
+import html
+import os
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from courts import register_court
+from courts.base import CourtAdapter
+
+ORDERS_LINK_RE = re.compile(r'<a\b[^>]*\bhref\s*=\s*["\']([^"\']+)["\'][^>]*>\s*Orders\s*</a>', re.IGNORECASE)
+
+DELHI_CASE_TYPES = [
+    ("W.P.(C)", "Writ Petition (Civil)"),
+    ("W.P.(CRL)", "Writ Petition (Criminal)"),
+    ("CRL.A.", "Criminal Appeal"),
+    ("CRL.M.C.", "Criminal Miscellaneous Case"),
+    ("CRL.REV.P.", "Criminal Revision Petition"),
+    ("C.M.", "Civil Miscellaneous"),
+    ("C.S.(OS)", "Civil Suit (Original Side)"),
+    ("C.S.(COMM)", "Civil Suit (Commercial)"),
+    ("FAO(OS)", "First Appeal from Original Side"),
+    ("FAO(COMM)", "First Appeal (Commercial)"),
+    ("RFA", "Regular First Appeal"),
+    ("ARB.A.", "Arbitration Appeal"),
+    ("ARB.P.", "Arbitration Petition"),
+    ("COMP.CAS(IB)", "Company Case (Insolvency & Bankruptcy)"),
+    ("C.P.", "Company Petition"),
+    ("MAT.APP.", "Mat Appeal"),
+    ("L.P.A.", "Letters Patent Appeal"),
+    ("C.O.", "Contempt of Court"),
+    ("BAIL APPLN.", "Bail Application"),
+    ("EA", "Execution Application"),
+    ("EC", "Execution Case"),
+    ("EP", "Election Petition"),
+    ("EXE", "Execution"),
+    ("GA", "General Application"),
+    ("MA", "Miscellaneous Application"),
+    ("O", "Original"),
+    ("P", "Petition"),
+    ("SA", "Second Appeal"),
+    ("U", "Under")
+]
+
+
+def extract_case_details(html_content: str, case_type: str, case_number: str, case_year: str, verbose: bool = True):
+    """
+    Extract case details from a Delhi High Court results page.
+
+    Kept separate from the browser session so stored ``raw_response_html``
+    snapshots can be re-parsed offline (see benchmark.py).
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    page_text = soup.get_text()
+
+    log("🔍 Extracting with specialized Delhi High Court patterns...")
+
+    case_details = {}
+
+    # **CORRECTED EXTRACTION PATTERNS** based on your actual output
+
+    # Pattern 1: Extract from the table structure we saw in your output
+    # Looking for: SEEMA RANI & ORS.VS.    MUNICIPAL CORPORATION OF DELHI
+    pattern1 = rf'{re.escape(case_type)}\s*-\s*{re.escape(case_number)}\s*/\s*{re.escape(case_year)}.*?\[.*?\].*?Orders([A-Z][A-Z\s&.,()]+?)VS\.?\s+([A-Z][A-Z\s&.,()]+?)(?:NEXT DATE|Last Date|\n)'
+    match1 = re.search(pattern1, page_text, re.IGNORECASE | re.DOTALL)
+
+    if match1:
+        petitioner = match1.group(1).strip()
+        respondent = match1.group(2).strip()
+        case_details['petitioner'] = petitioner
+        case_details['respondent'] = respondent
+        log(f"✅ Pattern 1 - Petitioner: {petitioner}")
+        log(f"✅ Pattern 1 - Respondent: {respondent}")
+
+    # Pattern 2: Table-based extraction
+    if not case_details.get('petitioner'):
+        # Look for table rows containing our case
+        table_pattern = rf'({re.escape(case_number)}.*?{re.escape(case_year)}.*?)(?:Showing|\n\n)'
+        table_match = re.search(table_pattern, page_text, re.DOTALL)
+
+        if table_match:
+            table_content = table_match.group(1)
+            # Extract petitioner vs respondent from table content
+            vs_pattern = r'([A-Z][A-Z\s&.,()]+?)\s*VS\.?\s*([A-Z][A-Z\s&.,()]+?)(?:\s*NEXT DATE|\s*Last Date|\s*COURT)'
+            vs_match = re.search(vs_pattern, table_content, re.IGNORECASE)
+
+            if vs_match:
+                petitioner = vs_match.group(1).strip()
+                respondent = vs_match.group(2).strip()
+                case_details['petitioner'] = petitioner
+                case_details['respondent'] = respondent
+                log(f"✅ Pattern 2 - Petitioner: {petitioner}")
+                log(f"✅ Pattern 2 - Respondent: {respondent}")
+
+    # Pattern 3: Direct text extraction from your exact output format
+    if not case_details.get('petitioner'):
+        # Based on your output: "SEEMA RANI & ORS.VS.    MUNICIPAL CORPORATION OF DELHI"
+        direct_pattern = r'([A-Z][A-Z\s&.,()]+?)VS\.?\s+([A-Z][A-Z\s&.,()]+?)(?:\s*NEXT DATE)'
+        direct_match = re.search(direct_pattern, page_text)
+
+        if direct_match:
+            petitioner = direct_match.group(1).strip()
+            respondent = direct_match.group(2).strip()
+            case_details['petitioner'] = petitioner
+            case_details['respondent'] = respondent
+            log(f"✅ Pattern 3 - Petitioner: {petitioner}")
+            log(f"✅ Pattern 3 - Respondent: {respondent}")
+
+    # Extract additional information
+    # Case status
+    status_match = re.search(rf'{re.escape(case_number)}.*?\[(.*?)\]', page_text)
+    if status_match:
+        case_details['case_status'] = status_match.group(1).strip()
+        log(f"✅ Case Status: {case_details['case_status']}")
+
+    # Last date
+    last_date_match = re.search(r'Last Date:\s*(\d{2}/\d{2}/\d{4})', page_text)
+    if last_date_match:
+        case_details['last_hearing_date'] = last_date_match.group(1)
+        log(f"✅ Last Hearing Date: {case_details['last_hearing_date']}")
+
+    # Court number
+    court_match = re.search(r'COURT NO:\s*(\d+)', page_text)
+    if court_match:
+        case_details['court_number'] = court_match.group(1)
+        log(f"✅ Court Number: {case_details['court_number']}")
+
+    # Next date
+    if 'NEXT DATE: NA' in page_text:
+        case_details['next_hearing_date'] = "Case disposed - no next date"
+    else:
+        next_date_match = re.search(r'NEXT DATE:\s*(\d{2}/\d{2}/\d{4})', page_text)
+        if next_date_match:
+            case_details['next_hearing_date'] = next_date_match.group(1)
+        else:
+            case_details['next_hearing_date'] = "Check latest orders for next date"
+
+    # Set filing date
+    case_details['filing_date'] = "Not displayed on results page"
+
+    # Individual orders live behind the "Orders" link; the adapter records
+    # its URL and orders.py lists and downloads them
+    case_details['orders'] = []
+
+    # Final validation and cleanup
+    if case_details.get('petitioner'):
+        # Clean up common extraction artifacts
+        petitioner = case_details['petitioner']
+        petitioner = re.sub(r'\s+', ' ', petitioner).strip()
+        # Remove common trailing artifacts
+        petitioner = re.sub(r'\s*(Orders|VS|Vs|vs)\s*$', '', petitioner).strip()
+        case_details['petitioner'] = petitioner
+
+    if case_details.get('respondent'):
+        respondent = case_details['respondent'] 
+        respondent = re.sub(r'\s+', ' ', respondent).strip()
+        # Remove trailing artifacts
+        respondent = re.sub(r'\s*(NEXT DATE|Last Date|COURT).*$', '', respondent).strip()
+        case_details['respondent'] = respondent
+
+    log("\n📋 FINAL EXTRACTION RESULTS:")
+    log(f"   Petitioner: {case_details.get('petitioner', 'Not extracted')}")
+    log(f"   Respondent: {case_details.get('respondent', 'Not extracted')}")
+    log(f"   Status: {case_details.get('case_status', 'Not found')}")
+    log(f"   Last Date: {case_details.get('last_hearing_date', 'Not found')}")
+    log(f"   Court: {case_details.get('court_number', 'Not found')}")
+
+    return case_details
+
+
+@register_court
+class DelhiHighCourt(CourtAdapter):
+    code = 'delhi_hc'
+    name = 'Delhi High Court'
+    base_url = 'https://delhihighcourt.nic.in'
+    case_types = DELHI_CASE_TYPES
+    # Order PDFs are served from /app/showlogo/<token>/<year>
+    order_link_pattern = re.compile(r'pdf|showlogo', re.IGNORECASE)
+
+    def __init__(self):
+        super().__init__()
+        # COURT_BASE_URL predates the plugin registry and still targets Delhi
+        if os.environ.get('COURT_BASE_URL'):
+            self.base_url = os.environ['COURT_BASE_URL'].rstrip('/')
+
+    async def open_search(self, page):
+        await page.goto(f"{self.base_url}/", timeout=60000)
+        
+        # Click Case Status
+        try:
+            await page.click("text=Case Status", timeout=5000)
+            print("✅ Clicked Case Status link")
+        except:
+            await page.goto(f"{self.base_url}/app/get-case-type-status")
+        
+        await page.wait_for_load_state('domcontentloaded')
+
+    async def fill_form(self, page, case_type, case_number, case_year):
+        # Fill case type dropdown (skip language dropdown)
+        selects = await page.locator('select').all()
+        for i, select in enumerate(selects):
+            try:
+                current_value = await select.input_value()
+                if current_value != 'Hindi':  # Skip language dropdown
+                    await select.select_option(value=case_type)
+                    print(f"✅ Set case type to: {case_type}")
+                    break
+            except:
+                continue
+        
+        # Fill case number
+        await page.fill('input[name="case_number"]', case_number)
+        print(f"✅ Filled case number: {case_number}")
+        
+        # Fill case year (look for year field)
+        inputs = await page.locator('input[type="text"]').all()
+        for input_elem in inputs:
+            try:
+                placeholder = await input_elem.get_attribute('placeholder') or ""
+                name = await input_elem.get_attribute('name') or ""
+                if 'year' in placeholder.lower() or 'year' in name.lower():
+                    await input_elem.fill(case_year)
+                    print(f"✅ Filled case year: {case_year}")
+                    break
+            except:
+                continue
+
+    async def wait_for_results(self, page, case_type, case_number, case_year, timeout_ms):
+        # The results table shows the case number next to "Petitioner" / "VS."
+        await page.wait_for_function("""
+            (caseNumber) => {
+                const text = document.body.innerText;
+                return text.includes(caseNumber) &&
+                       (text.includes('Petitioner') || text.includes('VS'));
+            }
+        """, arg=case_number, timeout=timeout_ms)
+
+    def extract(self, html_content, case_type, case_number, case_year, verbose=True):
+        case_details = extract_case_details(html_content, case_type, case_number, case_year, verbose)
+        orders_url = self.orders_url(html_content, case_type, case_number, case_year)
+        if orders_url:
+            case_details['orders_url'] = orders_url
+        return case_details
+
+    def orders_url(self, html_content, case_type, case_number, case_year):
+        match = ORDERS_LINK_RE.search(html_content)
+        if not match:
+            return None
+        return urljoin(f"{self.base_url}/", html.unescape(match.group(1)))
@@ -4,20 +4,43 @@ import json
 from datetime import datetime
 import logging
 import os
+import json_codec
+from courts import DEFAULT_COURT
 
 DB_NAME = 'queries.sqlite3'
 
+# SQLite's default cap on bound parameters per statement
+MAX_SQL_PARAMS = 900
+
+# How long a starting process waits for another one's schema upgrade to finish
+MIGRATION_WAIT_SECONDS = int(os.environ.get('MIGRATION_WAIT_SECONDS', '600'))
+
+# Parsed fields whose changes are published as case events (see notifications.py)
+WATCHED_FIELDS = tuple(
+    f.strip() for f in os.environ.get('NOTIFY_FIELDS', 'case_status,next_hearing_date,court_number').split(',')
+    if f.strip()
+)
+
 def init_db():
     """Initializes the database and creates the 'queries' table if it doesn't exist."""
     try:
-        conn = sqlite3.connect(DB_NAME)
+        # Workers that start together wait here while the first one upgrades the schema
+        conn = sqlite3.connect(DB_NAME, timeout=MIGRATION_WAIT_SECONDS)
         cursor = conn.cursor()
         
+        # Only takes effect while the file is still empty; an existing file is
+        # switched over with `python maintenance.py --vacuum`
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
+        # WAL lets the web workers' readers run alongside a writer
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Create table with better structure
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS queries (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
+                court TEXT NOT NULL DEFAULT 'delhi_hc',
                 case_type TEXT NOT NULL,
                 case_number TEXT NOT NULL,
                 case_year TEXT NOT NULL,
@@ -40,7 +63,54 @@ def init_db():
             ON queries(timestamp)
         ''')
         
+        # Latest successful data per case - the hot lookup is a single primary-key read
+        cursor.execute(CASE_CURRENT_DDL.format(name='case_current'))
+        
+        # Append-only log of field changes between successful scrapes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                court TEXT NOT NULL DEFAULT 'delhi_hc',
+                case_type TEXT NOT NULL,
+                case_number TEXT NOT NULL,
+                case_year TEXT NOT NULL,
+                query_id INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                changes_json TEXT NOT NULL
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_history_case 
+            ON case_history(case_type, case_number, case_year, timestamp)
+        ''')
+        
+        # Outbound change events, written with the scrape and fanned out by notifications.py
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS case_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                court TEXT NOT NULL DEFAULT 'delhi_hc',
+                case_type TEXT NOT NULL,
+                case_number TEXT NOT NULL,
+                case_year TEXT NOT NULL,
+                query_id INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                petitioner TEXT,
+                respondent TEXT,
+                changes_json TEXT NOT NULL
+            )
+        ''')
+        
         conn.commit()
+        upgrade_schema(conn)
+        run_migrations(conn)
+        
+        # Tables owned by feature modules are created here too, so their request paths never run DDL
+        import maintenance, notifications, order_index, orders
+        maintenance.init_maintenance(conn)
+        notifications.init_notifications(conn)
+        orders.init_orders(conn)
+        order_index.init_index(conn)
         conn.close()
         print("✅ Database initialized successfully.")
         print(f"📁 Database file: {os.path.abspath(DB_NAME)}")
@@ -49,7 +119,194 @@ def init_db():
         print(f"❌ Database initialization failed: {e}")
         raise
 
-def log_query(case_type, case_number, case_year, result):
+CASE_CURRENT_DDL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        court TEXT NOT NULL,
+        case_type TEXT NOT NULL,
+        case_number TEXT NOT NULL,
+        case_year TEXT NOT NULL,
+        query_id INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        parsed_data_json TEXT NOT NULL,
+        PRIMARY KEY (court, case_type, case_number, case_year)
+    ) WITHOUT ROWID
+'''
+
+def _column_names(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def upgrade_schema(conn):
+    """Add columns introduced after a table was first created (runs before data migrations).
+
+    The checks run under the write lock, so of several workers starting at
+    once only the first alters the tables.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    for table in ('queries', 'case_history', 'case_events'):
+        if 'court' not in _column_names(conn, table):
+            # Everything stored before multi-court support came from the Delhi High Court
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN court TEXT NOT NULL DEFAULT 'delhi_hc'")
+    
+    if 'court' not in _column_names(conn, 'case_current'):
+        # The primary key gains the court, so the table is rebuilt
+        conn.execute(CASE_CURRENT_DDL.format(name='case_current_new'))
+        conn.execute('''
+            INSERT INTO case_current_new
+                (court, case_type, case_number, case_year, query_id, timestamp, parsed_data_json)
+            SELECT 'delhi_hc', case_type, case_number, case_year, query_id, timestamp, parsed_data_json
+            FROM case_current
+        ''')
+        conn.execute('DROP TABLE case_current')
+        conn.execute('ALTER TABLE case_current_new RENAME TO case_current')
+    conn.commit()
+
+def _migrate_compact_json(conn):
+    """Re-encode parsed_data_json rows written with indent=2 as compact JSON."""
+    cursor = conn.cursor()
+    last_id = 0
+    converted = 0
+    while True:
+        rows = cursor.execute('''
+            SELECT id, parsed_data_json FROM queries
+            WHERE id > ? AND instr(parsed_data_json, char(10)) > 0
+            ORDER BY id LIMIT 500
+        ''', (last_id,)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for query_id, data_json in rows:
+            try:
+                updates.append((json_codec.dumps(json.loads(data_json)), query_id))
+            except json.JSONDecodeError:
+                pass  # leave unreadable rows untouched
+        cursor.executemany('UPDATE queries SET parsed_data_json = ? WHERE id = ?', updates)
+        converted += len(updates)
+        last_id = rows[-1][0]
+    print(f"   Compacted {converted} stored JSON documents")
+
+def _migrate_incremental_vacuum(conn):
+    """Check for auto_vacuum=INCREMENTAL, which maintenance needs to return free pages.
+
+    An existing file only switches mode with a full VACUUM, which rewrites the
+    whole database under an exclusive lock, so that is left to
+    ``python maintenance.py --vacuum`` instead of running on app startup.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        print("   Run 'python maintenance.py --vacuum' once to enable incremental auto-vacuum")
+
+def _migrate_backfill_case_current(conn):
+    """Build case_current and case_history from the successful rows already stored."""
+    cursor = conn.cursor()
+    rows = cursor.execute('''
+        SELECT id, timestamp, court, case_type, case_number, case_year, parsed_data_json
+        FROM queries
+        WHERE was_successful = 1 AND parsed_data_json IS NOT NULL
+        ORDER BY court, case_type, case_number, case_year, timestamp
+    ''')
+    cases = 0
+    for query_id, timestamp, court, case_type, case_number, case_year, data_json in rows.fetchall():
+        try:
+            data = json.loads(data_json)
+        except json.JSONDecodeError:
+            continue
+        if update_current_case(conn, case_type, case_number, case_year, query_id, timestamp, data,
+                               court=court) is not None:
+            cases += 1
+    print(f"   Recorded {cases} case versions")
+
+# (version, description, function) - applied in order by init_db, tracked in PRAGMA user_version
+MIGRATIONS = [
+    (1, 'compact stored parsed_data_json', _migrate_compact_json),
+    (2, 'check incremental auto-vacuum', _migrate_incremental_vacuum),
+    (3, 'backfill case_current and case_history', _migrate_backfill_case_current),
+]
+
+def run_migrations(conn):
+    """Apply any schema/data migrations newer than the database's user_version.
+
+    Each migration runs in one IMMEDIATE transaction with its user_version
+    bump, and the version is read again once the lock is held.  Workers that
+    start together therefore wait for the first one and then skip what it
+    applied, and a failed migration leaves nothing half done.
+    """
+    for version, description, migrate in MIGRATIONS:
+        if version <= conn.execute('PRAGMA user_version').fetchone()[0]:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= conn.execute('PRAGMA user_version').fetchone()[0]:
+                conn.rollback()
+                continue
+            print(f"🔧 Applying database migration {version}: {description}")
+            migrate(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def diff_case_data(old, new):
+    """Field-level changes between two parsed case dicts as {field: [old, new]}."""
+    old = old or {}
+    changes = {}
+    for field in new.keys() | old.keys():
+        if old.get(field) != new.get(field):
+            changes[field] = [old.get(field), new.get(field)]
+    return changes
+
+def update_current_case(conn, case_type, case_number, case_year, query_id, timestamp, data,
+                        court=DEFAULT_COURT):
+    """
+    Upsert case_current with a successful scrape and log what changed.
+
+    Runs on the caller's connection and transaction. Returns the changes dict
+    (empty when nothing changed) or None if a newer version is already stored.
+    """
+    row = conn.execute('''
+        SELECT timestamp, parsed_data_json FROM case_current
+        WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+    ''', (court, case_type, case_number, case_year)).fetchone()
+    
+    old_data = None
+    if row:
+        if row[0] > timestamp:
+            return None
+        try:
+            old_data = json_codec.loads(row[1])
+        except json_codec.JSONDecodeError:
+            old_data = None
+    
+    data_json = json_codec.dumps(data)
+    conn.execute('''
+        INSERT INTO case_current (court, case_type, case_number, case_year, query_id, timestamp, parsed_data_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (court, case_type, case_number, case_year) DO UPDATE SET
+            query_id = excluded.query_id,
+            timestamp = excluded.timestamp,
+            parsed_data_json = excluded.parsed_data_json
+    ''', (court, case_type, case_number, case_year, query_id, timestamp, data_json))
+    
+    changes = diff_case_data(old_data, data)
+    if changes:
+        conn.execute('''
+            INSERT INTO case_history (court, case_type, case_number, case_year, query_id, timestamp, changes_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (court, case_type, case_number, case_year, query_id, timestamp, json_codec.dumps(changes)))
+        
+        # A first sighting is not a change anyone needs to hear about
+        watched = {field: changes[field] for field in WATCHED_FIELDS if field in changes}
+        if watched and old_data is not None:
+            conn.execute('''
+                INSERT INTO case_events (
+                    court, case_type, case_number, case_year, query_id, timestamp,
+                    petitioner, respondent, changes_json
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (court, case_type, case_number, case_year, query_id, timestamp,
+                  data.get('petitioner'), data.get('respondent'), json_codec.dumps(watched)))
+    return changes
+
+def log_query(case_type, case_number, case_year, result, court=DEFAULT_COURT):
     """Logs a query and its result to the database."""
     try:
         conn = sqlite3.connect(DB_NAME)
@@ -64,7 +321,7 @@ def log_query(case_type, case_number, case_year, result):
         if was_successful and result.get('data'):
             try:
                 # Ensure data is serializable
-                parsed_data_json = json.dumps(result['data'], ensure_ascii=False, indent=2)
+                parsed_data_json = json_codec.dumps(result['data'])
             except (TypeError, ValueError) as e:
                 print(f"⚠️  JSON serialization error: {e}")
                 parsed_data_json = json.dumps({"error": f"Serialization failed: {str(e)}"})
@@ -74,16 +331,22 @@ def log_query(case_type, case_number, case_year, result):
         # Insert with proper error handling
         cursor.execute('''
             INSERT INTO queries (
-                timestamp, case_type, case_number, case_year, 
+                timestamp, court, case_type, case_number, case_year, 
                 was_successful, error_message, parsed_data_json, raw_response_html
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
-            timestamp, case_type, case_number, case_year, 
+            timestamp, court, case_type, case_number, case_year, 
             was_successful, error_message, parsed_data_json, raw_html
         ))
 
         query_id = cursor.lastrowid
+        
+        # Keep the one-row-per-case view current in the same transaction
+        if was_successful and isinstance(result.get('data'), dict):
+            update_current_case(conn, case_type, case_number, case_year,
+                                query_id, timestamp, result['data'], court=court)
+        
         conn.commit()
         conn.close()
         
@@ -91,7 +354,7 @@ def log_query(case_type, case_number, case_year, result):
         status = "✅ SUCCESS" if was_successful else "❌ FAILED"
         print(f"📝 Query logged to database:")
         print(f"   ID: {query_id}")
-        print(f"   Case: {case_type} {case_number}/{case_year}")
+        print(f"   Case: {case_type} {case_number}/{case_year} ({court})")
         print(f"   Status: {status}")
         print(f"   Timestamp: {timestamp}")
         
@@ -109,14 +372,22 @@ def log_query(case_type, case_number, case_year, result):
         print(f"❌ Failed to log query to database: {e}")
         raise
 
-def get_query_by_id(query_id):
-    """Retrieve a specific query by ID"""
+# Every queries column except the raw HTML snapshot, for display paths
+QUERY_COLUMNS = '''id, timestamp, court, case_type, case_number, case_year, was_successful,
+       error_message, parsed_data_json, created_at'''
+
+def get_query_by_id(query_id, include_raw_html=True):
+    """Retrieve a specific query by ID
+
+    Pass ``include_raw_html=False`` to skip reading the (large) HTML snapshot.
+    """
     try:
         conn = sqlite3.connect(DB_NAME)
         conn.row_factory = sqlite3.Row  # This allows dict-like access
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM queries WHERE id = ?', (query_id,))
+        columns = '*' if include_raw_html else QUERY_COLUMNS
+        cursor.execute(f'SELECT {columns} FROM queries WHERE id = ?', (query_id,))
         row = cursor.fetchone()
         conn.close()
         
@@ -135,6 +406,118 @@ def get_query_by_id(query_id):
         print(f"❌ Failed to retrieve query {query_id}: {e}")
         return None
 
+def get_queries_by_ids(query_ids, include_raw_html=False):
+    """Fetch many queries in as few round trips as possible; returns {id: row}"""
+    ids = list(dict.fromkeys(int(i) for i in query_ids))
+    results = {}
+    if not ids:
+        return results
+    try:
+        conn = sqlite3.connect(DB_NAME)
+        conn.row_factory = sqlite3.Row
+        columns = '*' if include_raw_html else QUERY_COLUMNS
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            chunk = ids[start:start + MAX_SQL_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT {columns} FROM queries WHERE id IN ({placeholders})', chunk
+            ).fetchall()
+            for row in rows:
+                results[row['id']] = dict(row)
+        conn.close()
+        return results
+        
+    except Exception as e:
+        print(f"❌ Failed to retrieve queries by id: {e}")
+        return {}
+
+def get_current_case(case_type, case_number, case_year, court=DEFAULT_COURT):
+    """Latest successful data for a case, shaped like a queries row (id is the query id)"""
+    try:
+        conn = sqlite3.connect(DB_NAME)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('''
+            SELECT query_id, timestamp, court, case_type, case_number, case_year, parsed_data_json
+            FROM case_current
+            WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+        ''', (court, case_type, case_number, case_year)).fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        result = dict(row)
+        result['id'] = result.pop('query_id')
+        result['was_successful'] = True
+        try:
+            result['parsed_data'] = json_codec.loads(result['parsed_data_json'])
+        except json_codec.JSONDecodeError:
+            result['parsed_data'] = None
+        return result
+        
+    except Exception as e:
+        print(f"❌ Failed to get current case: {e}")
+        return None
+
+def get_current_cases(keys):
+    """Latest successful data for many cases; returns {key: row}
+
+    ``keys`` are (court, case_type, case_number, case_year) tuples.  Rows are
+    shaped like queries rows, without the parsed ``parsed_data`` dict.
+    """
+    keys = list(dict.fromkeys(tuple(k) for k in keys))
+    results = {}
+    if not keys:
+        return results
+    try:
+        conn = sqlite3.connect(DB_NAME)
+        conn.row_factory = sqlite3.Row
+        per_chunk = MAX_SQL_PARAMS // 4
+        for start in range(0, len(keys), per_chunk):
+            chunk = keys[start:start + per_chunk]
+            values = ','.join(['(?, ?, ?, ?)'] * len(chunk))
+            rows = conn.execute(f'''
+                SELECT query_id AS id, timestamp, court, case_type, case_number, case_year, parsed_data_json
+                FROM case_current
+                WHERE (court, case_type, case_number, case_year) IN (VALUES {values})
+            ''', [part for key in chunk for part in key]).fetchall()
+            for row in rows:
+                result = dict(row)
+                result['was_successful'] = True
+                result['error_message'] = None
+                results[(row['court'], row['case_type'], row['case_number'], row['case_year'])] = result
+        conn.close()
+        return results
+        
+    except Exception as e:
+        print(f"❌ Failed to get current cases: {e}")
+        return {}
+
+def get_case_history(case_type, case_number, case_year, limit=100, court=DEFAULT_COURT):
+    """Field changes recorded for a case, newest first"""
+    try:
+        conn = sqlite3.connect(DB_NAME)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute('''
+            SELECT query_id, timestamp, changes_json FROM case_history
+            WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (court, case_type, case_number, case_year, limit)).fetchall()
+        conn.close()
+        
+        return [
+            {
+                'query_id': row['query_id'],
+                'timestamp': row['timestamp'],
+                'changes': json_codec.loads(row['changes_json'])
+            }
+            for row in rows
+        ]
+        
+    except Exception as e:
+        print(f"❌ Failed to get case history: {e}")
+        return []
+
 def get_recent_queries(limit=10):
     """Get recent queries for dashboard display"""
     try:
@@ -143,7 +526,7 @@ def get_recent_queries(limit=10):
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, timestamp, case_type, case_number, case_year, 
+            SELECT id, timestamp, court, case_type, case_number, case_year, 
                    was_successful, error_message
             FROM queries 
             ORDER BY timestamp DESC 
@@ -159,7 +542,7 @@ def get_recent_queries(limit=10):
         print(f"❌ Failed to get recent queries: {e}")
         return []
 
-def search_cases(case_type=None, case_number=None, case_year=None):
+def search_cases(case_type=None, case_number=None, case_year=None, court=None):
     """Search for existing cases in database"""
     try:
         conn = sqlite3.connect(DB_NAME)
@@ -170,6 +553,9 @@ def search_cases(case_type=None, case_number=None, case_year=None):
         where_conditions = []
         params = []
         
+        if court:
+            where_conditions.append("court = ?")
+            params.append(court)
         if case_type:
             where_conditions.append("case_type = ?")
             params.append(case_type)
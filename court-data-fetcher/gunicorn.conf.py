@@ -0,0 +1,34 @@
+# gunicorn.conf.py - Production settings for the Court Data Fetcher
+#
+#   pip install "flask[async]" gunicorn
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Threaded workers: each request thread runs its async view on its own loop,
+# while DB calls and scrapes go to the per-process pools in runtime.py
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get('WEB_THREADS', '8'))
+
+# Scrapes can wait on a human CAPTCHA for several minutes
+timeout = int(os.environ.get('WEB_TIMEOUT', '660'))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master; create_app() starts no threads, and
+# runtime.py rebuilds its pools in each forked worker
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+
+def worker_exit(server, worker):
+    """Close the worker's browser pool before it exits."""
+    import runtime
+    runtime.shutdown()
@@ -0,0 +1,556 @@
+# job_queue.py - Pluggable scrape job queue shared by the web app and workers
+"""
+The web app enqueues one job per case it needs scraped and waits for the
+outcome; workers (``worker.py``, or consumers inside the web process) claim
+jobs, scrape them and write the result through ``database.log_query``.
+
+Three interchangeable backends, chosen by ``SCRAPE_QUEUE_URL``:
+
+* ``memory://``            - in-process queue (default); the web process runs
+                             its own consumers on the scraper loop,
+* ``sqlite:///path.db``    - a table in a SQLite file shared by every process
+                             on one host (``sqlite://`` uses the app database),
+* ``redis://host:6379/0``  - any Redis-protocol server, for workers spread
+                             over several machines (needs ``redis``).
+
+All of them give the same guarantees: a claimed job is invisible to other
+workers until its visibility timeout passes, so a crashed worker's job is
+picked up again; failures are retried with exponential backoff; a job that
+has used up ``SCRAPE_MAX_ATTEMPTS`` is dead-lettered.  Enqueueing a case that
+already has a pending job returns the existing job id.
+"""
+import heapq
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - depends on the environment
+    redis = None
+
+SCRAPE_QUEUE_URL = os.environ.get('SCRAPE_QUEUE_URL', 'memory://')
+# Longest a single scrape may run: the scraper waits up to SCRAPER_RESULT_TIMEOUT_MS
+# (scraper.py) for a human to solve the CAPTCHA, plus page loads and settling
+SCRAPE_JOB_TIMEOUT = float(os.environ.get(
+    'SCRAPE_JOB_TIMEOUT', str(int(os.environ.get('SCRAPER_RESULT_TIMEOUT_MS', '600000')) / 1000 + 30)))
+# Workers give up on a scrape at 0.9 of their lease, so the default lease outlasts the longest one
+SCRAPE_VISIBILITY_TIMEOUT = float(os.environ.get('SCRAPE_VISIBILITY_TIMEOUT', str(round(SCRAPE_JOB_TIMEOUT / 0.9) + 1)))
+SCRAPE_MAX_ATTEMPTS = int(os.environ.get('SCRAPE_MAX_ATTEMPTS', '3'))
+SCRAPE_RETRY_BASE_SECONDS = float(os.environ.get('SCRAPE_RETRY_BASE_SECONDS', '5'))
+# How long finished jobs are kept so their submitters can read the outcome
+SCRAPE_RESULT_TTL = int(os.environ.get('SCRAPE_RESULT_TTL', '3600'))
+
+# Job states
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+
+class ScrapeJob:
+    """A claimed job; ``token`` identifies this particular lease."""
+    __slots__ = ('id', 'court', 'case_type', 'case_number', 'case_year', 'attempts', 'token')
+
+    def __init__(self, id, court, case_type, case_number, case_year, attempts, token):
+        self.id = id
+        self.court = court
+        self.case_type = case_type
+        self.case_number = case_number
+        self.case_year = case_year
+        self.attempts = attempts
+        self.token = token
+
+    def __repr__(self):
+        return (f"ScrapeJob({self.id}, {self.court} {self.case_type} "
+                f"{self.case_number}/{self.case_year}, attempt {self.attempts})")
+
+
+def _dedupe_key(court, case_type, case_number, case_year):
+    return f"{court}|{case_type}|{case_number}|{case_year}"
+
+
+class JobQueue:
+    """
+    Interface shared by the backends.
+
+    ``claim`` leases the next visible job; the holder must call ``complete``,
+    ``retry`` or ``dead_letter`` with the same job before the lease expires.
+    Calls made with an expired lease are ignored and return False.
+    """
+
+    # True when jobs only live in this process, so it must run its own consumers
+    local = False
+
+    def __init__(self, visibility_timeout=None, max_attempts=None, retry_base=None):
+        self.visibility_timeout = visibility_timeout or SCRAPE_VISIBILITY_TIMEOUT
+        self.max_attempts = max_attempts or SCRAPE_MAX_ATTEMPTS
+        self.retry_base = SCRAPE_RETRY_BASE_SECONDS if retry_base is None else retry_base
+
+    def retry_delay(self, attempts):
+        return self.retry_base * (2 ** max(0, attempts - 1))
+
+    def is_final_attempt(self, job):
+        return job.attempts >= self.max_attempts
+
+    def enqueue(self, case_type, case_number, case_year, court):
+        """Queue a scrape; returns the job id (an existing one if the case is already pending)."""
+        raise NotImplementedError
+
+    def claim(self, worker_id=None):
+        """Lease the next visible job, or return None when there is nothing to do."""
+        raise NotImplementedError
+
+    def complete(self, job, query_id):
+        raise NotImplementedError
+
+    def retry(self, job, error):
+        """Make the job visible again after a backoff delay."""
+        raise NotImplementedError
+
+    def dead_letter(self, job, error, query_id=None):
+        raise NotImplementedError
+
+    def result(self, job_id):
+        """``{'status', 'attempts', 'query_id', 'error'}`` for a job, or None if unknown/expired."""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryQueue(JobQueue):
+    """In-process queue; jobs are lost when the process exits."""
+
+    local = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._ready = []          # heap of (visible_at, job id)
+        self._leased = {}         # job id -> lease deadline
+        self._pending = {}        # dedupe key -> job id
+        self._finished = OrderedDict()  # job id -> finished_at, oldest first
+        self._dead = 0
+        self._next_id = 1
+
+    def enqueue(self, case_type, case_number, case_year, court):
+        key = _dedupe_key(court, case_type, case_number, case_year)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = {
+                'court': court, 'case_type': case_type, 'case_number': case_number,
+                'case_year': case_year, 'status': QUEUED, 'attempts': 0,
+                'token': None, 'query_id': None, 'error': None, 'key': key,
+            }
+            self._pending[key] = job_id
+            heapq.heappush(self._ready, (0.0, job_id))
+            return job_id
+
+    def _expire_leases(self, now):
+        for job_id, deadline in list(self._leased.items()):
+            if deadline > now:
+                continue
+            del self._leased[job_id]
+            job = self._jobs[job_id]
+            if job['attempts'] >= self.max_attempts:
+                self._finish(job_id, DEAD, error='visibility timeout expired', now=now)
+            else:
+                job['status'] = QUEUED
+                heapq.heappush(self._ready, (now, job_id))
+
+    def _finish(self, job_id, status, query_id=None, error=None, now=None):
+        job = self._jobs[job_id]
+        job.update(status=status, query_id=query_id, error=error, token=None)
+        self._pending.pop(job['key'], None)
+        self._finished[job_id] = now or time.time()
+        if status == DEAD:
+            self._dead += 1
+        # Forget outcomes nobody has asked for within the TTL
+        cutoff = (now or time.time()) - SCRAPE_RESULT_TTL
+        while self._finished:
+            oldest_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff:
+                break
+            del self._finished[oldest_id]
+            self._jobs.pop(oldest_id, None)
+
+    def claim(self, worker_id=None):
+        now = time.time()
+        with self._lock:
+            self._expire_leases(now)
+            while self._ready and self._ready[0][0] <= now:
+                _, job_id = heapq.heappop(self._ready)
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != QUEUED:
+                    continue
+                job['status'] = LEASED
+                job['attempts'] += 1
+                job['token'] = uuid.uuid4().hex
+                self._leased[job_id] = now + self.visibility_timeout
+                return ScrapeJob(job_id, job['court'], job['case_type'], job['case_number'],
+                                 job['case_year'], job['attempts'], job['token'])
+            return None
+
+    def _holds_lease(self, job):
+        stored = self._jobs.get(job.id)
+        return stored is not None and stored['status'] == LEASED and stored['token'] == job.token
+
+    def complete(self, job, query_id):
+        with self._lock:
+            if not self._holds_lease(job):
+                return False
+            del self._leased[job.id]
+            self._finish(job.id, DONE, query_id=query_id)
+            return True
+
+    def retry(self, job, error):
+        with self._lock:
+            if not self._holds_lease(job):
+                return False
+            del self._leased[job.id]
+            stored = self._jobs[job.id]
+            stored.update(status=QUEUED, error=error, token=None)
+            heapq.heappush(self._ready, (time.time() + self.retry_delay(job.attempts), job.id))
+            return True
+
+    def dead_letter(self, job, error, query_id=None):
+        with self._lock:
+            if not self._holds_lease(job):
+                return False
+            del self._leased[job.id]
+            self._finish(job.id, DEAD, query_id=query_id, error=error)
+            return True
+
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {'status': job['status'], 'attempts': job['attempts'],
+                    'query_id': job['query_id'], 'error': job['error']}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'queued': len(self._pending) - len(self._leased),
+                'leased': len(self._leased),
+                'dead': self._dead,
+            }
+
+
+class SQLiteQueue(JobQueue):
+    """Queue stored in a ``scrape_jobs`` table; safe across processes on one host."""
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self._path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                court TEXT NOT NULL,
+                case_type TEXT NOT NULL,
+                case_number TEXT NOT NULL,
+                case_year TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL DEFAULT 0,
+                lease_token TEXT,
+                worker TEXT,
+                query_id INTEGER,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+        ''')
+        # Claims scan pending jobs by visibility; finished rows are outside the index
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_scrape_jobs_pending
+            ON scrape_jobs(visible_at) WHERE status IN ('queued', 'leased')
+        ''')
+        # At most one pending job per case
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_scrape_jobs_case
+            ON scrape_jobs(court, case_type, case_number, case_year) WHERE status IN ('queued', 'leased')
+        ''')
+        conn.commit()
+
+    def _connect(self):
+        # One connection per thread; workers call in from executor threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self._path is None:
+                import database
+                self._path = database.DB_NAME
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, case_type, case_number, case_year, court):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''
+                SELECT id FROM scrape_jobs
+                WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+                  AND status IN ('queued', 'leased')
+            ''', (court, case_type, case_number, case_year)).fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                job_id = conn.execute('''
+                    INSERT INTO scrape_jobs (court, case_type, case_number, case_year, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (court, case_type, case_number, case_year, time.time())).lastrowid
+            conn.execute('COMMIT')
+            return job_id
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def claim(self, worker_id=None):
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock, so two workers never lease the same row
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('''
+                UPDATE scrape_jobs
+                SET status = 'dead', lease_token = NULL, finished_at = ?,
+                    last_error = COALESCE(last_error, 'visibility timeout expired')
+                WHERE status = 'leased' AND visible_at <= ? AND attempts >= ?
+            ''', (now, now, self.max_attempts))
+            row = conn.execute('''
+                SELECT id, court, case_type, case_number, case_year, attempts FROM scrape_jobs
+                WHERE status IN ('queued', 'leased') AND visible_at <= ?
+                ORDER BY visible_at, id LIMIT 1
+            ''', (now,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            token = uuid.uuid4().hex
+            conn.execute('''
+                UPDATE scrape_jobs
+                SET status = 'leased', attempts = attempts + 1, visible_at = ?, lease_token = ?, worker = ?
+                WHERE id = ?
+            ''', (now + self.visibility_timeout, token, worker_id, row[0]))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return ScrapeJob(row[0], row[1], row[2], row[3], row[4], row[5] + 1, token)
+
+    def _update_leased(self, job, assignments, params):
+        conn = self._connect()
+        cursor = conn.execute(f'''
+            UPDATE scrape_jobs SET {assignments}
+            WHERE id = ? AND status = 'leased' AND lease_token = ?
+        ''', (*params, job.id, job.token))
+        return cursor.rowcount == 1
+
+    def complete(self, job, query_id):
+        return self._update_leased(
+            job, "status = 'done', lease_token = NULL, query_id = ?, finished_at = ?",
+            (query_id, time.time()))
+
+    def retry(self, job, error):
+        return self._update_leased(
+            job, "status = 'queued', lease_token = NULL, visible_at = ?, last_error = ?",
+            (time.time() + self.retry_delay(job.attempts), error))
+
+    def dead_letter(self, job, error, query_id=None):
+        return self._update_leased(
+            job, "status = 'dead', lease_token = NULL, query_id = ?, last_error = ?, finished_at = ?",
+            (query_id, error, time.time()))
+
+    def result(self, job_id):
+        row = self._connect().execute(
+            'SELECT status, attempts, query_id, last_error FROM scrape_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'attempts': row[1], 'query_id': row[2], 'error': row[3]}
+
+    def purge_finished(self, older_than=None):
+        """Delete finished (done) jobs older than ``older_than`` seconds; dead jobs are kept."""
+        cutoff = time.time() - (SCRAPE_RESULT_TTL if older_than is None else older_than)
+        cursor = self._connect().execute(
+            "DELETE FROM scrape_jobs WHERE status = 'done' AND finished_at < ?", (cutoff,))
+        return cursor.rowcount
+
+    def stats(self):
+        counts = dict(self._connect().execute(
+            'SELECT status, COUNT(*) FROM scrape_jobs GROUP BY status').fetchall())
+        return {'backend': 'sqlite', **{status: counts.get(status, 0) for status in (QUEUED, LEASED, DONE, DEAD)}}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Each script runs atomically on the server, which is what makes claims safe
+# across hosts.  Times are passed in by the caller rather than read with TIME.
+_REDIS_ENQUEUE = '''
+local existing = redis.call('GET', KEYS[3])
+if existing then return tonumber(existing) end
+local job_id = redis.call('INCR', KEYS[1])
+local job_key = ARGV[1] .. job_id
+redis.call('HSET', job_key, 'court', ARGV[2], 'case_type', ARGV[3], 'case_number', ARGV[4],
+           'case_year', ARGV[5], 'status', 'queued', 'attempts', 0, 'dedupe', KEYS[3])
+redis.call('ZADD', KEYS[2], 0, job_id)
+redis.call('SET', KEYS[3], job_id)
+return job_id
+'''
+
+_REDIS_CLAIM = '''
+local now = tonumber(ARGV[2])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, job_id in ipairs(expired) do
+    local job_key = ARGV[1] .. job_id
+    redis.call('ZREM', KEYS[2], job_id)
+    if tonumber(redis.call('HGET', job_key, 'attempts') or 0) >= tonumber(ARGV[4]) then
+        redis.call('HSET', job_key, 'status', 'dead', 'token', '', 'error', 'visibility timeout expired')
+        redis.call('DEL', redis.call('HGET', job_key, 'dedupe'))
+        redis.call('EXPIRE', job_key, ARGV[6])
+        redis.call('LPUSH', KEYS[3], job_id)
+    else
+        redis.call('HSET', job_key, 'status', 'queued')
+        redis.call('ZADD', KEYS[1], now, job_id)
+    end
+end
+local ready = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 1)
+if #ready == 0 then return false end
+local job_id = ready[1]
+local job_key = ARGV[1] .. job_id
+redis.call('ZREM', KEYS[1], job_id)
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), job_id)
+local attempts = redis.call('HINCRBY', job_key, 'attempts', 1)
+redis.call('HSET', job_key, 'status', 'leased', 'token', ARGV[5])
+local job = redis.call('HMGET', job_key, 'court', 'case_type', 'case_number', 'case_year')
+return {job_id, job[1], job[2], job[3], job[4], attempts}
+'''
+
+# ARGV: job key, token, new status, visible_at (retry only), error, query_id, result ttl, job id
+_REDIS_FINISH = '''
+local job_key = ARGV[1]
+if redis.call('HGET', job_key, 'token') ~= ARGV[2] or redis.call('HGET', job_key, 'status') ~= 'leased' then
+    return 0
+end
+local job_id = ARGV[8]
+redis.call('ZREM', KEYS[2], job_id)
+redis.call('HSET', job_key, 'status', ARGV[3], 'token', '', 'error', ARGV[5], 'query_id', ARGV[6])
+if ARGV[3] == 'queued' then
+    redis.call('ZADD', KEYS[1], ARGV[4], job_id)
+else
+    redis.call('DEL', redis.call('HGET', job_key, 'dedupe'))
+    redis.call('EXPIRE', job_key, ARGV[7])
+    if ARGV[3] == 'dead' then redis.call('LPUSH', KEYS[3], job_id) end
+end
+return 1
+'''
+
+
+class RedisQueue(JobQueue):
+    """
+    Queue on a Redis-protocol server (Redis, Valkey, KeyDB, ...) for workers on
+    several hosts.  Pass ``client`` to use an existing connection (or an
+    in-memory stand-in such as fakeredis).
+    """
+
+    def __init__(self, url=None, client=None, prefix='scrape', **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            if redis is None:
+                raise RuntimeError("the redis package is required for redis:// queues (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._prefix = prefix
+        self._keys = [f'{prefix}:ready', f'{prefix}:leased', f'{prefix}:dead']
+        self._enqueue = client.register_script(_REDIS_ENQUEUE)
+        self._claim = client.register_script(_REDIS_CLAIM)
+        self._finish = client.register_script(_REDIS_FINISH)
+
+    def _job_key(self, job_id):
+        return f'{self._prefix}:job:{job_id}'
+
+    def enqueue(self, case_type, case_number, case_year, court):
+        dedupe = f'{self._prefix}:pending:{_dedupe_key(court, case_type, case_number, case_year)}'
+        return int(self._enqueue(keys=[f'{self._prefix}:seq', self._keys[0], dedupe],
+                                 args=[f'{self._prefix}:job:', court, case_type, case_number, case_year]))
+
+    def claim(self, worker_id=None):
+        token = uuid.uuid4().hex
+        row = self._claim(keys=self._keys,
+                          args=[f'{self._prefix}:job:', time.time(), self.visibility_timeout,
+                                self.max_attempts, token, SCRAPE_RESULT_TTL])
+        if not row:
+            return None
+        job_id, court, case_type, case_number, case_year, attempts = (
+            value.decode('utf-8') if isinstance(value, bytes) else value for value in row)
+        return ScrapeJob(int(job_id), court, case_type, case_number, case_year, int(attempts), token)
+
+    def _finish_job(self, job, status, visible_at=0, error='', query_id=''):
+        return bool(self._finish(keys=self._keys, args=[
+            self._job_key(job.id), job.token, status, visible_at, error or '',
+            '' if query_id is None else query_id, SCRAPE_RESULT_TTL, job.id]))
+
+    def complete(self, job, query_id):
+        return self._finish_job(job, DONE, query_id=query_id)
+
+    def retry(self, job, error):
+        return self._finish_job(job, QUEUED, visible_at=time.time() + self.retry_delay(job.attempts), error=error)
+
+    def dead_letter(self, job, error, query_id=None):
+        return self._finish_job(job, DEAD, error=error, query_id=query_id)
+
+    def result(self, job_id):
+        fields = self._redis.hmget(self._job_key(job_id), 'status', 'attempts', 'query_id', 'error')
+        status, attempts, query_id, error = (
+            value.decode('utf-8') if isinstance(value, bytes) else value for value in fields)
+        if status is None:
+            return None
+        return {'status': status, 'attempts': int(attempts or 0),
+                'query_id': int(query_id) if query_id else None, 'error': error or None}
+
+    def stats(self):
+        ready, leased, dead = self._keys
+        return {
+            'backend': 'redis',
+            QUEUED: self._redis.zcard(ready),
+            LEASED: self._redis.zcard(leased),
+            DEAD: self._redis.llen(dead),
+        }
+
+    def close(self):
+        self._redis.close()
+
+
+def queue_from_url(url=None, **kwargs):
+    """Build the queue backend described by ``url`` (default ``SCRAPE_QUEUE_URL``)."""
+    url = url or SCRAPE_QUEUE_URL
+    scheme, _, rest = url.partition('://')
+    if scheme == 'memory':
+        return MemoryQueue(**kwargs)
+    if scheme == 'sqlite':
+        # sqlite:///abs/path.db, sqlite://relative.db, or sqlite:// for the app database
+        return SQLiteQueue(rest or None, **kwargs)
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisQueue(url, **kwargs)
+    raise ValueError(f"Unsupported SCRAPE_QUEUE_URL scheme '{scheme}' (use memory://, sqlite:// or redis://)")
@@ -0,0 +1,36 @@
+# json_codec.py - Fast, compact JSON encoding with an orjson fast path
+"""
+orjson is several times faster than the standard library for both encoding
+and decoding; it is optional, and everything falls back to ``json`` with
+compact separators when it is not installed.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON as bytes (for HTTP responses)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj):
+    """Compact JSON as str (for TEXT columns)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Both libraries raise a ValueError subclass on bad input
+JSONDecodeError = orjson.JSONDecodeError if orjson is not None else json.JSONDecodeError
@@ -0,0 +1,289 @@
+# maintenance.py - Retention, archival and compaction for queries.sqlite3
+"""
+Keeps the queries database small enough to stay in the page cache:
+
+1. superseded successful rows (an older success for a case that has a newer
+   one) and old failed attempts are archived to gzipped monthly JSONL files
+   and deleted,
+2. raw HTML snapshots past their retention window are dropped,
+3. freed pages are returned with ``PRAGMA incremental_vacuum`` and the
+   planner statistics are refreshed with ``ANALYZE``.
+
+Databases created before incremental auto-vacuum was enabled need one full
+``VACUUM`` to switch over; it rewrites the file under an exclusive lock, so
+it only runs when asked for with ``--vacuum``.
+
+Runs from the command line or as a background thread in each web worker;
+a row in ``maintenance_state`` makes sure only one process does the work
+per interval.
+
+Usage:
+    python maintenance.py             # run all policies now
+    python maintenance.py --dry-run   # report what would be removed
+    python maintenance.py --vacuum    # one-off full VACUUM (stop the app first)
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import database
+
+# Retention policy - all windows in days, 0 disables that policy
+RETENTION_FAILED_DAYS = int(os.environ.get('RETENTION_FAILED_DAYS', '30'))
+RETENTION_RAW_HTML_DAYS = int(os.environ.get('RETENTION_RAW_HTML_DAYS', '7'))
+# Grace period before a superseded successful row is archived, so recently
+# shared /case/<id> links keep working
+RETENTION_SUPERSEDED_DAYS = int(os.environ.get('RETENTION_SUPERSEDED_DAYS', '30'))
+# Defaults to an 'archive' directory next to the database file
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('MAINTENANCE_INTERVAL_SECONDS', str(6 * 3600)))
+
+BATCH_SIZE = 500
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_maintenance(conn):
+    """Create the table recording when each periodic job last started."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            name TEXT PRIMARY KEY,
+            last_started REAL NOT NULL
+        )
+    ''')
+    conn.commit()
+
+
+def _cutoff(days, now):
+    return (now - timedelta(days=days)).isoformat()
+
+
+def superseded_success_ids(conn, cutoff):
+    """Successful rows older than ``cutoff`` that have a newer success for the same case."""
+    rows = conn.execute('''
+        SELECT q.id FROM queries q
+        WHERE q.was_successful = 1 AND q.timestamp < ?
+          AND EXISTS (
+              SELECT 1 FROM queries n
+              WHERE n.court = q.court
+                AND n.case_type = q.case_type
+                AND n.case_number = q.case_number
+                AND n.case_year = q.case_year
+                AND n.was_successful = 1
+                AND n.timestamp > q.timestamp
+          )
+    ''', (cutoff,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def failed_ids(conn, cutoff):
+    rows = conn.execute(
+        'SELECT id FROM queries WHERE was_successful = 0 AND timestamp < ?', (cutoff,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def default_archive_dir():
+    return ARCHIVE_DIR or os.path.join(os.path.dirname(os.path.abspath(database.DB_NAME)), 'archive')
+
+
+def archive_and_delete(conn, ids, archive_dir=None):
+    """Append the rows to monthly ``queries-YYYY-MM.jsonl.gz`` files, then delete them."""
+    archive_dir = archive_dir or default_archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(
+            f'SELECT * FROM queries WHERE id IN ({placeholders}) ORDER BY id', chunk
+        ).fetchall()
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['timestamp'][:7], []).append(dict(row))
+        for month, month_rows in by_month.items():
+            # gzip files may hold several members, so appending is safe
+            path = os.path.join(archive_dir, f'queries-{month}.jsonl.gz')
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for row in month_rows:
+                    f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+                    f.write('\n')
+
+        conn.execute(f'DELETE FROM queries WHERE id IN ({placeholders})', chunk)
+        conn.commit()
+        archived += len(rows)
+    return archived
+
+
+def drop_raw_html(conn, cutoff):
+    """Clear raw HTML snapshots older than ``cutoff``; returns the number of rows touched."""
+    dropped = 0
+    while True:
+        cursor = conn.execute('''
+            UPDATE queries SET raw_response_html = NULL
+            WHERE id IN (
+                SELECT id FROM queries
+                WHERE timestamp < ? AND raw_response_html IS NOT NULL
+                LIMIT ?
+            )
+        ''', (cutoff, BATCH_SIZE))
+        conn.commit()
+        if cursor.rowcount <= 0:
+            break
+        dropped += cursor.rowcount
+    return dropped
+
+
+def compact(conn):
+    """Return free pages to the filesystem and refresh planner statistics."""
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # executescript steps the pragma to completion; a plain execute frees a single page
+    conn.executescript('PRAGMA incremental_vacuum;')
+    conn.execute('ANALYZE')
+    conn.commit()
+    # Fold the WAL back into the main file so the shrink is visible on disk
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return freelist
+
+
+def vacuum():
+    """Rebuild the database with a full VACUUM, switching it to incremental auto-vacuum.
+
+    Blocks every reader and writer for the whole rewrite and needs free disk
+    space about the size of the database.
+    """
+    started = time.perf_counter()
+    size_before = os.path.getsize(database.DB_NAME)
+    conn = _connect()
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    finally:
+        conn.close()
+    return {'bytes_before': size_before, 'bytes_after': os.path.getsize(database.DB_NAME),
+            'incremental_auto_vacuum': mode == 2, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def run_maintenance(now=None, dry_run=False, archive_dir=None):
+    """Apply every retention policy once; returns a summary dict."""
+    now = now or datetime.now()
+    started = time.perf_counter()
+    summary = {'dry_run': dry_run}
+    conn = _connect()
+    try:
+        superseded = (superseded_success_ids(conn, _cutoff(RETENTION_SUPERSEDED_DAYS, now))
+                      if RETENTION_SUPERSEDED_DAYS else [])
+        failures = failed_ids(conn, _cutoff(RETENTION_FAILED_DAYS, now)) if RETENTION_FAILED_DAYS else []
+        summary.update({
+            'superseded_rows': len(superseded),
+            'failed_rows': len(failures),
+            'raw_html_dropped': 0,
+            'pages_freed': 0,
+        })
+        if dry_run:
+            return summary
+
+        removed = superseded + failures
+        summary['archived_rows'] = archive_and_delete(conn, removed, archive_dir)
+        if RETENTION_RAW_HTML_DAYS:
+            summary['raw_html_dropped'] = drop_raw_html(conn, _cutoff(RETENTION_RAW_HTML_DAYS, now))
+        summary['pages_freed'] = compact(conn)
+
+        if removed:
+            # Deleted rows must not keep being served from this process's cache
+            from response_cache import case_cache
+            case_cache.invalidate(removed)
+    finally:
+        conn.close()
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def claim_run(name, interval):
+    """Record a start of the periodic job ``name`` unless another process did so within ``interval``.
+
+    Every web worker runs the background loops; this lets one of them do the
+    work per interval.
+    """
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    try:
+        now = time.time()
+        conn.execute('INSERT OR IGNORE INTO maintenance_state (name, last_started) VALUES (?, 0)', (name,))
+        cursor = conn.execute(
+            'UPDATE maintenance_state SET last_started = ? WHERE name = ? AND last_started <= ?',
+            (now, name, now - interval))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _maintenance_loop(interval):
+    while True:
+        try:
+            if claim_run('retention', interval):
+                summary = run_maintenance()
+                print(f"🧹 Database maintenance finished: {summary}")
+        except Exception as e:
+            print(f"❌ Database maintenance failed: {e}")
+        time.sleep(max(60, interval // 4))
+
+
+def start_background_maintenance(interval=None):
+    """Start the maintenance thread for this process (no-op if running or disabled)."""
+    global _thread
+    interval = MAINTENANCE_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_maintenance_loop, args=(interval,),
+                                       name='db-maintenance', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def _reset_after_fork():
+    global _thread, _thread_lock
+    _thread = None
+    _thread_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply retention policies to the queries database')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be removed')
+    parser.add_argument('--archive-dir', default=None, help=f'archive directory (default: {default_archive_dir()})')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='rebuild the file with a full VACUUM instead (locks the database; stop the app first)')
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.vacuum:
+        summary = vacuum()
+    else:
+        summary = run_maintenance(dry_run=args.dry_run, archive_dir=args.archive_dir)
+    print("🧹 Maintenance summary:")
+    for key, value in summary.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
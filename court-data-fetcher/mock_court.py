@@ -0,0 +1,359 @@
+# mock_court.py - Local stand-in for the Delhi High Court case status site
+"""
+Serves just enough of delhihighcourt.nic.in for the scraper to run offline:
+the home page with its "Case Status" link, the case status form, a results
+table in the markup the extraction regexes expect, and each case's orders
+page with small generated PDFs (served with ETags, so conditional requests
+can be exercised).
+
+Latency and error injection are configurable so scraper throughput and the
+browser pool can be load-tested deterministically.  The CAPTCHA accepts a
+fixed bypass token instead of needing a human.
+
+Usage:
+    python mock_court.py --port 8765 --latency 0.2 --error-rate 0.05
+    COURT_BASE_URL=http://127.0.0.1:8765 SCRAPER_CAPTCHA_BYPASS=mock-captcha python scraper.py
+"""
+import argparse
+import hashlib
+import html
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+DEFAULT_CAPTCHA_TOKEN = 'mock-captcha'
+
+STATUS_PATH = '/app/get-case-type-status'
+ORDERS_PATH = '/app/case-orders'
+ORDER_PDF_PATH = '/app/order-pdf'
+
+MOCK_CASE_TYPES = [
+    "W.P.(C)", "W.P.(CRL)", "CRL.A.", "CRL.M.C.", "CRL.REV.P.", "C.M.", "C.S.(OS)",
+    "C.S.(COMM)", "FAO(OS)", "FAO(COMM)", "RFA", "ARB.A.", "ARB.P.", "COMP.CAS(IB)",
+    "C.P.", "MAT.APP.", "L.P.A.", "C.O.", "BAIL APPLN.", "EA", "EC", "EP", "EXE",
+    "GA", "MA", "O", "P", "SA", "U",
+]
+
+PETITIONERS = ['SEEMA RANI & ORS.', 'RAJESH KUMAR', 'SHARMA TRADERS PVT. LTD.', 'SUNITA DEVI & ANR.']
+RESPONDENTS = ['MUNICIPAL CORPORATION OF DELHI', 'UNION OF INDIA & ORS.',
+               'GOVT. OF NCT OF DELHI', 'STATE BANK OF INDIA']
+STATUSES = ['PENDING', 'DISPOSED']
+ORDER_TEXTS = [
+    'Issue notice to the respondent, returnable on the next date of hearing.',
+    'The complaint under Section 138 of the Negotiable Instruments Act, 1881 is maintainable.',
+    'Counter affidavit be filed within four weeks. Rejoinder, if any, within two weeks thereafter.',
+    'Interim protection granted earlier shall continue till the next date of hearing.',
+    'In view of the settlement between the parties, the petition is disposed of.',
+]
+
+
+class MockCourtConfig:
+    """Runtime knobs for the mock server, shared by all handler threads."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, not_found_rate=0.0,
+                 captcha_token=DEFAULT_CAPTCHA_TOKEN, require_captcha=True, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.captcha_token = captcha_token
+        self.require_captcha = require_captcha
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.errors_injected = 0
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def delay(self):
+        extra = self.roll() * self.jitter if self.jitter else 0.0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+
+def fake_case(case_type, case_number, case_year):
+    """Deterministic case details for a case key, so repeated runs agree."""
+    digest = hashlib.sha256(f'{case_type}|{case_number}|{case_year}'.encode()).digest()
+    status = STATUSES[digest[2] % len(STATUSES)]
+    return {
+        'petitioner': PETITIONERS[digest[0] % len(PETITIONERS)],
+        'respondent': RESPONDENTS[digest[1] % len(RESPONDENTS)],
+        'case_status': status,
+        'last_hearing_date': f'{digest[3] % 28 + 1:02d}/{digest[4] % 12 + 1:02d}/{case_year}',
+        'next_hearing_date': 'NA' if status == 'DISPOSED' else f'{digest[5] % 28 + 1:02d}/{digest[6] % 12 + 1:02d}/2026',
+        'court_number': str(digest[7] % 40 + 1),
+    }
+
+
+def fake_orders(case_type, case_number, case_year):
+    """Deterministic list of (number, dd/mm/yyyy date, text) orders for a case."""
+    digest = hashlib.sha256(f'orders|{case_type}|{case_number}|{case_year}'.encode()).digest()
+    return [
+        (n, f'{digest[n] % 28 + 1:02d}/{n:02d}/{case_year}', ORDER_TEXTS[digest[n + 8] % len(ORDER_TEXTS)])
+        for n in range(1, digest[0] % 4 + 2)
+    ]
+
+
+def render_order_pdf(case_type, case_number, case_year, number):
+    """A minimal single-page PDF with the order text, built by hand."""
+    orders = {n: (date, text) for n, date, text in fake_orders(case_type, case_number, case_year)}
+    if number not in orders:
+        return None
+    date, text = orders[number]
+    case = fake_case(case_type, case_number, case_year)
+    lines = [
+        'IN THE HIGH COURT OF DELHI AT NEW DELHI',
+        f'{case_type} {case_number}/{case_year}',
+        f"{case['petitioner']} ..... Petitioner",
+        'versus',
+        f"{case['respondent']} ..... Respondent",
+        f'ORDER {number} dated {date}',
+        text,
+    ]
+
+    def escape(line):
+        return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    content = 'BT /F1 11 Tf 72 770 Td 16 TL ' + ' '.join(f'({escape(line)}) Tj T*' for line in lines) + ' ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+        '/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        f'<< /Length {len(content)} >>\nstream\n{content}\nendstream',
+    ]
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{i} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    return bytes(out)
+
+
+def _page(title, body):
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="UTF-8"><title>{html.escape(title)}</title></head>
+<body>
+<header><h1>High Court of Delhi</h1></header>
+<main>
+{body}
+</main>
+</body>
+</html>'''
+
+
+def render_home():
+    return _page('High Court of Delhi', f'<nav><a href="{STATUS_PATH}">Case Status</a></nav>')
+
+
+def render_form(message=''):
+    options = '\n'.join(f'<option value="{html.escape(ct)}">{html.escape(ct)}</option>'
+                        for ct in MOCK_CASE_TYPES)
+    notice = f'<p class="error">{html.escape(message)}</p>' if message else ''
+    return _page('Case Status', f'''
+{notice}
+<select name="language"><option value="Hindi" selected>Hindi</option><option value="English">English</option></select>
+<form method="post" action="{STATUS_PATH}">
+  <label>Case Type: <select name="case_type"><option value="">Select</option>{options}</select></label>
+  <label>Case Number : <input type="text" name="case_number"></label>
+  <label>Year: <input type="text" name="case_year" placeholder="Year"></label>
+  <img src="/captcha.png" alt="captcha">
+  <label>Captcha: <input type="text" name="captcha"></label>
+  <button type="submit" id="search">Submit</button>
+</form>''')
+
+
+def render_results(case_type, case_number, case_year, found=True):
+    if not found:
+        return _page('Case Status', '<p>No record found</p><p>Showing 0 to 0 of 0 entries</p>')
+
+    case = fake_case(case_type, case_number, case_year)
+    # Cells are written back to back like the live site, so the page text reads
+    # "...[PENDING]OrdersSEEMA RANI & ORS.VS.    MUNICIPAL...NEXT DATE: ..."
+    parties = f"{case['petitioner']}VS.    {case['respondent']}"
+    return _page('Case Status', f'''
+<table class="case-table">
+  <thead><tr><th>S.No.</th><th>Diary No. / Case No.[STATUS]</th><th>Petitioner Vs. Respondent</th><th>Listing Date / Court No.</th></tr></thead>
+  <tbody>
+    <tr>
+      <td>1</td>
+      <td>{html.escape(case_type)} - {html.escape(case_number)} / {html.escape(case_year)} [{case['case_status']}]<a href="{ORDERS_PATH}?case_type={quote(case_type)}&amp;case_number={quote(case_number)}&amp;case_year={quote(case_year)}">Orders</a></td><td>{html.escape(parties)}</td><td>NEXT DATE: {case['next_hearing_date']}<br>Last Date: {case['last_hearing_date']}<br>COURT NO: {case['court_number']}</td>
+    </tr>
+  </tbody>
+</table>
+
+<p>Showing 1 to 1 of 1 entries</p>''')
+
+
+def render_orders(case_type, case_number, case_year):
+    query = (f'case_type={quote(case_type)}&amp;case_number={quote(case_number)}'
+             f'&amp;case_year={quote(case_year)}')
+    rows = '\n'.join(
+        f'    <tr><td>{n}</td><td><a href="{ORDER_PDF_PATH}?{query}&amp;order={n}">'
+        f'{html.escape(case_type)} {html.escape(case_number)}/{html.escape(case_year)}</a></td>'
+        f'<td>{date}</td><td>{html.escape(text[:60])}</td></tr>'
+        for n, date, text in fake_orders(case_type, case_number, case_year))
+    return _page('Case Orders', f'''
+<table class="orders-table">
+  <thead><tr><th>S.No.</th><th>Case No. / Order Link</th><th>Date of Order</th><th>Corrigendum</th></tr></thead>
+  <tbody>
+{rows}
+  </tbody>
+</table>''')
+
+
+class MockCourtHandler(BaseHTTPRequestHandler):
+    """Request handler; the server instance carries the MockCourtConfig."""
+
+    server_version = 'MockCourt/1.0'
+
+    def log_message(self, format, *args):
+        if getattr(self.server, 'verbose', False):
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8'):
+        payload = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject(self):
+        """Apply latency and maybe fail the request; returns True if it failed."""
+        config = self.server.config
+        with config.lock:
+            config.requests_served += 1
+        config.delay()
+        if config.error_rate and config.roll() < config.error_rate:
+            with config.lock:
+                config.errors_injected += 1
+            self._send(503, _page('Service Unavailable', '<p>Service Temporarily Unavailable</p>'))
+            return True
+        return False
+
+    def _send_pdf(self, pdf):
+        etag = '"' + hashlib.sha256(pdf).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(pdf)
+
+    def do_GET(self):
+        if self._inject():
+            return
+        url = urlparse(self.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        case_key = (query.get('case_type', ''), query.get('case_number', ''), query.get('case_year', ''))
+        if path in ('/', '/index.html'):
+            self._send(200, render_home())
+        elif path == STATUS_PATH:
+            self._send(200, render_form())
+        elif path == ORDERS_PATH and all(case_key):
+            self._send(200, render_orders(*case_key))
+        elif path == ORDER_PDF_PATH and all(case_key) and query.get('order', '').isdigit():
+            pdf = render_order_pdf(*case_key, int(query['order']))
+            if pdf is None:
+                self._send(404, _page('Not Found', '<p>Order not found</p>'))
+            else:
+                self._send_pdf(pdf)
+        elif path == '/captcha.png':
+            self._send(200, b'', content_type='image/png')
+        elif path == '/stats':
+            config = self.server.config
+            self._send(200, f'{{"requests": {config.requests_served}, "errors": {config.errors_injected}}}',
+                       content_type='application/json')
+        else:
+            self._send(404, _page('Not Found', '<p>Page not found</p>'))
+
+    def do_POST(self):
+        if self._inject():
+            return
+        if urlparse(self.path).path != STATUS_PATH:
+            self._send(404, _page('Not Found', '<p>Page not found</p>'))
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        config = self.server.config
+
+        if config.require_captcha and form.get('captcha') != config.captcha_token:
+            self._send(200, render_form('Invalid Captcha'))
+            return
+
+        case_type = form.get('case_type', '')
+        case_number = form.get('case_number', '')
+        case_year = form.get('case_year', '')
+        found = bool(case_type and case_number.isdigit() and case_year)
+        if found and config.not_found_rate and config.roll() < config.not_found_rate:
+            found = False
+        self._send(200, render_results(case_type, case_number, case_year, found))
+
+
+def start_mock_court(host='127.0.0.1', port=0, config=None, verbose=False):
+    """Start the mock site on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), MockCourtHandler)
+    server.daemon_threads = True
+    server.config = config or MockCourtConfig()
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, name='mock-court', daemon=True)
+    thread.start()
+    base_url = f'http://{host}:{server.server_address[1]}'
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Delhi High Court case status site')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help='fraction of searches with no record')
+    parser.add_argument('--captcha-token', default=DEFAULT_CAPTCHA_TOKEN)
+    parser.add_argument('--no-captcha', action='store_true', help='accept any CAPTCHA answer')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    config = MockCourtConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        not_found_rate=args.not_found_rate, captcha_token=args.captcha_token,
+        require_captcha=not args.no_captcha, seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockCourtHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.verbose = args.verbose
+
+    print("🏛️  Mock court site running")
+    print(f"📍 http://{args.host}:{args.port}")
+    print(f"🔑 CAPTCHA token: {args.captcha_token if not args.no_captcha else '(disabled)'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Mock court stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
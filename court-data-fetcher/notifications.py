@@ -0,0 +1,540 @@
+# notifications.py - Fan out case change events to subscribers
+"""
+``database.log_query`` records a row in ``case_events`` whenever a re-scrape
+changes one of the watched fields (case status, next hearing date, court
+number).  That insert is all the write path pays for; everything else
+happens here, off the request path:
+
+1. new events are matched against subscriptions (a specific case, or a party
+   name appearing in the petitioner/respondent) and queued in
+   ``notification_outbox``,
+2. pending outbox rows are delivered in batches per subscription, to a
+   webhook (one JSON POST per batch), a local JSONL file, or left in the
+   SQLite outbox for a consumer to read and acknowledge.
+
+Failed deliveries are retried with exponential backoff and marked failed
+after ``NOTIFY_MAX_ATTEMPTS``.
+
+Usage:
+    python notifications.py subscribe --case "W.P.(C)" 11199 2025 --webhook https://example.org/hook
+    python notifications.py subscribe --party "SEEMA RANI" --file notifications.jsonl
+    python notifications.py dispatch
+"""
+import argparse
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+import urllib.request
+from datetime import datetime
+
+import database
+import json_codec
+
+NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', '100'))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '5'))
+NOTIFY_INTERVAL_SECONDS = int(os.environ.get('NOTIFY_INTERVAL_SECONDS', '30'))
+WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', '10'))
+# How long a dispatcher owns the outbox rows it is delivering; other workers
+# skip the subscription until the batch is settled or this lease runs out
+NOTIFY_CLAIM_SECONDS = float(os.environ.get('NOTIFY_CLAIM_SECONDS', str(max(60.0, 3 * WEBHOOK_TIMEOUT_SECONDS))))
+# Subscriptions created through the API may only write files under this
+# directory (unset: the 'file' channel is CLI-only)
+NOTIFY_FILE_DIR = os.environ.get('NOTIFY_FILE_DIR')
+# Hosts API webhooks may reach even though they resolve to private addresses
+NOTIFY_WEBHOOK_ALLOW_HOSTS = {
+    h.strip().lower() for h in os.environ.get('NOTIFY_WEBHOOK_ALLOW_HOSTS', '').split(',') if h.strip()
+}
+
+CHANNELS = ('webhook', 'file', 'outbox')
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_notifications(conn):
+    """Create the subscription and outbox tables if they don't exist."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            court TEXT,
+            case_type TEXT,
+            case_number TEXT,
+            case_year TEXT,
+            party TEXT,
+            channel TEXT NOT NULL,
+            target TEXT,
+            start_event_id INTEGER NOT NULL,
+            active BOOLEAN NOT NULL DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(subscriptions)')}
+    if 'court' not in columns:
+        conn.execute('ALTER TABLE subscriptions ADD COLUMN court TEXT')
+        conn.execute("UPDATE subscriptions SET court = 'delhi_hc' WHERE party IS NULL")
+    if 'trusted' not in columns:
+        # Created from the CLI: targets are not restricted.  Older rows may
+        # have come from the API, so they get the restricted treatment
+        conn.execute('ALTER TABLE subscriptions ADD COLUMN trusted BOOLEAN NOT NULL DEFAULT 0')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subscription_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            delivered_at TEXT,
+            claimed_by TEXT,
+            claimed_until REAL,
+            UNIQUE (subscription_id, event_id)
+        )
+    ''')
+    outbox_columns = {row[1] for row in conn.execute('PRAGMA table_info(notification_outbox)')}
+    if 'claimed_by' not in outbox_columns:
+        conn.execute('ALTER TABLE notification_outbox ADD COLUMN claimed_by TEXT')
+        conn.execute('ALTER TABLE notification_outbox ADD COLUMN claimed_until REAL')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_claimed
+        ON notification_outbox(claimed_by) WHERE claimed_by IS NOT NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending
+        ON notification_outbox(status, subscription_id, next_attempt_at)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notification_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.commit()
+
+
+def _check_webhook(url):
+    """Raise ValueError unless ``url`` is http(s) on a host that resolves only to public addresses."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("webhook target must be an http:// or https:// URL")
+    host = parts.hostname.lower()
+    if host in NOTIFY_WEBHOOK_ALLOW_HOSTS:
+        return
+    try:
+        infos = socket.getaddrinfo(host, parts.port or (443 if parts.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"webhook host {host} does not resolve") from None
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global:
+            raise ValueError(f"webhook host {host} resolves to a non-public address")
+
+
+def _check_file(path):
+    """Absolute path for an API file target; it must stay inside NOTIFY_FILE_DIR."""
+    if not NOTIFY_FILE_DIR:
+        raise ValueError("file subscriptions can only be created from the command line")
+    root = os.path.realpath(NOTIFY_FILE_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"file target must be inside {NOTIFY_FILE_DIR}")
+    return resolved
+
+
+def add_subscription(channel, target=None, case_type=None, case_number=None, case_year=None, party=None,
+                     court=None, trusted=False):
+    """Subscribe to changes for one case or for a party; returns the subscription id.
+
+    Case subscriptions default to the default court; party subscriptions
+    match every court unless one is given.  Untrusted (API) subscriptions
+    may only write files under NOTIFY_FILE_DIR and only call public webhooks;
+    ``trusted`` is for the command line.
+    """
+    if channel not in CHANNELS:
+        raise ValueError(f"channel must be one of {', '.join(CHANNELS)}")
+    if channel != 'outbox' and not target:
+        raise ValueError(f"a target is required for {channel} subscriptions")
+    if channel == 'webhook' and not trusted:
+        _check_webhook(target)
+    elif channel == 'file' and not trusted:
+        target = _check_file(target)
+    case_key = (case_type, case_number, case_year)
+    if party and any(case_key):
+        raise ValueError("subscribe to either a case or a party, not both")
+    if not party and not all(case_key):
+        raise ValueError("case_type, case_number and case_year are all required")
+    if not party and not court:
+        court = database.DEFAULT_COURT
+
+    conn = _connect()
+    try:
+        # Only events recorded after the subscription was created are delivered.  The write
+        # lock keeps fan_out from moving its cursor between reading the last id and the insert
+        conn.execute('BEGIN IMMEDIATE')
+        start_event_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM case_events').fetchone()[0]
+        cursor = conn.execute('''
+            INSERT INTO subscriptions
+                (court, case_type, case_number, case_year, party, channel, target, start_event_id, trusted)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (court, case_type, case_number, case_year, party.upper() if party else None,
+              channel, target, start_event_id, bool(trusted)))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def list_subscriptions():
+    conn = _connect()
+    try:
+        rows = conn.execute('SELECT * FROM subscriptions WHERE active = 1 ORDER BY id').fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def remove_subscription(subscription_id):
+    """Deactivate a subscription; returns True if it existed."""
+    conn = _connect()
+    try:
+        cursor = conn.execute('UPDATE subscriptions SET active = 0 WHERE id = ? AND active = 1',
+                              (subscription_id,))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _event_document(row):
+    return {
+        'event_id': row['id'],
+        'court': row['court'],
+        'case_type': row['case_type'],
+        'case_number': row['case_number'],
+        'case_year': row['case_year'],
+        'query_id': row['query_id'],
+        'timestamp': row['timestamp'],
+        'petitioner': row['petitioner'],
+        'respondent': row['respondent'],
+        'changes': json_codec.loads(row['changes_json']),
+    }
+
+
+def _subscription_index(subscriptions):
+    """Active subscriptions as ({case key: [sub, ...]}, [party sub, ...])."""
+    by_case = {}
+    by_party = []
+    for sub in subscriptions:
+        if sub['party']:
+            by_party.append(sub)
+        else:
+            by_case.setdefault((sub['court'], sub['case_type'], sub['case_number'], sub['case_year']), []).append(sub)
+    return by_case, by_party
+
+
+def fan_out(conn):
+    """Match events newer than the dispatch cursor to subscriptions; returns rows queued.
+
+    Each batch reads the cursor, the subscriptions and the events and moves
+    the cursor in one IMMEDIATE transaction.  A subscription is created under
+    the same lock, so it is either seen by the batch or starts after every
+    event the batch moves the cursor past.
+    """
+    queued = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor_row = conn.execute("SELECT value FROM notification_state WHERE name = 'fan_out_cursor'").fetchone()
+            last_event_id = cursor_row[0] if cursor_row else 0
+            events = conn.execute('''
+                SELECT id, court, case_type, case_number, case_year, petitioner, respondent
+                FROM case_events WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_event_id, NOTIFY_BATCH_SIZE * 10)).fetchall()
+            if not events:
+                conn.rollback()
+                return queued
+            by_case, by_party = _subscription_index(
+                conn.execute('SELECT * FROM subscriptions WHERE active = 1').fetchall())
+
+            outbox_rows = []
+            for event in events:
+                matched = list(by_case.get(
+                    (event['court'], event['case_type'], event['case_number'], event['case_year']), ()))
+                if by_party:
+                    parties = f"{event['petitioner'] or ''}\n{event['respondent'] or ''}".upper()
+                    matched.extend(sub for sub in by_party
+                                   if sub['party'] in parties and sub['court'] in (None, event['court']))
+                for sub in matched:
+                    if event['id'] > sub['start_event_id']:
+                        outbox_rows.append((sub['id'], event['id']))
+
+            conn.executemany(
+                'INSERT OR IGNORE INTO notification_outbox (subscription_id, event_id) VALUES (?, ?)',
+                outbox_rows)
+            conn.execute('''
+                INSERT INTO notification_state (name, value) VALUES ('fan_out_cursor', ?)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            ''', (events[-1]['id'],))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        queued += len(outbox_rows)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _deliver_webhook(url, payload, trusted=False):
+    if not trusted:
+        # Checked again here: DNS may have changed since the subscription was made
+        _check_webhook(url)
+    request = urllib.request.Request(
+        url, data=json_codec.dumps_bytes(payload), method='POST',
+        headers={'Content-Type': 'application/json', 'User-Agent': 'CourtDataFetcher/1.0'})
+    # Redirects are not followed, so a webhook cannot bounce us to an internal address
+    with _webhook_opener.open(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+        if response.status >= 300:
+            raise RuntimeError(f"webhook answered HTTP {response.status}")
+
+
+def _deliver_file(path, payload, trusted=False):
+    if not trusted:
+        path = _check_file(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for event in payload['events']:
+            f.write(json.dumps({'subscription_id': payload['subscription_id'], **event},
+                               ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+
+
+def _claim_batch(conn, subscription_id, now):
+    """Atomically take the next due batch of a subscription; empty while another worker holds one.
+
+    Every web worker runs a dispatcher, so rows are leased before delivery:
+    a batch is only claimed while no other unexpired claim exists for the
+    subscription, which also keeps each subscription's events in order.
+    Claims left by a crashed worker expire after NOTIFY_CLAIM_SECONDS.
+    """
+    token = uuid.uuid4().hex
+    conn.commit()
+    # IMMEDIATE takes the write lock up front, so the check and the claim are atomic
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        held = conn.execute('''
+            SELECT 1 FROM notification_outbox
+            WHERE subscription_id = ? AND status = 'pending' AND claimed_until > ? LIMIT 1
+        ''', (subscription_id, now)).fetchone()
+        if held is None:
+            conn.execute('''
+                UPDATE notification_outbox SET claimed_by = ?, claimed_until = ?
+                WHERE id IN (
+                    SELECT id FROM notification_outbox
+                    WHERE subscription_id = ? AND status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY event_id LIMIT ?
+                )
+            ''', (token, now + NOTIFY_CLAIM_SECONDS, subscription_id, now, NOTIFY_BATCH_SIZE))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if held is not None:
+        return []
+    return conn.execute('''
+        SELECT o.id AS outbox_id, o.attempts, e.*
+        FROM notification_outbox o JOIN case_events e ON e.id = o.event_id
+        WHERE o.claimed_by = ? ORDER BY o.event_id
+    ''', (token,)).fetchall()
+
+
+def deliver_pending(conn, now=None):
+    """Deliver due outbox rows in batches per subscription; returns (delivered, failed)."""
+    now = now or time.time()
+    subs = {row['id']: row for row in conn.execute('SELECT * FROM subscriptions').fetchall()}
+    due = conn.execute('''
+        SELECT DISTINCT subscription_id FROM notification_outbox
+        WHERE status = 'pending' AND next_attempt_at <= ?
+    ''', (now,)).fetchall()
+
+    delivered = failed = 0
+    for (subscription_id,) in due:
+        sub = subs.get(subscription_id)
+        # Outbox subscriptions are read by consumers through read_outbox/ack_outbox
+        if sub is None or sub['channel'] == 'outbox':
+            continue
+
+        while True:
+            rows = _claim_batch(conn, subscription_id, now)
+            if not rows:
+                break
+
+            outbox_ids = [row['outbox_id'] for row in rows]
+            placeholders = ','.join('?' * len(outbox_ids))
+            payload = {'subscription_id': subscription_id, 'events': [_event_document(row) for row in rows]}
+            try:
+                if sub['channel'] == 'webhook':
+                    _deliver_webhook(sub['target'], payload, sub['trusted'])
+                else:
+                    _deliver_file(sub['target'], payload, sub['trusted'])
+            except Exception as e:
+                attempts = rows[0]['attempts'] + 1
+                status = 'failed' if attempts >= NOTIFY_MAX_ATTEMPTS else 'pending'
+                conn.execute(f'''
+                    UPDATE notification_outbox
+                    SET attempts = attempts + 1, status = ?, next_attempt_at = ?, last_error = ?,
+                        claimed_by = NULL, claimed_until = NULL
+                    WHERE id IN ({placeholders})
+                ''', (status, now + 2 ** attempts * 30, str(e)[:500], *outbox_ids))
+                conn.commit()
+                failed += len(outbox_ids)
+                print(f"⚠️  Notification delivery to subscription {subscription_id} failed: {e}")
+                break
+
+            conn.execute(f'''
+                UPDATE notification_outbox
+                SET status = 'delivered', delivered_at = ?, claimed_by = NULL, claimed_until = NULL
+                WHERE id IN ({placeholders})
+            ''', (datetime.now().isoformat(), *outbox_ids))
+            conn.commit()
+            delivered += len(outbox_ids)
+    return delivered, failed
+
+
+def read_outbox(subscription_id, limit=NOTIFY_BATCH_SIZE):
+    """Pending events for an 'outbox' subscription, oldest first."""
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT o.id AS outbox_id, e.*
+            FROM notification_outbox o JOIN case_events e ON e.id = o.event_id
+            WHERE o.subscription_id = ? AND o.status = 'pending'
+            ORDER BY o.event_id LIMIT ?
+        ''', (subscription_id, limit)).fetchall()
+        return [{'outbox_id': row['outbox_id'], **_event_document(row)} for row in rows]
+    finally:
+        conn.close()
+
+
+def ack_outbox(subscription_id, outbox_ids):
+    """Mark events read through read_outbox as delivered; ids of other subscriptions are ignored."""
+    ids = list(outbox_ids)
+    if not ids:
+        return 0
+    conn = _connect()
+    try:
+        placeholders = ','.join('?' * len(ids))
+        cursor = conn.execute(f'''
+            UPDATE notification_outbox SET status = 'delivered', delivered_at = ?
+            WHERE id IN ({placeholders}) AND subscription_id = ? AND status = 'pending'
+        ''', (datetime.now().isoformat(), *ids, subscription_id))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def dispatch():
+    """Fan out new events and deliver what is due; returns a summary dict."""
+    conn = _connect()
+    try:
+        queued = fan_out(conn)
+        delivered, failed = deliver_pending(conn)
+        return {'queued': queued, 'delivered': delivered, 'failed': failed}
+    finally:
+        conn.close()
+
+
+def _dispatch_loop(interval):
+    while True:
+        try:
+            summary = dispatch()
+            if any(summary.values()):
+                print(f"📨 Notifications: {summary}")
+        except Exception as e:
+            print(f"❌ Notification dispatch failed: {e}")
+        time.sleep(interval)
+
+
+def start_background_dispatch(interval=None):
+    """Start the dispatcher thread for this process (no-op if running or disabled)."""
+    global _thread
+    interval = NOTIFY_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_dispatch_loop, args=(interval,),
+                                       name='notifications', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def _reset_after_fork():
+    global _thread, _thread_lock
+    _thread = None
+    _thread_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Case change notifications')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    subscribe = commands.add_parser('subscribe', help='add a subscription')
+    what = subscribe.add_mutually_exclusive_group(required=True)
+    what.add_argument('--case', nargs=3, metavar=('TYPE', 'NUMBER', 'YEAR'))
+    what.add_argument('--party', help='name appearing in the petitioner or respondent')
+    subscribe.add_argument('--court', help='court code (default court for --case, any court for --party)')
+    where = subscribe.add_mutually_exclusive_group(required=True)
+    where.add_argument('--webhook', metavar='URL')
+    where.add_argument('--file', metavar='PATH')
+    where.add_argument('--outbox', action='store_true', help='keep events in the SQLite outbox')
+
+    commands.add_parser('list', help='show active subscriptions')
+    remove = commands.add_parser('remove', help='deactivate a subscription')
+    remove.add_argument('subscription_id', type=int)
+    commands.add_parser('dispatch', help='fan out and deliver pending events once')
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.command == 'subscribe':
+        channel, target = (('webhook', args.webhook) if args.webhook else
+                           ('file', args.file) if args.file else ('outbox', None))
+        case_type, case_number, case_year = args.case or (None, None, None)
+        subscription_id = add_subscription(channel, target, case_type, case_number, case_year, args.party,
+                                           args.court, trusted=True)
+        print(f"✅ Subscription {subscription_id} created")
+    elif args.command == 'list':
+        for sub in list_subscriptions():
+            what = sub['party'] or f"{sub['case_type']} {sub['case_number']}/{sub['case_year']}"
+            print(f"{sub['id']}: {what} -> {sub['channel']} {sub['target'] or ''}")
+    elif args.command == 'remove':
+        print("✅ Removed" if remove_subscription(args.subscription_id) else "❌ No such subscription")
+    else:
+        print(f"📨 {dispatch()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+# order_index.py - Full-text search over downloaded order PDFs
+"""
+Extracts the text of every cached order document and indexes it page by
+page in a SQLite FTS5 table, so orders can be searched by content
+("Section 138", "interim protection", ...).
+
+Documents are indexed by their SHA-256 (the same key orders.py stores them
+under), which makes indexing incremental for free: a new or changed file is
+a new digest, an unchanged one is skipped, and a digest no order refers to
+any more is dropped from the index.
+
+Text extraction is CPU bound, so it runs on a process pool; the parent only
+writes the results.  pypdf is used when installed; otherwise a small
+built-in reader handles plain and Flate-compressed text streams, which
+covers the simple PDFs courts publish (scanned orders have no text layer
+either way).
+
+Usage:
+    python order_index.py index              # index new documents now
+    python order_index.py search "section 138"
+    python order_index.py stats
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+import orders
+
+try:
+    import pypdf
+except ImportError:  # pragma: no cover - depends on the environment
+    pypdf = None
+
+INDEX_WORKERS = int(os.environ.get('INDEX_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))
+INDEX_BATCH_SIZE = int(os.environ.get('INDEX_BATCH_SIZE', '64'))
+INDEX_INTERVAL_SECONDS = int(os.environ.get('INDEX_INTERVAL_SECONDS', '600'))
+# Pages longer than this are truncated before indexing
+INDEX_MAX_PAGE_CHARS = int(os.environ.get('INDEX_MAX_PAGE_CHARS', '100000'))
+
+# How SQLite reports a MATCH expression it cannot parse (as opposed to a database failure)
+FTS_QUERY_ERRORS = ('fts5: syntax error', 'unterminated string', 'unknown special query', 'no such column')
+
+_thread = None
+_thread_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def _connect():
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_index(conn):
+    """Create the text index tables if they don't exist."""
+    orders.init_orders(conn)
+    # One row per indexed document (success or not), so failures aren't retried forever
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_documents (
+            sha256 TEXT PRIMARY KEY,
+            pages INTEGER NOT NULL DEFAULT 0,
+            chars INTEGER NOT NULL DEFAULT 0,
+            extractor TEXT,
+            error TEXT,
+            indexed_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS order_pages USING fts5(
+            text,
+            sha256 UNINDEXED,
+            page UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_index_state (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        )
+    ''')
+    conn.commit()
+
+
+# ---------------------------------------------------------------------------
+# Text extraction (runs in worker processes)
+# ---------------------------------------------------------------------------
+
+STREAM_RE = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream', re.DOTALL)
+# Text showing operators: (string) Tj, [(a) -20 (b)] TJ, (string) ' and "
+TEXT_OP_RE = re.compile(rb'(\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|\[(?:\\.|[^\]])*\])\s*(Tj|TJ|\'|")|(T\*|\bT[dD]\b|\bET\b)')
+STRING_RE = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>')
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+           b'(': b'(', b')': b')', b'\\': b'\\'}
+
+
+def _pdf_string(token):
+    if token.startswith(b'<'):
+        digits = re.sub(rb'\s', b'', token[1:-1])
+        return bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+    body = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        byte = body[i:i + 1]
+        if byte == b'\\' and i + 1 < len(body):
+            nxt = body[i + 1:i + 2]
+            octal = re.match(rb'[0-7]{1,3}', body[i + 1:i + 4])
+            if octal:
+                out.append(int(octal.group(), 8) & 0xFF)
+                i += 1 + len(octal.group())
+                continue
+            out += ESCAPES.get(nxt, nxt)
+            i += 2
+            continue
+        out += byte
+        i += 1
+    return bytes(out)
+
+
+def _builtin_pages(data):
+    """Text of each content stream that shows text - one per page for simple PDFs."""
+    pages = []
+    for params, raw in STREAM_RE.findall(data):
+        if b'/FlateDecode' in params:
+            try:
+                raw = zlib.decompress(raw)
+            except zlib.error:
+                continue
+        elif b'/Filter' in params:
+            continue  # images and other encodings carry no text we can read
+        if b'BT' not in raw:
+            continue
+        parts = []
+        for operand, operator, layout in TEXT_OP_RE.findall(raw):
+            if layout:
+                parts.append('\n')
+                continue
+            if operator in (b"'", b'"'):
+                parts.append('\n')
+            strings = STRING_RE.findall(operand) if operand.startswith(b'[') else [operand]
+            parts.append(b''.join(_pdf_string(s) for s in strings).decode('latin-1'))
+        text = ''.join(parts)
+        if text.strip():
+            pages.append(text)
+    return pages
+
+
+def extract_text(path):
+    """Return ``(pages, extractor)`` for a PDF file."""
+    if pypdf is not None:
+        reader = pypdf.PdfReader(path)
+        return [page.extract_text() or '' for page in reader.pages], 'pypdf'
+    with open(path, 'rb') as f:
+        return _builtin_pages(f.read()), 'builtin'
+
+
+def _extract_job(sha256, path):
+    """Process pool entry point; never raises so one bad file can't fail a batch."""
+    try:
+        pages, extractor = extract_text(path)
+        pages = [' '.join(page.split())[:INDEX_MAX_PAGE_CHARS] for page in pages]
+        return sha256, pages, extractor, None
+    except Exception as e:
+        return sha256, [], None, f'{type(e).__name__}: {e}'
+
+
+# ---------------------------------------------------------------------------
+# Indexing
+# ---------------------------------------------------------------------------
+
+def pending_documents(conn, limit=None):
+    """Cached documents whose digest is not in the index yet."""
+    rows = conn.execute('''
+        SELECT DISTINCT o.sha256 FROM orders o
+        LEFT JOIN order_documents d ON d.sha256 = o.sha256
+        WHERE o.status = 'cached' AND o.sha256 IS NOT NULL AND d.sha256 IS NULL
+        LIMIT ?
+    ''', (limit or -1,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def drop_orphans(conn):
+    """Remove indexed documents that no order refers to any more."""
+    orphaned = '''
+        SELECT d.sha256 FROM order_documents d
+        WHERE NOT EXISTS (SELECT 1 FROM orders o WHERE o.sha256 = d.sha256)
+    '''
+    if conn.execute(f'SELECT EXISTS ({orphaned})').fetchone()[0] == 0:
+        return 0
+    # sha256 is UNINDEXED, so this scans the FTS table once for all orphans
+    conn.execute(f'DELETE FROM order_pages WHERE sha256 IN ({orphaned})')
+    dropped = conn.execute(f'DELETE FROM order_documents WHERE sha256 IN ({orphaned})').rowcount
+    conn.commit()
+    return dropped
+
+
+def _write_results(conn, results):
+    now = time.time()
+    pages_written = 0
+    for sha256, pages, extractor, error in results:
+        conn.executemany('INSERT INTO order_pages (text, sha256, page) VALUES (?, ?, ?)',
+                         [(text, sha256, number) for number, text in enumerate(pages, start=1) if text])
+        conn.execute('''
+            INSERT INTO order_documents (sha256, pages, chars, extractor, error, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (sha256, len(pages), sum(map(len, pages)), extractor, error, now))
+        pages_written += len(pages)
+    conn.commit()
+    return pages_written
+
+
+def index_pending(workers=None, limit=None, orders_dir=None):
+    """Extract and index every new document; returns counts and throughput."""
+    started = time.perf_counter()
+    conn = _connect()
+    summary = {'documents': 0, 'pages': 0, 'bytes': 0, 'failed': 0, 'orphans_dropped': 0}
+    try:
+        summary['orphans_dropped'] = drop_orphans(conn)
+        pending = pending_documents(conn, limit)
+        jobs = [(sha256, orders.blob_path(sha256, orders_dir)) for sha256 in pending]
+        jobs = [(sha256, path) for sha256, path in jobs if os.path.exists(path)]
+        if jobs:
+            summary['bytes'] = sum(os.path.getsize(path) for _, path in jobs)
+            workers = min(workers or INDEX_WORKERS, len(jobs))
+            # spawn: the web process has threads running, which fork would copy mid-state
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                batch = []
+                for result in pool.map(_extract_job, *zip(*jobs), chunksize=4):
+                    batch.append(result)
+                    summary['failed'] += result[3] is not None
+                    if len(batch) >= INDEX_BATCH_SIZE:
+                        summary['pages'] += _write_results(conn, batch)
+                        batch = []
+                summary['pages'] += _write_results(conn, batch)
+            summary['documents'] = len(jobs)
+
+        seconds = time.perf_counter() - started
+        summary['seconds'] = round(seconds, 3)
+        if summary['documents']:
+            summary['pages_per_sec'] = round(summary['pages'] / seconds, 1)
+            summary['mb_per_sec'] = round(summary['bytes'] / seconds / 1e6, 3)
+            conn.executemany('INSERT OR REPLACE INTO order_index_state (name, value) VALUES (?, ?)', [
+                ('last_run_at', time.time()),
+                ('last_run_documents', summary['documents']),
+                ('last_run_pages_per_sec', summary['pages_per_sec']),
+                ('last_run_mb_per_sec', summary['mb_per_sec']),
+            ])
+            conn.commit()
+    finally:
+        conn.close()
+    return summary
+
+
+def optimize(conn):
+    """Merge the FTS5 b-tree segments written by incremental inserts."""
+    conn.execute("INSERT INTO order_pages (order_pages) VALUES ('optimize')")
+    conn.commit()
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def search_orders(query, limit=20, court=None):
+    """
+    Pages matching an FTS5 query, best first, with the case and a snippet.
+
+    ``query`` uses FTS5 syntax: words are ANDed, "quoted phrases" match
+    exactly, OR / NOT / prefix* work as usual.  A malformed query raises
+    ValueError; other database errors propagate unchanged.
+    """
+    conn = _connect()
+    try:
+        # Keep the best pages inside the FTS query (its ORDER BY rank LIMIT fast path),
+        # so snippet() only runs on them, then attach every order that points at each document
+        court_pages = court_filter = ''
+        court_args = []
+        if court:
+            court_pages = 'AND sha256 IN (SELECT sha256 FROM orders WHERE court = ?)'
+            court_filter = 'WHERE o.court = ?'
+            court_args = [court]
+        params = [query, *court_args, limit, *court_args, limit]
+        rows = conn.execute(f'''
+            WITH hits AS (
+                SELECT sha256, page, rank, snippet(order_pages, 0, '[', ']', '…', 16) AS snippet
+                FROM order_pages WHERE order_pages MATCH ? {court_pages}
+                ORDER BY rank LIMIT ?
+            )
+            SELECT o.id AS order_id, o.court, o.case_type, o.case_number, o.case_year,
+                   o.order_date, h.page, h.snippet, h.rank
+            FROM hits h JOIN orders o ON o.sha256 = h.sha256
+            {court_filter}
+            ORDER BY h.rank, o.order_date DESC
+            LIMIT ?
+        ''', params).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.OperationalError as e:
+        if str(e).startswith(FTS_QUERY_ERRORS):
+            raise ValueError(str(e)) from None
+        raise
+    finally:
+        conn.close()
+
+
+def index_stats():
+    """Document/page counts, on-disk index size and the last run's throughput."""
+    conn = _connect()
+    try:
+        documents, pages, chars, failed = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(pages), 0), COALESCE(SUM(chars), 0),
+                   COALESCE(SUM(error IS NOT NULL), 0)
+            FROM order_documents
+        ''').fetchone()
+        stats = {
+            'documents': documents,
+            'pages': pages,
+            'chars': chars,
+            'failed': failed,
+            'pending': len(pending_documents(conn)),
+        }
+        try:
+            # The FTS5 shadow tables hold the inverted index
+            stats['index_bytes'] = conn.execute(
+                "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name LIKE 'order_pages%'").fetchone()[0]
+        except sqlite3.OperationalError:
+            stats['index_bytes'] = None  # SQLite built without dbstat
+        for name, value in conn.execute('SELECT name, value FROM order_index_state'):
+            stats[name] = value
+        return stats
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Background indexing
+# ---------------------------------------------------------------------------
+
+def wake():
+    """Ask the background thread to index now (e.g. after new downloads)."""
+    _wake.set()
+
+
+def _index_loop(interval):
+    from maintenance import claim_run
+
+    woken = False
+    while True:
+        try:
+            # One worker indexes per interval; a wake() (new downloads here) goes straight away
+            if claim_run('order_index', 0 if woken else interval):
+                summary = index_pending()
+                if summary['documents']:
+                    print(f"🔎 Order index updated: {summary}")
+        except Exception as e:
+            print(f"❌ Order indexing failed: {e}")
+        woken = _wake.wait(max(1, interval // 4))
+        _wake.clear()
+
+
+def start_background_indexing(interval=None):
+    """Start the indexing thread for this process (no-op if running or disabled)."""
+    global _thread
+    interval = INDEX_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_index_loop, args=(interval,),
+                                       name='order-index', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def _reset_after_fork():
+    global _thread, _thread_lock, _wake
+    _thread = None
+    _thread_lock = threading.Lock()
+    _wake = threading.Event()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text index over downloaded orders')
+    commands = parser.add_subparsers(dest='command', required=True)
+    index = commands.add_parser('index', help='index new documents')
+    index.add_argument('--workers', type=int, default=None)
+    index.add_argument('--optimize', action='store_true', help='merge index segments afterwards')
+    search = commands.add_parser('search', help='search order text')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--court', default=None)
+    commands.add_parser('stats', help='index size and throughput')
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.command == 'index':
+        print(f"🔎 {index_pending(args.workers)}")
+        if args.optimize:
+            conn = _connect()
+            try:
+                optimize(conn)
+            finally:
+                conn.close()
+    elif args.command == 'search':
+        for hit in search_orders(args.query, args.limit, args.court):
+            print(f"{hit['case_type']} {hit['case_number']}/{hit['case_year']} "
+                  f"order {hit['order_id']} ({hit['order_date']}) p.{hit['page']}: {hit['snippet']}")
+    else:
+        for key, value in index_stats().items():
+            print(f"   {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
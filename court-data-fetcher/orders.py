@@ -0,0 +1,501 @@
+# orders.py - Download and cache case orders/judgments
+"""
+A successful scrape records the URL of the case's orders page
+(``orders_url`` in the parsed data).  This module, off the request path:
+
+1. fetches that page and lists the orders through the court's adapter
+   (``CourtAdapter.parse_orders``), storing them in the ``orders`` table,
+2. downloads every order document on a bounded thread pool, streaming each
+   response to disk in chunks while hashing it,
+3. files the document under its SHA-256 (``ORDERS_DIR/ab/cd/<sha256>.pdf``),
+   so identical documents listed under several URLs are stored once.
+
+Refreshes send ``If-None-Match`` / ``If-Modified-Since`` so unchanged pages
+and documents cost a 304.  The web app serves the cached files itself.
+
+Usage:
+    python orders.py fetch "W.P.(C)" 11199 2025     # refresh one case now
+    python orders.py refresh                        # every case that is due
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import database
+from courts import DEFAULT_COURT, get_court
+
+# Defaults to an 'orders_cache' directory next to the database file
+ORDERS_DIR = os.environ.get('ORDERS_DIR')
+ORDERS_DOWNLOAD_WORKERS = int(os.environ.get('ORDERS_DOWNLOAD_WORKERS', '4'))
+ORDERS_CHUNK_SIZE = int(os.environ.get('ORDERS_CHUNK_SIZE', str(64 * 1024)))
+ORDERS_MAX_BYTES = int(os.environ.get('ORDERS_MAX_BYTES', str(50 * 1024 * 1024)))
+ORDERS_TIMEOUT_SECONDS = float(os.environ.get('ORDERS_TIMEOUT_SECONDS', '30'))
+# How often a case's orders page is re-checked for new orders
+ORDERS_REFRESH_SECONDS = int(os.environ.get('ORDERS_REFRESH_SECONDS', str(24 * 3600)))
+ORDERS_INTERVAL_SECONDS = int(os.environ.get('ORDERS_INTERVAL_SECONDS', '300'))
+ORDERS_BATCH_CASES = int(os.environ.get('ORDERS_BATCH_CASES', '20'))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+_thread = None
+_thread_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def _connect():
+    conn = sqlite3.connect(database.DB_NAME, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_orders(conn):
+    """Create the order tables if they don't exist."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            court TEXT NOT NULL,
+            case_type TEXT NOT NULL,
+            case_number TEXT NOT NULL,
+            case_year TEXT NOT NULL,
+            order_date TEXT,
+            description TEXT,
+            source_url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            sha256 TEXT,
+            size_bytes INTEGER,
+            content_type TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            error TEXT,
+            listed_at TEXT NOT NULL,
+            fetched_at TEXT,
+            UNIQUE (court, source_url)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_case
+        ON orders(court, case_type, case_number, case_year, order_date)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_sha256 ON orders(sha256)')
+    # One row per case whose orders page we know about
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_lists (
+            court TEXT NOT NULL,
+            case_type TEXT NOT NULL,
+            case_number TEXT NOT NULL,
+            case_year TEXT NOT NULL,
+            orders_url TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            checked_at REAL NOT NULL,
+            PRIMARY KEY (court, case_type, case_number, case_year)
+        ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+
+def default_orders_dir():
+    return ORDERS_DIR or os.path.join(os.path.dirname(os.path.abspath(database.DB_NAME)), 'orders_cache')
+
+
+def blob_path(sha256, orders_dir=None):
+    """Where a document with this digest lives in the content-addressed store."""
+    return os.path.join(orders_dir or default_orders_dir(), sha256[:2], sha256[2:4], f'{sha256}.pdf')
+
+
+class _SameHostRedirect(urllib.request.HTTPRedirectHandler):
+    """Follow redirects only to http(s) on the host that was asked."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        target = urllib.parse.urlsplit(newurl)
+        if target.scheme not in ('http', 'https') or target.hostname != urllib.parse.urlsplit(req.full_url).hostname:
+            raise urllib.error.HTTPError(newurl, code, f'redirect off the court site to {newurl}', headers, fp)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# Scraped links decide what we fetch, so only the court's own site is ever contacted
+_opener = urllib.request.build_opener(_SameHostRedirect)
+
+
+def _request(url, etag=None, last_modified=None):
+    headers = {'User-Agent': USER_AGENT}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return urllib.request.Request(url, headers=headers)
+
+
+def fetch_order_list(adapter, orders_url, etag=None, last_modified=None):
+    """Fetch and parse an orders page; returns (orders or None if unchanged, etag, last_modified).
+
+    Raises ValueError if the page is not on the court's own site; listed
+    documents that are not are dropped.
+    """
+    if not adapter.owns_url(orders_url):
+        raise ValueError(f'orders page {orders_url} is not on {adapter.base_url}')
+    try:
+        with _opener.open(_request(orders_url, etag, last_modified),
+                          timeout=ORDERS_TIMEOUT_SECONDS) as response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            page = response.read().decode(charset, errors='replace')
+            headers = response.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag, last_modified
+        raise
+    listed = [order for order in adapter.parse_orders(page, orders_url) if adapter.owns_url(order['url'])]
+    return listed, headers.get('ETag'), headers.get('Last-Modified')
+
+
+def download_order(order, orders_dir=None):
+    """
+    Stream one order document into the content-addressed store.
+
+    Runs on a pool thread and touches no database; returns the column
+    updates for the caller to write.
+    """
+    orders_dir = orders_dir or default_orders_dir()
+    now = datetime.now().isoformat()
+    try:
+        owned = get_court(order['court']).owns_url(order['source_url'])
+    except KeyError:
+        owned = False
+    if not owned:
+        return {'status': 'failed', 'error': "not on the court's site", 'fetched_at': now}
+    cached = order['sha256'] and os.path.exists(blob_path(order['sha256'], orders_dir))
+    request = _request(order['source_url'],
+                       order['etag'] if cached else None,
+                       order['last_modified'] if cached else None)
+    # A failed revalidation keeps serving the copy we already have
+    failed = 'cached' if cached else 'failed'
+    try:
+        response = _opener.open(request, timeout=ORDERS_TIMEOUT_SECONDS)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return {'status': 'cached', 'error': None, 'fetched_at': now}
+        return {'status': failed, 'error': f'HTTP {e.code}', 'fetched_at': now}
+    except (urllib.error.URLError, OSError) as e:
+        return {'status': failed, 'error': str(getattr(e, 'reason', e)), 'fetched_at': now}
+
+    tmp_dir = os.path.join(orders_dir, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+    try:
+        with response, os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = response.read(ORDERS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > ORDERS_MAX_BYTES:
+                    raise ValueError(f'document larger than {ORDERS_MAX_BYTES} bytes')
+                digest.update(chunk)
+                out.write(chunk)
+            headers = response.headers
+
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256, orders_dir)
+        if os.path.exists(path):
+            # Same bytes already stored under another order (or an earlier version)
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return {'status': failed, 'error': str(e), 'fetched_at': now}
+
+    return {
+        'status': 'cached',
+        'sha256': sha256,
+        'size_bytes': size,
+        'content_type': headers.get_content_type(),
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'error': None,
+        'fetched_at': now,
+    }
+
+
+def download_orders(conn, order_rows, workers=None, orders_dir=None):
+    """Download many orders concurrently; returns ``{'cached': n, 'failed': n}``."""
+    counts = {'cached': 0, 'failed': 0}
+    if not order_rows:
+        return counts
+    with ThreadPoolExecutor(max_workers=workers or ORDERS_DOWNLOAD_WORKERS,
+                            thread_name_prefix='orders') as pool:
+        futures = {pool.submit(download_order, dict(row), orders_dir): row['id'] for row in order_rows}
+        # Results are written from this thread as they arrive, so a slow
+        # download never holds the database
+        for future in as_completed(futures):
+            update = future.result()
+            columns = ', '.join(f'{name} = ?' for name in update)
+            conn.execute(f'UPDATE orders SET {columns} WHERE id = ?', (*update.values(), futures[future]))
+            conn.commit()
+            counts[update['status']] += 1
+    return counts
+
+
+def refresh_case_orders(case_type, case_number, case_year, court=DEFAULT_COURT, orders_url=None,
+                        conn=None, force=False):
+    """List a case's orders and download any that are new, failed or changed; returns a summary."""
+    own_conn = conn is None
+    conn = conn or _connect()
+    try:
+        adapter = get_court(court)
+        key = (court, case_type, case_number, case_year)
+        known = conn.execute('''
+            SELECT orders_url, etag, last_modified FROM order_lists
+            WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+        ''', key).fetchone()
+        if orders_url is None:
+            if known is None:
+                current = database.get_current_case(case_type, case_number, case_year, court=court)
+                orders_url = ((current or {}).get('parsed_data') or {}).get('orders_url')
+            else:
+                orders_url = known['orders_url']
+        if not orders_url:
+            return {'listed': 0, 'new': 0, 'cached': 0, 'failed': 0, 'error': 'no orders link for this case'}
+
+        use_validators = known is not None and known['orders_url'] == orders_url and not force
+        listed, etag, last_modified = fetch_order_list(
+            adapter, orders_url,
+            known['etag'] if use_validators else None,
+            known['last_modified'] if use_validators else None)
+        now = datetime.now().isoformat()
+        new = 0
+        if listed is not None:
+            stored = {row[0] for row in conn.execute('''
+                SELECT source_url FROM orders
+                WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+            ''', key)}
+            new = sum(order['url'] not in stored for order in listed)
+            for order in listed:
+                conn.execute('''
+                    INSERT INTO orders (court, case_type, case_number, case_year, order_date,
+                                        description, source_url, listed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (court, source_url) DO UPDATE SET
+                        order_date = excluded.order_date,
+                        description = excluded.description
+                ''', (*key, order['order_date'], order['description'], order['url'], now))
+        conn.execute('''
+            INSERT INTO order_lists (court, case_type, case_number, case_year, orders_url,
+                                     etag, last_modified, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (court, case_type, case_number, case_year) DO UPDATE SET
+                orders_url = excluded.orders_url,
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                checked_at = excluded.checked_at
+        ''', (*key, orders_url, etag, last_modified, time.time()))
+        conn.commit()
+
+        # New and failed orders always; cached ones are revalidated on a forced refresh
+        statuses = ('pending', 'failed', 'cached') if force else ('pending', 'failed')
+        to_fetch = conn.execute(f'''
+            SELECT * FROM orders
+            WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+              AND status IN ({','.join('?' * len(statuses))})
+        ''', (*key, *statuses)).fetchall()
+        summary = download_orders(conn, to_fetch)
+        if new or summary['cached']:
+            _invalidate_case_pages(conn, key)
+        # listed is None when the orders page answered 304 Not Modified
+        summary.update(listed=len(listed) if listed is not None else None, new=new)
+        return summary
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _invalidate_case_pages(conn, key):
+    """Free this process's cached results pages for the case.
+
+    Pages are cached under their ``orders_digest``, so stale copies in other
+    workers are never served; this only releases the memory early here.
+    """
+    row = conn.execute('''
+        SELECT query_id FROM case_current
+        WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+    ''', key).fetchone()
+    if row:
+        from response_cache import case_cache
+        case_cache.invalidate([row[0]])
+
+
+def due_cases(conn, limit=None, now=None):
+    """Current cases with an orders link that were never checked or are due a re-check."""
+    now = now or time.time()
+    return conn.execute('''
+        SELECT c.court, c.case_type, c.case_number, c.case_year,
+               json_extract(c.parsed_data_json, '$.orders_url') AS orders_url
+        FROM case_current c
+        LEFT JOIN order_lists l
+          ON l.court = c.court AND l.case_type = c.case_type
+         AND l.case_number = c.case_number AND l.case_year = c.case_year
+        WHERE json_extract(c.parsed_data_json, '$.orders_url') IS NOT NULL
+          AND (l.checked_at IS NULL OR l.checked_at < ?)
+        ORDER BY l.checked_at IS NOT NULL, l.checked_at
+        LIMIT ?
+    ''', (now - ORDERS_REFRESH_SECONDS, limit or ORDERS_BATCH_CASES)).fetchall()
+
+
+def refresh_due(limit=None):
+    """Refresh every case that is due; returns per-status totals."""
+    totals = {'cases': 0, 'cached': 0, 'failed': 0, 'errors': 0}
+    conn = _connect()
+    try:
+        for case in due_cases(conn, limit):
+            try:
+                summary = refresh_case_orders(case['case_type'], case['case_number'], case['case_year'],
+                                              case['court'], case['orders_url'], conn=conn)
+                totals['cached'] += summary['cached']
+                totals['failed'] += summary['failed']
+            except Exception as e:
+                totals['errors'] += 1
+                print(f"❌ Could not refresh orders for {case['case_type']} "
+                      f"{case['case_number']}/{case['case_year']}: {e}")
+            totals['cases'] += 1
+    finally:
+        conn.close()
+    return totals
+
+
+def get_case_orders(case_type, case_number, case_year, court=DEFAULT_COURT):
+    """Known orders for a case, oldest first."""
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT id, order_date, description, source_url, status, sha256, size_bytes, fetched_at
+            FROM orders
+            WHERE court = ? AND case_type = ? AND case_number = ? AND case_year = ?
+            ORDER BY order_date, id
+        ''', (court, case_type, case_number, case_year)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def orders_digest(case_orders):
+    """Short digest of a case's orders (ids and document hashes); changes whenever its page would."""
+    digest = hashlib.sha1()
+    for order in case_orders:
+        digest.update(f"{order['id']}:{order['sha256'] or ''},".encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+def query_orders_digest(query_id):
+    """``orders_digest`` of the orders of the case a stored query is about."""
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT o.id, o.sha256 FROM queries q
+            JOIN orders o ON o.court = q.court AND o.case_type = q.case_type
+             AND o.case_number = q.case_number AND o.case_year = q.case_year
+            WHERE q.id = ?
+            ORDER BY o.order_date, o.id
+        ''', (query_id,)).fetchall()
+        return orders_digest(rows)
+    finally:
+        conn.close()
+
+
+def get_order(order_id):
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM orders WHERE id = ?', (order_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def wake():
+    """Ask the background thread to look for due cases now (e.g. after a new scrape)."""
+    _wake.set()
+
+
+def _orders_loop(interval):
+    from maintenance import claim_run
+
+    woken = False
+    while True:
+        try:
+            # One worker refreshes per interval; a wake() (a new scrape here) goes straight away
+            if claim_run('orders', 0 if woken else interval):
+                totals = refresh_due()
+                if totals['cases']:
+                    print(f"📄 Order refresh finished: {totals}")
+                if totals['cached']:
+                    import order_index
+                    order_index.wake()
+        except Exception as e:
+            print(f"❌ Order refresh failed: {e}")
+        woken = _wake.wait(max(1, interval // 4))
+        _wake.clear()
+
+
+def start_background_fetch(interval=None):
+    """Start the order download thread for this process (no-op if running or disabled)."""
+    global _thread
+    interval = ORDERS_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_orders_loop, args=(interval,),
+                                       name='orders-fetch', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def _reset_after_fork():
+    global _thread, _thread_lock, _wake
+    _thread = None
+    _thread_lock = threading.Lock()
+    _wake = threading.Event()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download and cache case orders')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help='refresh the orders of one case')
+    fetch.add_argument('case_type')
+    fetch.add_argument('case_number')
+    fetch.add_argument('case_year')
+    fetch.add_argument('--court', default=DEFAULT_COURT)
+    fetch.add_argument('--url', default=None, help='orders page URL (default: from the stored scrape)')
+    fetch.add_argument('--force', action='store_true', help='revalidate documents that are already cached')
+
+    refresh = commands.add_parser('refresh', help='refresh every case that is due')
+    refresh.add_argument('--limit', type=int, default=None)
+
+    args = parser.parse_args()
+    database.init_db()
+    if args.command == 'fetch':
+        summary = refresh_case_orders(args.case_type, args.case_number, args.case_year,
+                                      args.court, args.url, force=args.force)
+    else:
+        summary = refresh_due(args.limit)
+    print(f"📄 {summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# response_cache.py - In-process cache of rendered case responses
+"""
+A stored query row never changes once written, so the rendered results page
+(or JSON document) for a query id can be reused until the row is removed.
+Entries carry a strong ETag derived from the row, letting the app answer
+``If-None-Match`` with 304 without touching SQLite or Jinja.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '512'))
+# Stored cases are immutable, so shared links can be cached by browsers for a day
+CASE_CACHE_MAX_AGE = int(os.environ.get('CASE_CACHE_MAX_AGE', '86400'))
+
+
+def case_etag(row, variant=''):
+    """Strong ETag for a stored query row (id, timestamp and parsed JSON).
+
+    ``variant`` distinguishes representations of the same row (HTML page,
+    JSON document, each field projection) so their ETags never collide.
+    """
+    digest = hashlib.sha1()
+    for part in (row.get('id'), row.get('timestamp'), row.get('parsed_data_json'), variant):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return f"q{row.get('id')}-{digest.hexdigest()[:20]}"
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'mimetype')
+
+    def __init__(self, body, etag, mimetype):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+
+
+class ResponseCache:
+    """Thread-safe LRU keyed by (kind, query_id), e.g. ('html', 42)."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, query_id):
+        key = (kind, query_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, kind, query_id, body, etag, mimetype):
+        entry = CachedResponse(body, etag, mimetype)
+        with self._lock:
+            self._entries[(kind, query_id)] = entry
+            self._entries.move_to_end((kind, query_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, query_ids):
+        """Drop every cached representation of the given query ids."""
+        ids = set(query_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in ids]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Shared by all request threads in a worker process
+case_cache = ResponseCache()
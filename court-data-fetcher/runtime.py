@@ -0,0 +1,191 @@
+# runtime.py - Per-process background resources for the web app
+"""
+The Flask app needs two long-lived helpers that must not be shared across a
+fork (gunicorn/uvicorn workers fork after importing the app):
+
+* a small thread pool for blocking SQLite calls, so async views never block
+  their event loop on the database, and
+* one background event loop per process that owns the scraper's
+  ``BrowserPool``.  Playwright objects are tied to the loop that created
+  them, so every scrape is submitted to this loop instead of going through
+  ``asyncio.run`` (which would launch a new browser per request).
+
+Scrapes go through the job queue (job_queue.py).  With the default
+in-process queue this loop also runs the consumers; with a shared queue the
+jobs are normally picked up by ``worker.py`` processes, possibly on other
+hosts, and the web process only enqueues and waits for the outcome.
+
+Both are created lazily on first use and dropped in forked children, so
+building the app in a pre-fork master is safe.
+"""
+import asyncio
+import atexit
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from job_queue import SCRAPE_JOB_TIMEOUT
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '4'))
+# Consumers run inside the web process; defaults to the browser pool size for
+# the in-process queue and to none for shared queues served by worker.py
+SCRAPE_LOCAL_WORKERS = os.environ.get('SCRAPE_LOCAL_WORKERS')
+# How long a request waits for its scrape before giving up (the job carries on);
+# by default long enough for a scrape that waits on a human CAPTCHA to finish
+SCRAPE_WAIT_SECONDS = float(os.environ.get('SCRAPE_WAIT_SECONDS', str(SCRAPE_JOB_TIMEOUT + 15)))
+
+_lock = threading.Lock()
+_db_executor = None
+_scraper_loop = None
+_scraper_thread = None
+_browser_pool = None
+_scrape_queue = None
+_consumers = None
+
+
+def _reset_after_fork():
+    """Forget the parent's threads and loop; the child builds its own on demand."""
+    global _lock, _db_executor, _scraper_loop, _scraper_thread, _browser_pool, _scrape_queue, _consumers
+    _lock = threading.Lock()
+    _db_executor = None
+    _scraper_loop = None
+    _scraper_thread = None
+    _browser_pool = None
+    _scrape_queue = None
+    _consumers = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_db_executor():
+    """Thread pool used for blocking database calls."""
+    global _db_executor
+    with _lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='db')
+        return _db_executor
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database helper on the DB thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _get_scraper_loop():
+    global _scraper_loop, _scraper_thread
+    with _lock:
+        if _scraper_loop is None:
+            _scraper_loop = asyncio.new_event_loop()
+            _scraper_thread = threading.Thread(target=_scraper_loop.run_forever,
+                                               name='scraper-loop', daemon=True)
+            _scraper_thread.start()
+        return _scraper_loop
+
+
+def get_scrape_queue():
+    """The scrape job queue for this process, with local consumers started if configured."""
+    global _scrape_queue
+    with _lock:
+        if _scrape_queue is None:
+            from job_queue import queue_from_url
+            _scrape_queue = queue_from_url()
+        queue = _scrape_queue
+    _start_local_consumers(queue)
+    return queue
+
+
+def _start_local_consumers(queue):
+    global _consumers, _browser_pool
+    if _consumers is not None:
+        return
+    from scraper import SCRAPER_POOL_SIZE, BrowserPool
+    from worker import consume, default_worker_id
+
+    count = int(SCRAPE_LOCAL_WORKERS) if SCRAPE_LOCAL_WORKERS is not None else (
+        SCRAPER_POOL_SIZE if queue.local else 0)
+    loop = _get_scraper_loop()
+    with _lock:
+        if _consumers is not None:
+            return
+        if count and _browser_pool is None:
+            _browser_pool = BrowserPool()
+        worker_id = default_worker_id()
+        _consumers = [asyncio.run_coroutine_threadsafe(consume(queue, _browser_pool, f"{worker_id}/{i}"), loop)
+                      for i in range(count)]
+
+
+async def run_scrape(case_type, case_number, case_year, court=None):
+    """Queue a scrape and await its outcome from any event loop (e.g. an async Flask view).
+
+    Returns the scraper's ``{"data", "raw_html", "error"}`` shape plus
+    ``query_id`` - the worker has already stored the result with ``log_query``.
+    """
+    from courts import DEFAULT_COURT
+    from database import get_query_by_id
+
+    queue = await run_db(get_scrape_queue)
+    job_id = await run_db(queue.enqueue, case_type, case_number, case_year, court or DEFAULT_COURT)
+    deadline = time.monotonic() + SCRAPE_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        outcome = await run_db(queue.result, job_id)
+        if outcome is None or outcome['status'] in ('done', 'dead'):
+            break
+        if time.monotonic() >= deadline:
+            return {"data": None, "raw_html": None, "query_id": None,
+                    "error": "The court site is busy; your search is still queued, please try again shortly"}
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+    row = None
+    if outcome and outcome['query_id']:
+        row = await run_db(get_query_by_id, outcome['query_id'], include_raw_html=False)
+    if row is None:
+        error = (outcome or {}).get('error') or 'Scrape job was lost'
+        return {"data": None, "raw_html": None, "query_id": None, "error": error}
+    error = None if row['was_successful'] else row['error_message']
+    return {"data": row.get('parsed_data'), "raw_html": None, "query_id": row['id'], "error": error}
+
+
+async def _cancel_loop_tasks():
+    """Cancel consumers and in-flight scrapes; unfinished jobs are re-run once their lease expires."""
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def shutdown():
+    """Close the browser pool, stop the scraper loop and the DB pool."""
+    global _db_executor, _scraper_loop, _scraper_thread, _browser_pool, _scrape_queue, _consumers
+    loop, pool = _scraper_loop, _browser_pool
+    if loop is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_loop_tasks(), loop).result(timeout=5)
+        except Exception:
+            pass
+        if pool is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(pool.close(), loop).result(timeout=10)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+        if _scraper_thread is not None:
+            _scraper_thread.join(timeout=5)
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+    _db_executor = None
+    _scraper_loop = None
+    _scraper_thread = None
+    _browser_pool = None
+    if _scrape_queue is not None:
+        _scrape_queue.close()
+    _scrape_queue = None
+    _consumers = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,120 @@
+# test_job_queue.py - Lease, expiry and requeue behaviour of the scrape queue backends
+"""
+The same checks run against every backend, so the Redis Lua scripts are held
+to the guarantees the in-process and SQLite queues give.  Redis runs against
+fakeredis (with Lua support) when it is installed, otherwise it is skipped:
+
+    pip install "fakeredis[lua]"
+    python -m pytest test_job_queue.py
+"""
+import os
+import tempfile
+import time
+import unittest
+
+from job_queue import DEAD, DONE, LEASED, QUEUED, MemoryQueue, RedisQueue, SQLiteQueue
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it for EVAL
+except ImportError:
+    fakeredis = None
+
+LEASE = 0.2
+
+
+class QueueBehaviour:
+    """Mixed into one TestCase per backend; ``make_queue`` builds a fresh queue."""
+
+    def make_queue(self, **kwargs):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.queue = self.make_queue(visibility_timeout=LEASE, max_attempts=2, retry_base=0)
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_enqueue_dedupes_pending_case(self):
+        first = self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        self.assertEqual(self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc'), first)
+        self.assertNotEqual(self.queue.enqueue('W.P.(C)', '2', '2024', 'delhi_hc'), first)
+
+    def test_claim_leases_job_once(self):
+        job_id = self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        job = self.queue.claim('worker-a')
+        self.assertEqual((job.id, job.case_type, job.case_number, job.case_year, job.court, job.attempts),
+                         (job_id, 'W.P.(C)', '1', '2024', 'delhi_hc', 1))
+        self.assertIsNone(self.queue.claim('worker-b'))
+        self.assertEqual(self.queue.result(job_id)['status'], LEASED)
+
+        self.assertTrue(self.queue.complete(job, 42))
+        self.assertEqual(self.queue.result(job_id), {'status': DONE, 'attempts': 1, 'query_id': 42, 'error': None})
+        self.assertIsNone(self.queue.claim('worker-b'))
+        # Finished cases can be queued again
+        self.assertNotEqual(self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc'), job_id)
+
+    def test_expired_lease_is_claimed_again(self):
+        job_id = self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        stale = self.queue.claim('worker-a')
+        time.sleep(LEASE * 1.5)
+        job = self.queue.claim('worker-b')
+        self.assertEqual((job.id, job.attempts), (job_id, 2))
+        self.assertNotEqual(job.token, stale.token)
+        # The first worker lost its lease, so its late answer is ignored
+        self.assertFalse(self.queue.complete(stale, 1))
+        self.assertTrue(self.queue.complete(job, 2))
+        self.assertEqual(self.queue.result(job_id)['query_id'], 2)
+
+    def test_expired_lease_on_final_attempt_is_dead_lettered(self):
+        job_id = self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        self.queue.claim('worker-a')
+        time.sleep(LEASE * 1.5)
+        self.queue.claim('worker-a')
+        time.sleep(LEASE * 1.5)
+        self.assertIsNone(self.queue.claim('worker-a'))
+        self.assertEqual(self.queue.result(job_id)['status'], DEAD)
+        self.assertEqual(self.queue.stats()[DEAD], 1)
+
+    def test_retry_requeues_after_backoff(self):
+        job_id = self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        job = self.queue.claim('worker-a')
+        self.assertTrue(self.queue.retry(job, 'timeout'))
+        self.assertEqual(self.queue.result(job_id)['status'], QUEUED)
+        self.assertEqual(self.queue.stats()[QUEUED], 1)
+        self.assertFalse(self.queue.retry(job, 'timeout'))
+
+        again = self.queue.claim('worker-b')
+        self.assertEqual((again.id, again.attempts), (job_id, 2))
+        self.assertTrue(self.queue.is_final_attempt(again))
+        self.assertTrue(self.queue.dead_letter(again, 'still failing', 7))
+        self.assertEqual(self.queue.result(job_id),
+                         {'status': DEAD, 'attempts': 2, 'query_id': 7, 'error': 'still failing'})
+
+    def test_retry_backoff_hides_job(self):
+        self.queue.retry_base = 60
+        self.queue.enqueue('W.P.(C)', '1', '2024', 'delhi_hc')
+        self.queue.retry(self.queue.claim('worker-a'), 'timeout')
+        self.assertIsNone(self.queue.claim('worker-b'))
+
+
+class MemoryQueueTest(QueueBehaviour, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        return MemoryQueue(**kwargs)
+
+
+class SQLiteQueueTest(QueueBehaviour, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        return SQLiteQueue(os.path.join(self.tmp.name, 'jobs.sqlite3'), **kwargs)
+
+
+@unittest.skipIf(fakeredis is None, 'needs fakeredis with Lua support (pip install "fakeredis[lua]")')
+class RedisQueueTest(QueueBehaviour, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        return RedisQueue(client=fakeredis.FakeRedis(), prefix=f'test{id(self)}', **kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# worker.py - Scrape worker: pulls jobs from the shared queue and runs them
+"""
+Runs a browser pool and a set of consumers that claim scrape jobs, fetch the
+case through the court's adapter and store the outcome with
+``database.log_query``.  Start one per machine (or several) against a shared
+queue to add scraping capacity:
+
+    SCRAPE_QUEUE_URL=redis://queue-host:6379/0 python worker.py --concurrency 4
+    SCRAPE_QUEUE_URL=sqlite:///srv/court/queries.sqlite3 python worker.py
+
+Network failures are retried with backoff; a page that loaded but held no
+parsable case is a final answer and is recorded straight away.  Jobs that
+keep failing are dead-lettered after ``SCRAPE_MAX_ATTEMPTS`` and their last
+error is logged like any other failed query.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+import database
+from job_queue import SCRAPE_JOB_TIMEOUT, queue_from_url
+
+SCRAPE_QUEUE_POLL_SECONDS = float(os.environ.get('SCRAPE_QUEUE_POLL_SECONDS', '0.5'))
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def process_job(queue, pool, job):
+    """Scrape one claimed job and settle it on the queue; returns the final status or 'retry'."""
+    from scraper import fetch_case_data
+
+    loop = asyncio.get_running_loop()
+    try:
+        # Give up before the lease runs out, so another worker never overlaps us
+        result = await asyncio.wait_for(
+            fetch_case_data(job.case_type, job.case_number, job.case_year, pool=pool, court=job.court),
+            timeout=min(SCRAPE_JOB_TIMEOUT, queue.visibility_timeout * 0.9))
+    except Exception as e:
+        result = {"data": None, "raw_html": None, "error": f"Scraper failed: {str(e) or type(e).__name__}"}
+
+    error = result.get('error')
+    # No page at all means the site or network failed; worth another attempt
+    retryable = error is not None and result.get('raw_html') is None
+    if retryable and not queue.is_final_attempt(job):
+        await loop.run_in_executor(None, queue.retry, job, error)
+        print(f"🔁 {job} failed ({error}), will retry")
+        return 'retry'
+
+    query_id = await loop.run_in_executor(
+        None, lambda: database.log_query(job.case_type, job.case_number, job.case_year, result, court=job.court))
+    if error is None or not retryable:
+        await loop.run_in_executor(None, queue.complete, job, query_id)
+        return 'done'
+    await loop.run_in_executor(None, queue.dead_letter, job, error, query_id)
+    print(f"☠️  {job} dead-lettered after {job.attempts} attempts: {error}")
+    return 'dead'
+
+
+async def consume(queue, pool, worker_id=None, stop=None, poll_interval=None):
+    """Claim and process jobs until ``stop`` is set."""
+    loop = asyncio.get_running_loop()
+    stop = stop or asyncio.Event()
+    poll_interval = SCRAPE_QUEUE_POLL_SECONDS if poll_interval is None else poll_interval
+    while not stop.is_set():
+        try:
+            job = await loop.run_in_executor(None, queue.claim, worker_id)
+        except Exception as e:
+            print(f"❌ Could not claim a job: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await process_job(queue, pool, job)
+        except Exception as e:
+            # The lease expires and the job is retried elsewhere
+            print(f"❌ Worker error on {job}: {e}")
+
+
+async def run_worker(queue_url=None, concurrency=None, worker_id=None):
+    from scraper import SCRAPER_POOL_SIZE, BrowserPool
+
+    concurrency = concurrency or SCRAPER_POOL_SIZE
+    worker_id = worker_id or default_worker_id()
+    queue = queue_from_url(queue_url)
+    if queue.local:
+        raise SystemExit("A standalone worker needs a shared queue; set SCRAPE_QUEUE_URL to sqlite:// or redis://")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"👷 Worker {worker_id} consuming {queue.stats()} with {concurrency} browsers")
+    try:
+        async with BrowserPool(size=concurrency) as pool:
+            await asyncio.gather(*(consume(queue, pool, f"{worker_id}/{i}", stop) for i in range(concurrency)))
+    finally:
+        queue.close()
+    print(f"👋 Worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run scrape jobs from the shared queue')
+    parser.add_argument('--queue', default=None, help='queue URL (default: SCRAPE_QUEUE_URL)')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='browsers / concurrent jobs (default: SCRAPER_POOL_SIZE)')
+    parser.add_argument('--id', default=None, help='worker id recorded on claimed jobs (default: host:pid)')
+    args = parser.parse_args()
+
+    database.init_db()
+    asyncio.run(run_worker(args.queue, args.concurrency, args.id))
+
+
+if __name__ == '__main__':
+    main()
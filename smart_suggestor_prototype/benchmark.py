@@ -0,0 +1,233 @@
+# benchmark.py - Throughput checks for the Smart Suggestor engine
+"""
+Usage:
+    python benchmark.py classify --queries 50000 [--batch-size 1024]
+    python benchmark.py detect --readings 500000 --sensors 2000
+    python benchmark.py retrieve --years 5 --assets 200
+    python benchmark.py all --output results.json
+
+Queries and sensor readings are generated, so runs are repeatable with the same
+``--seed``.  Numbers are printed and, with ``--output``, written as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sensor_stream
+import suggestor_engine
+from knowledge_store import KnowledgeStore, search_terms
+from sensor_stream import AnomalyDetector, Reading
+from suggestor_engine import PhaseClassifier, train_default_model
+
+ASSETS = ["Pump A", "HVAC Unit 3", "Chiller 2", "AHU 4", "Boiler 1", "Cooling Tower", "the fan coil"]
+TEMPLATES = [
+    "why did {asset} trip last night",
+    "what is the reason {asset} is noisy",
+    "how can we optimize {asset} runtime",
+    "suggest a fix for {asset}",
+    "what was the impact of servicing {asset}",
+    "evaluate last month's work on {asset}",
+    "show me the status of {asset}",
+    "anything unusual on {asset} today",
+    "send a technician to {asset}",
+    "did the filter change on {asset} help",
+    "[{ts}] operator: {asset} running hot again",
+    "[{ts}] BMS: {asset} supply temp 14.2C setpoint 12.0C",
+]
+
+
+def legacy_classify_phase(query):
+    # The substring chain classify_phase used before the compiled rules
+    if "why" in query.lower() or "reason" in query.lower():
+        return "Investigate"
+    elif any(word in query.lower() for word in ["how", "optimize", "reduce", "suggest"]):
+        return "Implement"
+    elif any(word in query.lower() for word in ["impact", "result", "effect", "evaluate"]):
+        return "Evaluate"
+    else:
+        return "Discover"
+
+
+def generate_queries(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(asset=rng.choice(ASSETS), ts=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+            for _ in range(count)]
+
+
+def _rate(count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 4), "queries_per_second": round(count / elapsed) if elapsed else None}
+
+
+def bench_classify(count=50000, batch_size=1024, seed=0):
+    queries = generate_queries(count, seed)
+    rules_only = PhaseClassifier()
+    with_model = PhaseClassifier(model=train_default_model())
+    results = {
+        "legacy_per_query": _rate(count, lambda: [legacy_classify_phase(q) for q in queries]),
+        "rules_per_query": _rate(count, lambda: [rules_only.classify(q) for q in queries]),
+        "rules_many": _rate(count, lambda: rules_only.classify_many(queries)),
+        "rules_and_model_stream": _rate(count, lambda: list(with_model.classify_stream(queries, batch_size))),
+        "model_only_many": _rate(count, lambda: with_model.model.predict_many([q.lower() for q in queries])),
+    }
+    results["numpy"] = suggestor_engine.np is not None
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(f"⏱️  {name:24s} {value['queries_per_second']:>10,} queries/s")
+    return results
+
+
+def generate_readings(count, sensors=2000, anomaly_rate=0.0005, seed=0):
+    """An interleaved building feed: every sensor reports in turn, with rare spikes."""
+    rng = random.Random(seed)
+    kinds = ["supply_temp", "return_temp", "vibration", "power_kw", "pressure"]
+    points = [(f"{rng.choice(ASSETS[:-1]).split()[0]} {i // len(kinds) + 1}", kinds[i % len(kinds)],
+               rng.uniform(10, 100), rng.uniform(0.5, 3)) for i in range(sensors)]
+    for n in range(count):
+        asset, kind, level, noise = points[n % sensors]
+        value = rng.gauss(level, noise)
+        if rng.random() < anomaly_rate:
+            value += rng.choice((-1, 1)) * noise * rng.uniform(8, 15)
+        yield Reading(f"t{n // sensors}", asset, kind, value)
+
+
+def bench_detect(count=500000, sensors=2000, batch_size=sensor_stream.SENSOR_BATCH_SIZE, seed=0):
+    readings = list(generate_readings(count, sensors, seed=seed))
+    results = {}
+    alerts = {}
+    runs = [("per_reading", 1)]
+    if sensor_stream.np is not None:
+        runs.append(("vectorised", batch_size))
+    for name, size in runs:
+        detector = AnomalyDetector()
+        found = []
+        results[name] = _rate(count, lambda: found.extend(detector.process(readings, size)))
+        alerts[name] = len(found)
+    for name, value in results.items():
+        print(f"⏱️  {name:24s} {value['queries_per_second']:>10,} readings/s, {alerts[name]} alerts")
+        value["readings_per_second"] = value.pop("queries_per_second")
+        value["alerts"] = alerts[name]
+    results["numpy"] = sensor_stream.np is not None
+    return results
+
+
+ISSUES = [
+    ("High vibration", "vibration above limit on bearing", "replaced bearing and realigned coupling"),
+    ("Filter clogging", "pressure drop across pre-filter rising", "replaced pre-filter, increased inspection frequency"),
+    ("Overheating", "supply temperature above setpoint", "cleaned condenser coils"),
+    ("Low flow", "flow rate dropped, suction pressure low", "cleared strainer blockage"),
+    ("Tripped breaker", "motor tripped on overload", "reset breaker, tightened terminals"),
+    ("Refrigerant leak", "low suction pressure and icing", "repaired leak and recharged refrigerant"),
+    ("Noisy fan", "rattling noise from fan section", "balanced impeller"),
+]
+
+
+def generate_history(years=5, assets=200, tickets_per_asset_year=12, events_per_asset_year=150, seed=0):
+    """Tickets and sensor events spread evenly over ``years`` up to now."""
+    rng = random.Random(seed)
+    names = [f"{rng.choice(['Pump', 'Chiller', 'AHU', 'Boiler', 'Compressor'])} {i}" for i in range(assets)]
+    end = datetime.now()
+    span = timedelta(days=365 * years).total_seconds()
+    tickets, events = [], []
+    for name in names:
+        for n in range(int(tickets_per_asset_year * years)):
+            title, body, resolution = rng.choice(ISSUES)
+            opened = end - timedelta(seconds=rng.uniform(0, span))
+            tickets.append({"ticket_id": f"{name}-{n}", "asset": name, "opened_at": opened.isoformat(timespec="seconds"),
+                            "closed_at": (opened + timedelta(hours=rng.uniform(2, 72))).isoformat(timespec="seconds"),
+                            "title": title, "description": body, "resolution": resolution})
+        for n in range(int(events_per_asset_year * years)):
+            at = end - timedelta(seconds=rng.uniform(0, span))
+            events.append({"timestamp": at.isoformat(timespec="seconds"), "asset": name,
+                           "sensor": rng.choice(["vibration", "supply_temp", "pressure"]),
+                           "value": rng.uniform(10, 90), "mean": 50.0, "z": rng.choice((-1, 1)) * rng.uniform(4, 9),
+                           "low": 40.0, "high": 60.0})
+    return names, tickets, events
+
+
+def bench_retrieve(years=5, assets=200, queries=2000, seed=0):
+    names, tickets, events = generate_history(years, assets, seed=seed)
+    rng = random.Random(seed)
+    questions = [f"why did {rng.choice(names)} {rng.choice(['vibrate', 'overheat', 'trip', 'lose pressure'])} "
+                 f"{rng.choice(['last night', 'last week', 'again'])}" for _ in range(queries)]
+    results = {"tickets": len(tickets), "events": len(events)}
+    with tempfile.TemporaryDirectory() as tmp:
+        tickets_path = os.path.join(tmp, "tickets.jsonl")
+        events_path = os.path.join(tmp, "events.jsonl")
+        for path, rows in ((tickets_path, tickets), (events_path, events)):
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+        store = KnowledgeStore(os.path.join(tmp, "knowledge.sqlite3"))
+        start = time.perf_counter()
+        store.load_tickets(tickets_path)
+        store.load_events(events_path)
+        store.optimize()
+        elapsed = time.perf_counter() - start
+        results["load"] = {"seconds": round(elapsed, 2), "rows_per_second": round((len(tickets) + len(events)) / elapsed)}
+
+        def latencies(func, sample, cold=False):
+            samples = []
+            for question in sample:
+                if cold:
+                    store._cache.clear()
+                t0 = time.perf_counter()
+                func(question)
+                samples.append((time.perf_counter() - t0) * 1000)
+            samples.sort()
+            return {"p50_ms": round(statistics.median(samples), 3),
+                    "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 3)}
+
+        def search(question):
+            asset = suggestor_engine.extract_asset(question)
+            store.search(asset, search_terms(question, asset), None, None, 5, kind="ticket")
+
+        # Cold: every lookup goes to SQLite.  Cached: a working set that fits the LRU
+        hot = questions[:100] * (len(questions) // 100 or 1)
+        results["search_cold"] = latencies(search, questions, cold=True)
+        results["search_cached"] = latencies(search, hot)
+        results["investigate_cold"] = latencies(lambda q: suggestor_engine.investigate_response(q, store),
+                                                questions, cold=True)
+        store.close()
+    print(f"📥 {results['tickets']:,} tickets + {results['events']:,} events loaded at "
+          f"{results['load']['rows_per_second']:,} rows/s")
+    for name in ("search_cold", "search_cached", "investigate_cold"):
+        print(f"⏱️  {name:24s} p50 {results[name]['p50_ms']:.3f} ms  p99 {results[name]['p99_ms']:.3f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Smart Suggestor benchmarks")
+    parser.add_argument("benchmark", choices=["classify", "detect", "retrieve", "all"])
+    parser.add_argument("--queries", type=int, default=50000, help="queries classified per run")
+    parser.add_argument("--batch-size", type=int, default=1024, help="batch size for the streaming classifier")
+    parser.add_argument("--readings", type=int, default=500000, help="sensor readings processed per run")
+    parser.add_argument("--sensors", type=int, default=2000, help="distinct sensors in the generated feed")
+    parser.add_argument("--years", type=float, default=5, help="years of generated maintenance history")
+    parser.add_argument("--assets", type=int, default=200, help="assets in the generated history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = {"python": platform.python_version()}
+    if args.benchmark in ("classify", "all"):
+        results["classify"] = bench_classify(args.queries, args.batch_size, args.seed)
+    if args.benchmark in ("detect", "all"):
+        results["detect"] = bench_detect(args.readings, args.sensors, seed=args.seed)
+    if args.benchmark in ("retrieve", "all"):
+        results["retrieve"] = bench_retrieve(args.years, args.assets, seed=args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+# knowledge_store.py - Maintenance history for the Investigate and Evaluate answers
+"""
+A local SQLite store of maintenance tickets and sensor events.
+
+* ``history`` holds both kinds of record, indexed by (asset, time) and
+  (asset, kind, time) so "the last N things that happened to Pump A" and
+  "how many anomalies did it have in March" are index range scans.
+* ``history_fts`` is an FTS5 index over ticket titles, descriptions and
+  resolutions.  The normalised asset name is indexed too, so a search for
+  one asset is an FTS intersection rather than a scan-then-filter.
+* ``search`` results are kept in a small LRU cache, keyed on the store's
+  write generation and ``PRAGMA data_version``, so repeated questions skip
+  SQLite entirely and writes from any process invalidate the cache.
+
+Tickets are bulk-loaded from CSV or JSONL; sensor events come from the
+alerts ``sensor_stream`` raises (live, or its ``--json`` output).
+
+    python knowledge_store.py load-tickets tickets.csv
+    python knowledge_store.py load-events alerts.jsonl
+    python knowledge_store.py search --asset "Pump A" vibration
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sensor_stream import asset_key
+
+KNOWLEDGE_DB = os.environ.get('KNOWLEDGE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          'knowledge.sqlite3'))
+KNOWLEDGE_CACHE_SIZE = int(os.environ.get('KNOWLEDGE_CACHE_SIZE', '512'))
+KNOWLEDGE_LOAD_BATCH = int(os.environ.get('KNOWLEDGE_LOAD_BATCH', '5000'))
+
+TICKET_FIELDS = {
+    'source_ref': ('ticket_id', 'id', 'ticket', 'ref'),
+    'asset': ('asset', 'asset_id', 'equipment', 'device'),
+    'occurred_at': ('opened_at', 'created_at', 'date', 'timestamp', 'reported_at'),
+    'closed_at': ('closed_at', 'resolved_at', 'completed_at'),
+    'title': ('title', 'summary', 'subject', 'issue'),
+    'body': ('description', 'details', 'body', 'notes'),
+    'resolution': ('resolution', 'action', 'fix', 'action_taken'),
+}
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can did do does for from had has have how i in is it its last me
+my night of on or our the this that to was were what when where which who why will with yesterday
+today week month year days again any show tell about ago
+""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source_ref TEXT,
+    asset TEXT NOT NULL,
+    asset_key TEXT NOT NULL,
+    occurred_at TEXT NOT NULL,
+    closed_at TEXT,
+    title TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL DEFAULT '',
+    resolution TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, source_ref)
+);
+CREATE INDEX IF NOT EXISTS idx_history_asset_time ON history(asset_key, occurred_at);
+CREATE INDEX IF NOT EXISTS idx_history_asset_kind_time ON history(asset_key, kind, occurred_at);
+CREATE INDEX IF NOT EXISTS idx_history_time ON history(occurred_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    asset_key, title, body, resolution,
+    content='history', content_rowid='id', tokenize='porter unicode61'
+);
+-- Only tickets are indexed: sensor events are found by asset and time, and
+-- their repetitive titles would make every common word's doclist (which
+-- bm25 walks for its IDF) grow with the sensor feed.  New tickets are indexed
+-- by KnowledgeStore._write, one INSERT ... SELECT per batch (several times
+-- faster than a per-row trigger); updates and deletes go through triggers.
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history WHEN old.kind = 'ticket' BEGIN
+    INSERT INTO history_fts(history_fts, rowid, asset_key, title, body, resolution)
+    VALUES ('delete', old.id, old.asset_key, old.title, old.body, old.resolution);
+END;
+CREATE TRIGGER IF NOT EXISTS history_au AFTER UPDATE ON history WHEN old.kind = 'ticket' BEGIN
+    INSERT INTO history_fts(history_fts, rowid, asset_key, title, body, resolution)
+    VALUES ('delete', old.id, old.asset_key, old.title, old.body, old.resolution);
+    INSERT INTO history_fts(rowid, asset_key, title, body, resolution)
+    VALUES (new.id, new.asset_key, new.title, new.body, new.resolution);
+END;
+"""
+
+UPSERT_SQL = """
+INSERT INTO history (kind, source_ref, asset, asset_key, occurred_at, closed_at, title, body, resolution)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (kind, source_ref) DO UPDATE SET
+    asset = excluded.asset, asset_key = excluded.asset_key, occurred_at = excluded.occurred_at,
+    closed_at = excluded.closed_at, title = excluded.title, body = excluded.body,
+    resolution = excluded.resolution
+"""
+
+INDEX_NEW_SQL = """
+INSERT INTO history_fts(rowid, asset_key, title, body, resolution)
+SELECT id, asset_key, title, body, resolution FROM history WHERE id > ? AND kind = 'ticket'
+"""
+
+COLUMNS = ('id', 'kind', 'source_ref', 'asset', 'occurred_at', 'closed_at', 'title', 'body', 'resolution')
+TERM_RE = re.compile(r"[a-z0-9]+")
+RELATIVE_RE = re.compile(r"\b(?:last|past)\s+(\d+\s+)?(night|day|week|month|quarter|year)s?\b|\byesterday\b|\btoday\b")
+PERIOD_DAYS = {'night': 1, 'day': 1, 'week': 7, 'month': 30, 'quarter': 92, 'year': 365}
+
+
+def normalize_time(value):
+    """ISO-8601 text (seconds precision) for anything ``fromisoformat`` reads; other text unchanged."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).replace(tzinfo=None).isoformat(timespec='seconds')
+    except ValueError:
+        return text
+
+
+def time_window(query, now=None):
+    """``(since, until)`` ISO bounds for phrases like "last night" or "past 3 weeks", else (None, None)."""
+    m = RELATIVE_RE.search(query.lower())
+    if m is None:
+        return None, None
+    now = now or datetime.now()
+    if m.group(0) == 'today':
+        since = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif m.group(0) == 'yesterday':
+        since = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        since = now - timedelta(days=int(m.group(1) or 1) * PERIOD_DAYS[m.group(2)])
+    return since.isoformat(timespec='seconds'), None
+
+
+def search_terms(query, asset=None):
+    """Content words of ``query``, minus stopwords and the asset's own name."""
+    skip = set(TERM_RE.findall(asset.lower())) if asset else set()
+    terms = []
+    for term in TERM_RE.findall(query.lower()):
+        if len(term) > 2 and term not in STOPWORDS and term not in skip and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _fts_query(terms, key=None):
+    # Quoting every term keeps user text from being read as FTS5 syntax
+    match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    if key:
+        return f'asset_key:"{key}" AND ({match})' if match else f'asset_key:"{key}"'
+    return match
+
+
+class KnowledgeStore:
+    def __init__(self, path=None):
+        self.path = path or KNOWLEDGE_DB
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._generation = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Loading --------------------------------------------------------
+
+    def _write(self, rows):
+        """Upsert ``history`` tuples in batches, each batch one transaction; returns the row count."""
+        rows = iter(rows)
+        total = 0
+        while True:
+            batch = list(islice(rows, KNOWLEDGE_LOAD_BATCH))
+            if not batch:
+                break
+            # One row per (kind, source_ref), the last one winning: a key repeated
+            # within a batch would update a row INDEX_NEW_SQL has not indexed yet,
+            # and history_au would then 'delete' it from history_fts
+            batch = list({row[:2]: row for row in batch}.values())
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    # Rowids only grow, so everything past the old maximum is new
+                    last_id = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM history').fetchone()[0]
+                    self._conn.executemany(UPSERT_SQL, batch)
+                    self._conn.execute(INDEX_NEW_SQL, (last_id,))
+                    self._conn.execute('COMMIT')
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                self._generation += 1
+                self._cache.clear()
+            total += len(batch)
+        return total
+
+    def add_ticket(self, asset, occurred_at, title, body='', resolution='', closed_at=None, source_ref=None):
+        return self._write([_ticket_row(source_ref, asset, occurred_at, closed_at, title, body, resolution)])
+
+    def record_alert(self, alert):
+        """Store a ``sensor_stream.Alert`` (or its ``to_dict()``) as a sensor event."""
+        return self._write([_event_row(alert if isinstance(alert, dict) else alert.to_dict())])
+
+    def load_tickets(self, path, fmt=None):
+        """Bulk-load tickets from CSV or JSONL; rows with the same ticket id replace earlier ones."""
+        fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        with open(path, encoding='utf-8', newline='') as f:
+            records = csv.DictReader(f) if fmt == 'csv' else (json.loads(line) for line in f if line.strip())
+            return self._write(_ticket_rows(records))
+
+    def load_events(self, path):
+        """Bulk-load sensor events from ``sensor_stream.py --json`` output."""
+        with open(path, encoding='utf-8') as f:
+            return self._write(_event_row(json.loads(line)) for line in f if line.strip())
+
+    def optimize(self):
+        with self._lock:
+            self._conn.execute("INSERT INTO history_fts(history_fts) VALUES ('optimize')")
+            self._conn.execute('ANALYZE')
+
+    # --- Retrieval ------------------------------------------------------
+
+    def _cached(self, key, compute):
+        with self._lock:
+            # data_version moves when another connection commits
+            version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            key = (self._generation, version) + key
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+            result = compute()
+            self._cache[key] = result
+            if len(self._cache) > KNOWLEDGE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return result
+
+    def search(self, asset=None, terms=(), since=None, until=None, k=5, kind=None):
+        """Top-``k`` history rows for ``asset`` (any asset when None) in [since, until).
+
+        With ``terms`` tickets are ranked by FTS5 relevance (sensor events are
+        not text-indexed), otherwise rows of any kind come back newest first.
+        Returns a tuple of dicts; treat them as read-only, they are shared via the cache.
+        """
+        key = asset_key(asset) if asset else None
+        terms = tuple(terms)
+        return self._cached(('search', key, terms, since, until, k, kind),
+                            lambda: self._search(key, terms, since, until, k, kind))
+
+    def _search(self, key, terms, since, until, k, kind):
+        where, params = [], []
+        if since:
+            where.append('h.occurred_at >= ?')
+            params.append(since)
+        if until:
+            where.append('h.occurred_at < ?')
+            params.append(until)
+        if kind:
+            where.append('h.kind = ?')
+            params.append(kind)
+        cols = ', '.join(f'h.{c}' for c in COLUMNS)
+        if terms:
+            sql = (f"SELECT {cols} FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+                   f"WHERE history_fts MATCH ?{''.join(' AND ' + w for w in where)} "
+                   f"ORDER BY bm25(history_fts, 0.0, 4.0, 1.0, 2.0), h.occurred_at DESC LIMIT ?")
+            params = [_fts_query(terms, key)] + params
+        else:
+            if key:
+                where.insert(0, 'h.asset_key = ?')
+                params.insert(0, key)
+            sql = (f"SELECT {cols} FROM history h{' WHERE ' + ' AND '.join(where) if where else ''} "
+                   f"ORDER BY h.occurred_at DESC LIMIT ?")
+        return tuple(dict(row) for row in self._conn.execute(sql, params + [k]))
+
+    def count(self, asset, since=None, until=None, kind='event'):
+        """Rows for ``asset`` of ``kind`` in [since, until), from the (asset, kind, time) index."""
+        def compute():
+            sql = 'SELECT COUNT(*) FROM history WHERE asset_key = ? AND kind = ?'
+            params = [asset_key(asset), kind]
+            if since:
+                sql += ' AND occurred_at >= ?'
+                params.append(since)
+            if until:
+                sql += ' AND occurred_at < ?'
+                params.append(until)
+            return self._conn.execute(sql, params).fetchone()[0]
+        return self._cached(('count', asset_key(asset), since, until, kind), compute)
+
+    def last_maintenance(self, asset=None):
+        """Most recent ticket that records a resolution, for ``asset`` or any asset; None if there is none."""
+        def compute():
+            sql = f"SELECT {', '.join(COLUMNS)} FROM history WHERE kind = 'ticket' AND resolution != ''"
+            params = ()
+            if asset:
+                sql += ' AND asset_key = ?'
+                params = (asset_key(asset),)
+            row = self._conn.execute(sql + ' ORDER BY occurred_at DESC LIMIT 1', params).fetchone()
+            return dict(row) if row else None
+        return self._cached(('last_maintenance', asset_key(asset) if asset else None), compute)
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT kind, COUNT(*), COUNT(DISTINCT asset_key), MIN(occurred_at), '
+                                      'MAX(occurred_at) FROM history GROUP BY kind').fetchall()
+        return {kind: {'rows': n, 'assets': assets, 'from': first, 'to': last}
+                for kind, n, assets, first, last in rows}
+
+
+def _pick(record, aliases):
+    for alias in aliases:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _event_row(alert):
+    occurred_at = normalize_time(alert.get('timestamp'))
+    if occurred_at is None or not occurred_at[:4].isdigit():
+        # Sensor logs without real timestamps are dated when the alert is stored
+        occurred_at = normalize_time(datetime.now())
+    sensor, z = alert['sensor'], alert['z']
+    title = f"{sensor} {'high' if z > 0 else 'low'} anomaly"
+    body = (f"{sensor} read {alert['value']:g}, usual {alert['low']:g}-{alert['high']:g}, "
+            f"mean {alert['mean']:g}, z={z:+.1f}")
+    return ('event', f"{alert['asset']}|{sensor}|{occurred_at}", alert['asset'], asset_key(alert['asset']),
+            occurred_at, None, title, body, '')
+
+
+def _ticket_row(ref, asset, occurred_at, closed_at, title, body, resolution):
+    occurred_at = normalize_time(occurred_at)
+    # Tickets without an id are keyed on what identifies them, so reloading a file replaces them
+    ref = str(ref) if ref is not None else f"{asset}|{occurred_at}|{title}"
+    return ('ticket', ref, asset, asset_key(asset), occurred_at, normalize_time(closed_at), title, body, resolution)
+
+
+def _ticket_rows(records):
+    for record in records:
+        record = {str(k).lower().strip(): v for k, v in record.items() if k is not None}
+        fields = {field: _pick(record, aliases) for field, aliases in TICKET_FIELDS.items()}
+        if not fields['asset'] or not fields['occurred_at']:
+            continue
+        yield _ticket_row(fields['source_ref'], str(fields['asset']), fields['occurred_at'], fields['closed_at'],
+                          fields['title'] or '', fields['body'] or '', fields['resolution'] or '')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_knowledge_store(path=None, create=False):
+    """The shared store (``KNOWLEDGE_DB`` unless another ``path`` was opened first).
+
+    Returns None when the database does not exist and ``create`` is false,
+    so nothing is written until history has actually been loaded.
+    """
+    global _store
+    with _store_lock:
+        if path is None and _store is not None:
+            return _store
+        path = path or KNOWLEDGE_DB
+        if _store is None or _store.path != path:
+            if not create and not os.path.exists(path):
+                return None
+            _store = KnowledgeStore(path)
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintenance history store for the Smart Suggestor')
+    parser.add_argument('--db', default=None, help='database file (default: KNOWLEDGE_DB)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('load-tickets', help='bulk-load tickets from CSV or JSONL')
+    p.add_argument('path')
+    p.add_argument('--format', choices=['csv', 'jsonl'], default=None)
+    p = sub.add_parser('load-events', help='load alerts written by sensor_stream.py --json')
+    p.add_argument('path')
+    p = sub.add_parser('search', help='top-k history for an asset and/or text')
+    p.add_argument('text', nargs='*')
+    p.add_argument('--asset')
+    p.add_argument('--since')
+    p.add_argument('--until')
+    p.add_argument('-k', type=int, default=5)
+    sub.add_parser('stats', help='row counts and date range per kind')
+    sub.add_parser('optimize', help='merge FTS segments and refresh planner statistics')
+    args = parser.parse_args()
+
+    store = KnowledgeStore(args.db)
+    start = time.perf_counter()
+    if args.command == 'load-tickets':
+        n = store.load_tickets(args.path, args.format)
+        store.optimize()
+        print(f"📥 Loaded {n:,} tickets in {time.perf_counter() - start:.1f}s")
+    elif args.command == 'load-events':
+        n = store.load_events(args.path)
+        print(f"📥 Loaded {n:,} sensor events in {time.perf_counter() - start:.1f}s")
+    elif args.command == 'search':
+        terms = search_terms(' '.join(args.text), args.asset)
+        rows = store.search(args.asset, terms, normalize_time(args.since), normalize_time(args.until), args.k)
+        for row in rows:
+            print(f"{row['occurred_at'][:10]}  {row['kind']:6s} {row['asset']}: {row['title']}"
+                  + (f" -> {row['resolution']}" if row['resolution'] else ""))
+        print(f"🔎 {len(rows)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+    elif args.command == 'stats':
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == 'optimize':
+        store.optimize()
+        print("✅ Optimized")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+# sensor_stream.py - Streaming anomaly detection over sensor logs
+"""
+Reads sensor readings from CSV or JSONL (a file, stdin, or a file that is
+still being written with ``--follow``) through a chain of generators and
+flags readings that break from each sensor's recent behaviour.
+
+State per (asset, sensor) is fixed-size however long the stream runs:
+
+* exponentially weighted mean and second moment -> EWMA and z-score
+* a bounded ring buffer of recent values -> rolling quantiles (the "usual
+  range" quoted in alerts, and a second check so a near-constant sensor
+  does not alert on noise)
+
+A reading is an anomaly when |z| >= ``z_threshold`` *and* it lies outside
+the rolling [low, high] quantile band.  With NumPy the stream is cut into
+batches, and each sensor's slice of a batch that is long enough (a
+high-rate sensor, or a file replayed in bulk) is scored and folded into its
+state in one vectorised step.  Every reading in the slice is scored against
+the EWMA and quantile band as they stood just before it, so alerts do not
+depend on the batch size (up to floating-point rounding).  Short slices,
+and everything when NumPy is missing or ``batch_size=1``, are handled one
+reading at a time; so are whole batches while the feed has too many sensors
+for their slices to reach ``SENSOR_MIN_WINDOW``.
+
+Input columns (CSV header or JSONL keys): ``timestamp``, ``asset``,
+``sensor`` and ``value``; common aliases such as ``ts``, ``equipment``,
+``point`` or ``reading`` are accepted too.
+
+    python sensor_stream.py readings.csv
+    tail -f bms.jsonl | python sensor_stream.py - --format jsonl
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SENSOR_EWMA_ALPHA = float(os.environ.get('SENSOR_EWMA_ALPHA', '0.05'))
+SENSOR_Z_THRESHOLD = float(os.environ.get('SENSOR_Z_THRESHOLD', '4.0'))
+# Readings a sensor needs before it can raise alerts
+SENSOR_WARMUP = int(os.environ.get('SENSOR_WARMUP', '30'))
+# Values kept per sensor for the rolling quantiles
+SENSOR_QUANTILE_WINDOW = int(os.environ.get('SENSOR_QUANTILE_WINDOW', '128'))
+SENSOR_QUANTILES = (0.05, 0.5, 0.95)
+# Readings of the same sensor to stay quiet for after an alert
+SENSOR_ALERT_COOLDOWN = int(os.environ.get('SENSOR_ALERT_COOLDOWN', '20'))
+SENSOR_BATCH_SIZE = int(os.environ.get('SENSOR_BATCH_SIZE', '4096'))
+# A sensor's slice of a batch is scored with NumPy only when it is at least
+# this long; shorter slices are cheaper one reading at a time
+SENSOR_MIN_WINDOW = int(os.environ.get('SENSOR_MIN_WINDOW', '64'))
+# Batches handled one reading at a time before grouping by sensor is tried
+# again, once a grouped batch showed the slices were mostly too short
+REGROUP_EVERY = 16
+
+FIELD_ALIASES = {
+    'timestamp': ('timestamp', 'ts', 'time', 'datetime'),
+    'asset': ('asset', 'asset_id', 'equipment', 'device'),
+    'sensor': ('sensor', 'metric', 'point', 'tag'),
+    'value': ('value', 'reading', 'val'),
+}
+
+Reading = namedtuple('Reading', 'timestamp asset sensor value')
+
+
+def asset_key(name):
+    """Loose form of an asset name for matching ("HVAC Unit 3" == "hvac-unit-3")."""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+# --- Reading pipeline -------------------------------------------------------
+
+def follow_lines(f, poll_interval=0.5, stop=None):
+    """Yield lines from ``f``, then keep yielding lines appended to it (``tail -f``)."""
+    partial = ''
+    while stop is None or not stop.is_set():
+        line = f.readline()
+        if not line:
+            time.sleep(poll_interval)
+            continue
+        partial += line
+        if partial.endswith('\n'):
+            yield partial
+            partial = ''
+
+
+def _resolve_fields(keys):
+    fields = {}
+    lowered = {k.lower().strip(): k for k in keys}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                fields[field] = lowered[alias]
+                break
+    missing = {'asset', 'value'} - fields.keys()
+    if missing:
+        raise ValueError(f"Sensor log has no {', '.join(sorted(missing))} column (got {', '.join(keys)})")
+    return fields
+
+
+def parse_csv(lines):
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if header is None:
+        return
+    fields = _resolve_fields(header)
+    index = {field: header.index(name) for field, name in fields.items()}
+    ts_i, sensor_i = index.get('timestamp'), index.get('sensor')
+    asset_i, value_i = index['asset'], index['value']
+    for row in rows:
+        try:
+            value = float(row[value_i])
+        except (IndexError, ValueError):
+            continue
+        yield Reading(row[ts_i] if ts_i is not None else None, row[asset_i],
+                      row[sensor_i] if sensor_i is not None else 'value', value)
+
+
+def parse_jsonl(lines):
+    fields = None
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if fields is None:
+                fields = _resolve_fields(record.keys())
+            value = float(record[fields['value']])
+        except (ValueError, KeyError, TypeError):
+            if fields is None:
+                raise
+            continue
+        yield Reading(record.get(fields.get('timestamp')), str(record[fields['asset']]),
+                      str(record.get(fields.get('sensor'), 'value')), value)
+
+
+def read_readings(lines, fmt='csv'):
+    return parse_jsonl(lines) if fmt == 'jsonl' else parse_csv(lines)
+
+
+def guess_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def drop_non_finite(readings):
+    return (r for r in readings if math.isfinite(r.value))
+
+
+# --- Detection --------------------------------------------------------------
+
+class Alert:
+    __slots__ = ('timestamp', 'asset', 'sensor', 'value', 'mean', 'z', 'low', 'high')
+
+    def __init__(self, timestamp, asset, sensor, value, mean, z, low, high):
+        self.timestamp = timestamp
+        self.asset = asset
+        self.sensor = sensor
+        self.value = value
+        self.mean = mean
+        self.z = z
+        self.low = low
+        self.high = high
+
+    def describe(self):
+        when = f" at {self.timestamp}" if self.timestamp else ""
+        direction = "above" if self.z > 0 else "below"
+        return (f"{self.sensor} on {self.asset} read {self.value:g}{when}, {direction} its usual "
+                f"{self.low:g}–{self.high:g} (z={self.z:+.1f})")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"<Alert {self.asset}/{self.sensor} {self.value:g} z={self.z:+.1f}>"
+
+
+def _quantile(sorted_values, p):
+    # Linear interpolation, as numpy.quantile's default
+    pos = (len(sorted_values) - 1) * p
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _quantiles(values, ps=SENSOR_QUANTILES):
+    if not values:
+        return tuple(math.nan for _ in ps)
+    values = sorted(values)
+    return tuple(_quantile(values, p) for p in ps)
+
+
+class SensorState:
+    """Rolling statistics for one (asset, sensor) pair."""
+    __slots__ = ('count', 'mean', 'sq', 'recent', 'quiet_until')
+
+    def __init__(self, window=SENSOR_QUANTILE_WINDOW):
+        self.count = 0
+        self.mean = 0.0
+        self.sq = 0.0
+        self.recent = deque(maxlen=window)
+        self.quiet_until = 0
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.sq - self.mean * self.mean, 0.0))
+
+    def quantiles(self, ps=SENSOR_QUANTILES):
+        return _quantiles(self.recent, ps)
+
+    def zscore(self, x):
+        std = self.std
+        if std > 0:
+            return (x - self.mean) / std
+        return 0.0 if x == self.mean else math.copysign(math.inf, x - self.mean)
+
+    def add(self, x, alpha):
+        if self.count:
+            self.mean += alpha * (x - self.mean)
+            self.sq += alpha * (x * x - self.sq)
+        else:
+            self.mean, self.sq = x, x * x
+        self.count += 1
+        self.recent.append(x)
+
+    def add_window(self, xs, alpha):
+        """Fold an array of values in as ``add`` would, one at a time; needs 0 < alpha < 1.
+
+        Returns ``(z, means)``: each value's ``zscore`` and the mean it was
+        scored against, i.e. the state just before that value was added.
+        """
+        n = len(xs)
+        d = 1.0 - alpha
+        means = np.empty(n)
+        sqs = np.empty(n)
+        # Before value k of a chunk, mean_k = d^k * (mean_0 + sum_{j<k} alpha * d^-(j+1) * x_j).
+        # Chunks stay short enough that d^-k cannot overflow
+        step = max(1, int(200.0 / -math.log(d)))
+        mean, sq = self.mean, self.sq
+        for start in range(0, n, step):
+            chunk = xs[start:start + step]
+            powers = d ** np.arange(len(chunk) + 1, dtype=np.float64)
+            weights = alpha / powers[1:]
+            m = powers * (mean + np.concatenate(([0.0], np.cumsum(weights * chunk))))
+            q = powers * (sq + np.concatenate(([0.0], np.cumsum(weights * chunk * chunk))))
+            means[start:start + len(chunk)] = m[:-1]
+            sqs[start:start + len(chunk)] = q[:-1]
+            mean, sq = float(m[-1]), float(q[-1])
+        self.mean, self.sq = mean, sq
+        self.count += n
+        self.recent.extend(xs[-self.recent.maxlen:].tolist())
+        std = np.sqrt(np.maximum(sqs - means * means, 0.0))
+        diff = xs - means
+        z = np.where(std > 0, diff / std, np.where(diff == 0, 0.0, np.copysign(np.inf, diff)))
+        return z, means
+
+
+class AnomalyDetector:
+    """Keeps a ``SensorState`` per (asset, sensor) and turns readings into ``Alert``s."""
+
+    def __init__(self, alpha=SENSOR_EWMA_ALPHA, z_threshold=SENSOR_Z_THRESHOLD, warmup=SENSOR_WARMUP,
+                 window=SENSOR_QUANTILE_WINDOW, cooldown=SENSOR_ALERT_COOLDOWN):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = max(warmup, 2)
+        self.window = window
+        self.cooldown = cooldown
+        self.states = {}
+        self.readings = 0
+        # Whether the last batch grouped by sensor was mostly scored with NumPy
+        self.grouping_pays = True
+
+    def _state(self, key):
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = SensorState(self.window)
+        return state
+
+    def _check(self, state, reading, z, position, band, mean):
+        """Alert for ``reading`` (the sensor's ``position``-th value) if it is outside the band."""
+        if position < state.quiet_until:
+            return None
+        low, _, high = band
+        if low <= reading.value <= high:
+            return None
+        state.quiet_until = position + self.cooldown
+        return Alert(reading.timestamp, reading.asset, reading.sensor, reading.value, mean, z, low, high)
+
+    def update(self, reading):
+        """Process one reading; returns an ``Alert`` or None."""
+        self.readings += 1
+        return self._update_state(self._state((reading.asset, reading.sensor)), reading)
+
+    def _update_state(self, state, reading):
+        alert = None
+        if state.count >= self.warmup:
+            z = state.zscore(reading.value)
+            if abs(z) >= self.z_threshold:
+                alert = self._check(state, reading, z, state.count, state.quantiles(), state.mean)
+        state.add(reading.value, self.alpha)
+        return alert
+
+    def _update_batch(self, batch):
+        """Vectorised pass over one batch; alerts come back in input order."""
+        groups = {}
+        for i, reading in enumerate(batch):
+            groups.setdefault((reading.asset, reading.sensor), []).append(i)
+        alerts = []
+        vectorised = 0
+        for key, indexes in groups.items():
+            state = self._state(key)
+            # Sensors still warming up go one reading at a time so the
+            # baseline is settled before whole windows are scored against it
+            skip = 0
+            while skip < len(indexes) and state.count < self.warmup:
+                state.add(batch[indexes[skip]].value, self.alpha)
+                skip += 1
+            if skip:
+                indexes = indexes[skip:]
+            if len(indexes) < SENSOR_MIN_WINDOW or not 0.0 < self.alpha < 1.0:
+                for i in indexes:
+                    alert = self._update_state(state, batch[i])
+                    if alert is not None:
+                        alerts.append((i, alert))
+                continue
+            vectorised += len(indexes)
+            xs = np.fromiter((batch[i].value for i in indexes), dtype=np.float64, count=len(indexes))
+            position = state.count
+            recent = list(state.recent)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z, means = state.add_window(xs, self.alpha)
+            candidates = np.flatnonzero(np.abs(z) >= self.z_threshold).tolist()
+            # Each reading's band comes from what was in the ring buffer just before it
+            history = recent + xs.tolist() if candidates else recent
+            offset = len(recent)
+            for j in candidates:
+                band = _quantiles(history[max(0, offset + j - self.window):offset + j])
+                alert = self._check(state, batch[indexes[j]], float(z[j]), position + j, band, float(means[j]))
+                if alert is not None:
+                    alerts.append((indexes[j], alert))
+        self.grouping_pays = vectorised * 2 >= len(batch)
+        alerts.sort(key=lambda pair: pair[0])
+        return [alert for _, alert in alerts]
+
+    def process(self, readings, batch_size=SENSOR_BATCH_SIZE):
+        """Yield alerts for an iterable of ``Reading``s."""
+        if np is None or batch_size <= 1:
+            for reading in readings:
+                alert = self.update(reading)
+                if alert is not None:
+                    yield alert
+            return
+        readings = iter(readings)
+        per_reading = 0
+        while True:
+            batch = list(islice(readings, batch_size))
+            if not batch:
+                return
+            self.readings += len(batch)
+            # With thousands of interleaved sensors each gets a few readings per
+            # batch, and grouping them costs more than it saves
+            if self.grouping_pays or per_reading >= REGROUP_EVERY:
+                per_reading = 0
+                yield from self._update_batch(batch)
+                continue
+            per_reading += 1
+            for reading in batch:
+                alert = self._update_state(self._state((reading.asset, reading.sensor)), reading)
+                if alert is not None:
+                    yield alert
+
+    def summary(self):
+        return {'readings': self.readings, 'sensors': len(self.states),
+                'assets': len({asset for asset, _ in self.states})}
+
+
+# --- Live feed for the Discover phase ---------------------------------------
+
+class AlertFeed:
+    """The most recent alerts, shared between the monitor thread and the chat loop."""
+
+    def __init__(self, maxlen=200):
+        self._alerts = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.detector = None
+        self.source = None
+
+    def record(self, alert):
+        with self._lock:
+            self._alerts.append(alert)
+
+    def recent(self, asset=None, limit=5):
+        """Newest first; only alerts for ``asset`` (matched loosely) when given."""
+        key = asset_key(asset) if asset else None
+        with self._lock:
+            alerts = list(self._alerts)
+        out = []
+        for alert in reversed(alerts):
+            if key is None or asset_key(alert.asset) == key:
+                out.append(alert)
+                if len(out) >= limit:
+                    break
+        return out
+
+    def summary(self):
+        return self.detector.summary() if self.detector else {'readings': 0, 'sensors': 0, 'assets': 0}
+
+
+_feed = None
+_thread = None
+_thread_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def get_alert_feed():
+    """The live alert feed, or None when no sensor monitor has been started."""
+    return _feed
+
+
+def _monitor(path, fmt, follow, detector, feed, sinks):
+    try:
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        with f:
+            lines = follow_lines(f, stop=_stop) if follow else f
+            # Small batches while following so alerts are not held back waiting for a full batch
+            batch_size = 1 if follow else SENSOR_BATCH_SIZE
+            for alert in detector.process(drop_non_finite(read_readings(lines, fmt)), batch_size):
+                feed.record(alert)
+                for sink in sinks:
+                    try:
+                        sink(alert)
+                    except Exception as e:
+                        print(f"❌ Could not pass on {alert!r}: {e}")
+    except Exception as e:
+        print(f"❌ Sensor monitor stopped: {e}")
+
+
+def start_background_monitor(path, fmt=None, follow=True, detector=None, sinks=()):
+    """Stream ``path`` through a detector on a daemon thread, feeding ``get_alert_feed()``.
+
+    Each alert is also handed to every callable in ``sinks``.
+    """
+    global _feed, _thread
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return _feed
+        _stop.clear()
+        _feed = AlertFeed()
+        _feed.detector = detector or AnomalyDetector()
+        _feed.source = path
+        _thread = threading.Thread(target=_monitor, name='sensor-monitor', daemon=True,
+                                   args=(path, fmt or guess_format(path), follow, _feed.detector, _feed, tuple(sinks)))
+        _thread.start()
+        return _feed
+
+
+def stop_background_monitor():
+    global _thread
+    _stop.set()
+    with _thread_lock:
+        if _thread is not None:
+            _thread.join(timeout=2)
+        _thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect anomalies in a sensor log')
+    parser.add_argument('path', help="CSV or JSONL readings ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help='input format (default: from the file extension, else csv)')
+    parser.add_argument('--follow', action='store_true', help='keep reading as the file grows')
+    parser.add_argument('--json', action='store_true', help='print alerts as JSON lines')
+    parser.add_argument('--z', type=float, default=SENSOR_Z_THRESHOLD, help='z-score threshold')
+    parser.add_argument('--batch-size', type=int, default=SENSOR_BATCH_SIZE,
+                        help='readings scored per vectorised step (1 = one at a time)')
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.path == '-' else guess_format(args.path))
+    detector = AnomalyDetector(z_threshold=args.z)
+    f = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+    start = time.perf_counter()
+    try:
+        with f:
+            lines = follow_lines(f) if args.follow else f
+            batch_size = 1 if args.follow else args.batch_size
+            for alert in detector.process(drop_non_finite(read_readings(lines, fmt)), batch_size):
+                print(json.dumps(alert.to_dict()) if args.json else f"🚨 {alert.describe()}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    summary = detector.summary()
+    rate = f", {summary['readings'] / elapsed:,.0f} readings/s" if elapsed else ""
+    print(f"📊 {summary['readings']:,} readings from {summary['sensors']} sensors on "
+          f"{summary['assets']} assets{rate}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,52 @@
+import argparse
+import sys
 
+from knowledge_store import get_knowledge_store
+from sensor_stream import get_alert_feed, start_background_monitor
+from suggestor_engine import get_classifier, respond
 
-import random
 
 def classify_phase(query):
-    if "why" in query.lower() or "reason" in query.lower():
-        return "Investigate"
-    elif any(word in query.lower() for word in ["how", "optimize", "reduce", "suggest"]):
-        return "Implement"
-    elif any(word in query.lower() for word in ["impact", "result", "effect", "evaluate"]):
-        return "Evaluate"
-    else:
-        return "Discover"
+    return get_classifier().classify(query)
+
+def classify_many(queries):
+    return get_classifier().classify_many(queries)
 
 def process_query(phase, query):
-    if phase == "Discover":
-        return "🚨 Alert: Anomaly detected in HVAC Unit 3. You can investigate it for deeper insights."
-    elif phase == "Investigate":
-        return ("🔍 Based on past logs, the increase in vibration was due to filter clogging. "
-                "Recommend checking sensor logs and maintenance tickets from last 48 hours.")
-    elif phase == "Implement":
-        return ("🛠️ Suggestion: Schedule a check for Pump A using QR-scan checklist. "
-                "Assign task to on-ground technician via OpsManager.")
-    elif phase == "Evaluate":
-        return ("📈 Evaluation: Your last maintenance action reduced energy usage by 8% "
-                "and improved MTBF. Great job!")
-    else:
-        return "🤖 I'm not sure how to respond. Please rephrase your request."
+    return respond(phase, query, alerts=get_alert_feed(), history=get_knowledge_store())
+
+def classify_file(path):
+    # One query per line, e.g. an exported chat transcript or a log tail
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line, phase in get_classifier().classify_stream(f):
+            print(f"{phase}\t{line}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Smart Suggestor AI (Xempla Prototype)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="classify one query per line from FILE ('-' for stdin) and exit")
+    parser.add_argument("--sensors", metavar="FILE",
+                        help="CSV/JSONL sensor log to watch for anomalies (answers Discover questions)")
+    parser.add_argument("--no-follow", action="store_true",
+                        help="read the sensor log once instead of following it as it grows")
+    parser.add_argument("--history", metavar="DB",
+                        help="maintenance history database (default: KNOWLEDGE_DB, used when it exists)")
+    args = parser.parse_args()
+    if args.batch:
+        classify_file(args.batch)
+        return
+    if args.history:
+        get_knowledge_store(args.history, create=True)
+    if args.sensors:
+        store = get_knowledge_store()
+        # Alerts also go into the maintenance history, so Investigate can cite them
+        start_background_monitor(args.sensors, follow=not args.no_follow,
+                                 sinks=[store.record_alert] if store else ())
+
     print("Welcome to Smart Suggestor AI (Xempla Prototype)")
     print("------------------------------------------------\n")
 
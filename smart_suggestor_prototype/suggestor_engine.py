@@ -0,0 +1,501 @@
+# suggestor_engine.py - Phase classification for the Smart Suggestor
+"""
+Sorts operator queries into Xempla's Discover -> Investigate -> Implement ->
+Evaluate cycle.
+
+Two layers:
+
+* keyword / phrase rules, compiled once into a single regex shaped as a
+  prefix tree.  A query is lowercased once and scanned once; a cue for what
+  is being asked (``PHASE_RULES``) beats a word naming the subject
+  (``TOPIC_RULES``), and ties go to the earlier phase in ``RULE_PRIORITY``.
+  This is slower than the substring chain it replaced: about 45% of its
+  throughput one query at a time and 55-80% through ``classify_many``
+  (``benchmark.py classify``), which is still over 200k queries/s.  The chain
+  was fast because it only looked for ten bare substrings, so "show me
+  the status" counted as a "how" question; word boundaries, phrases and
+  conflict resolution cost the difference.
+* an optional hashed n-gram TF-IDF model (nearest centroid) for queries no
+  rule recognises.  Features are hashed, so there is no vocabulary to keep
+  in sync; scoring a batch is one sparse-times-dense product with NumPy, or
+  a plain dict lookup per feature without it.
+
+``classify_many`` is the batch entry point for chat transcripts and log
+streams; ``classify_stream`` does the same lazily over any iterable.
+"""
+import json
+import math
+import re
+import zlib
+from datetime import datetime, timedelta
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PHASES = ("Discover", "Investigate", "Implement", "Evaluate")
+DEFAULT_PHASE = "Discover"
+# When a query matches several phases at the same level, the first one listed wins
+RULE_PRIORITY = ("Investigate", "Implement", "Evaluate", "Discover")
+
+# Cues that say what the operator is asking for.  A trailing '*' matches any
+# word ending ("evaluat*" -> evaluate, evaluation); everything else must match
+# whole words.  Phrases may contain spaces, and a lone '*' in a phrase skips
+# any words up to the end of the sentence ("did * reduc*" matches "did the
+# repair reduce").
+PHASE_RULES = {
+    "Investigate": ["why", "reason*", "root cause", "cause of", "caused", "diagnos*",
+                    "what happened", "what went wrong"],
+    "Implement": ["how", "suggest*", "recommend*", "assign", "what should", "next step*"],
+    "Evaluate": ["impact*", "result*", "effect*", "evaluat*", "worth", "outcome*", "savings",
+                 "mtbf", "kpi*", "compare*", "before and after", "did * work*", "did * help*",
+                 "did * reduc*", "did * improv*", "did * sav*", "did * fix*"],
+    "Discover": ["status", "overview", "any issues", "what's wrong"],
+}
+# Words that only name the subject ("the repair", "energy reduction"); they
+# decide the phase only when no cue in PHASE_RULES matched, so "evaluate the
+# repair" stays Evaluate
+TOPIC_RULES = {
+    "Investigate": ["spike*", "spiking"],
+    "Implement": ["optimi*", "reduc*", "repair*", "schedule"],
+    "Evaluate": ["improve*"],
+    "Discover": ["anomal*", "alert*", "alarm*", "detect*", "fault*"],
+}
+
+# Labelled examples the default model is fitted on; they cover phrasings the
+# rules miss rather than repeating the keywords
+SEED_EXAMPLES = [
+    ("Discover", "show me what is abnormal right now"),
+    ("Discover", "anything unusual on the chillers today"),
+    ("Discover", "which assets need attention"),
+    ("Discover", "list open issues in building B"),
+    ("Discover", "is AHU 2 running normally"),
+    ("Discover", "what is going on with the boiler"),
+    ("Investigate", "what caused the pressure drop on pump A"),
+    ("Investigate", "where is the vibration coming from"),
+    ("Investigate", "look into the temperature rise last night"),
+    ("Investigate", "when did this start happening"),
+    ("Investigate", "has this failure occurred before"),
+    ("Investigate", "what was done last time"),
+    ("Implement", "create a work order for the cooling tower"),
+    ("Implement", "send a technician to replace the filter"),
+    ("Implement", "can we lower the setpoint overnight"),
+    ("Implement", "plan maintenance for next week"),
+    ("Implement", "raise a ticket to clean the coils"),
+    ("Implement", "change the fan speed to save power"),
+    ("Evaluate", "did the filter change help"),
+    ("Evaluate", "what did we save on energy last month"),
+    ("Evaluate", "was the repair worth it"),
+    ("Evaluate", "is the pump better after servicing"),
+    ("Evaluate", "show the before and after consumption"),
+    ("Evaluate", "track the outcome of last week's work"),
+]
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# Trie node keys: where a keyword ends as a whole word or as a stem, and
+# where a phrase skips ahead to its next word
+WORD_END = 0
+STEM_END = 1
+GAP = 2
+# Skipped words stay within the sentence and are left for the rest of the scan
+GAP_PATTERN = r"\b[^.?!;\n]*?\b"
+
+
+def _trie_pattern(node, count):
+    alternatives = [re.escape(ch) + _trie_pattern(child, count)
+                    for ch, child in sorted((k, v) for k, v in node.items() if isinstance(k, str))]
+    if GAP in node:
+        alternatives.append(f"(?={GAP_PATTERN}{_trie_pattern(node[GAP], count)})")
+    # Longer keywords first, so a phrase is not shadowed by one of its own words
+    for end, suffix in ((WORD_END, r"\b"), (STEM_END, "")):
+        if end in node:
+            phase, level = node[end]
+            count[0] += 1
+            alternatives.append(f"{suffix}(?P<{phase}__{level}_{count[0]}>)")
+    if not alternatives:
+        return "(?!)"
+    return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+
+def compile_rules(rules=None, topics=None):
+    """Build one regex from ``{phase: [keyword, ...]}`` cues and topic words.
+
+    The keywords are merged into a prefix tree, so at each word start the
+    regex follows the query's letters down one branch instead of trying
+    every keyword in turn.  Each keyword ends in an empty group named
+    ``<phase>__<level>_<n>`` (level 0 for cues, 1 for topic words), which
+    becomes the match's ``lastgroup``.
+    """
+    rules = PHASE_RULES if rules is None else rules
+    topics = TOPIC_RULES if topics is None else topics
+    root = {}
+    for level, table in enumerate((rules, topics)):
+        for phase, keywords in table.items():
+            for keyword in keywords:
+                node = root
+                for i, part in enumerate(keyword.split(" * ")):
+                    if i:
+                        node = node.setdefault(GAP, {})
+                    for ch in part.rstrip("*"):
+                        node = node.setdefault(ch, {})
+                # A keyword listed twice keeps its first phase, cues before topic words
+                node.setdefault(STEM_END if keyword.endswith("*") else WORD_END, (phase, level))
+    return re.compile(r"\b" + _trie_pattern(root, [0]))
+
+
+class RuleClassifier:
+    """Keyword rules matched with a single compiled regex.
+
+    A query's phase comes from its strongest match: any cue beats any topic
+    word, and ties go to the phase listed first in ``priority``.
+    """
+
+    def __init__(self, rules=None, topics=None, priority=RULE_PRIORITY):
+        self.pattern = compile_rules(rules, topics)
+        self.priority = tuple(priority)
+        self.rank_of = {}
+        for name, index in self.pattern.groupindex.items():
+            phase, _, tag = name.rpartition("__")
+            level = int(tag.partition("_")[0])
+            self.rank_of[index] = level * len(self.priority) + self.priority.index(phase)
+
+    def match(self, lowered):
+        """Phase of the strongest rule matching ``lowered`` text, or None."""
+        best = None
+        for m in self.pattern.finditer(lowered):
+            rank = self.rank_of[m.lastindex]
+            if not rank:
+                break
+            if best is None or rank < best:
+                best = rank
+        else:
+            return None if best is None else self.priority[best % len(self.priority)]
+        return self.priority[0]
+
+
+def _feature_index(token, n_features):
+    # crc32 rather than hash(): str hashes are salted per process
+    return zlib.crc32(token.encode()) % n_features
+
+
+class HashedNgramModel:
+    """TF-IDF over hashed word n-grams with one centroid per phase.
+
+    Scores are cosine similarities between a query and each phase centroid,
+    so they sit in [0, 1] and ``min_score`` works as a confidence cut-off.
+    """
+
+    def __init__(self, n_features=2 ** 18, ngram_range=(1, 2), min_score=0.1):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.min_score = min_score
+        self.labels = []
+        self.idf = {}
+        self.weights = {}
+        self._dense = None
+
+    def features(self, lowered):
+        """``{feature index: sublinear term frequency}`` for already-lowercased text."""
+        tokens = TOKEN_RE.findall(lowered)
+        counts = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                idx = _feature_index(" ".join(tokens[i:i + n]), self.n_features)
+                counts[idx] = counts.get(idx, 0) + 1
+        return {idx: 1.0 + math.log(c) for idx, c in counts.items()}
+
+    def _tfidf(self, feats):
+        vec = {idx: tf * self.idf[idx] for idx, tf in feats.items() if idx in self.idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {idx: v / norm for idx, v in vec.items()} if norm else {}
+
+    def fit(self, texts, labels):
+        texts = [t.lower() for t in texts]
+        labels = list(labels)
+        self.labels = sorted(set(labels), key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES))
+        feats = [self.features(t) for t in texts]
+        df = {}
+        for f in feats:
+            for idx in f:
+                df[idx] = df.get(idx, 0) + 1
+        n_docs = len(texts)
+        self.idf = {idx: math.log((1 + n_docs) / (1 + d)) + 1.0 for idx, d in df.items()}
+
+        column = {label: i for i, label in enumerate(self.labels)}
+        sums = {}
+        for f, label in zip(feats, labels):
+            c = column[label]
+            for idx, v in self._tfidf(f).items():
+                sums.setdefault(idx, [0.0] * len(self.labels))[c] += v
+        norms = [math.sqrt(sum(row[c] ** 2 for row in sums.values())) or 1.0
+                 for c in range(len(self.labels))]
+        self.weights = {idx: [v / norms[c] for c, v in enumerate(row)] for idx, row in sums.items()}
+        self._dense = None
+        return self
+
+    def _dense_arrays(self):
+        """Dense idf vector and (n_features, n_labels) weight matrix for batched scoring."""
+        if self._dense is None:
+            idf = np.zeros(self.n_features, dtype=np.float32)
+            weights = np.zeros((self.n_features, len(self.labels)), dtype=np.float32)
+            if self.idf:
+                idf[np.fromiter(self.idf.keys(), dtype=np.int64)] = list(self.idf.values())
+            if self.weights:
+                weights[np.fromiter(self.weights.keys(), dtype=np.int64)] = list(self.weights.values())
+            self._dense = (idf, weights)
+        return self._dense
+
+    def scores_many(self, lowered_texts):
+        """One row of per-label cosine scores for each already-lowercased text."""
+        feats = [self.features(t) for t in lowered_texts]
+        if np is None:
+            rows = []
+            for f in feats:
+                row = [0.0] * len(self.labels)
+                for idx, v in self._tfidf(f).items():
+                    w = self.weights.get(idx)
+                    if w is not None:
+                        for c, wc in enumerate(w):
+                            row[c] += v * wc
+                rows.append(row)
+            return rows
+
+        idf, weights = self._dense_arrays()
+        n = len(feats)
+        counts = np.fromiter((len(f) for f in feats), dtype=np.int64, count=n)
+        nnz = int(counts.sum())
+        scores = np.zeros((n, len(self.labels)), dtype=np.float32)
+        if not nnz:
+            return scores
+        cols = np.fromiter((idx for f in feats for idx in f), dtype=np.int64, count=nnz)
+        vals = np.fromiter((tf for f in feats for tf in f.values()), dtype=np.float32, count=nnz)
+        vals *= idf[cols]
+        rows = np.repeat(np.arange(n), counts)
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n)).astype(np.float32)
+        # Features of each text are contiguous, so a segmented sum replaces the sparse product
+        present = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+        scores[present] = np.add.reduceat(weights[cols] * vals[:, None], starts, axis=0)
+        scores /= np.maximum(norms, 1e-12)[:, None]
+        return scores
+
+    def predict_many(self, lowered_texts):
+        """``(label or None, score)`` per text; None when the best score is under ``min_score``."""
+        out = []
+        for row in self.scores_many(lowered_texts):
+            row = list(row)
+            best = max(range(len(row)), key=row.__getitem__) if row else None
+            score = float(row[best]) if best is not None else 0.0
+            out.append((self.labels[best] if score >= self.min_score else None, score))
+        return out
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"n_features": self.n_features, "ngram_range": list(self.ngram_range),
+                       "min_score": self.min_score, "labels": self.labels,
+                       "idf": self.idf, "weights": self.weights}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["n_features"], tuple(data["ngram_range"]), data["min_score"])
+        model.labels = data["labels"]
+        model.idf = {int(k): v for k, v in data["idf"].items()}
+        model.weights = {int(k): v for k, v in data["weights"].items()}
+        return model
+
+
+def train_default_model(extra_examples=()):
+    """Fit the n-gram model on ``SEED_EXAMPLES`` plus any ``(phase, text)`` pairs given."""
+    examples = list(SEED_EXAMPLES) + list(extra_examples)
+    return HashedNgramModel().fit([text for _, text in examples], [phase for phase, _ in examples])
+
+
+class PhaseClassifier:
+    """Rules first, then the n-gram model (if any) for queries no rule matched."""
+
+    def __init__(self, rules=None, model=None, default=DEFAULT_PHASE, topics=None):
+        self.rules = RuleClassifier(rules, topics)
+        self.model = model
+        self.default = default
+
+    def classify(self, query):
+        return self.classify_many([query])[0]
+
+    def classify_many(self, queries):
+        lowered = [q.lower() for q in queries]
+        phases = [self.rules.match(text) for text in lowered]
+        if self.model is not None:
+            pending = [i for i, phase in enumerate(phases) if phase is None]
+            if pending:
+                for i, (label, _) in zip(pending, self.model.predict_many([lowered[i] for i in pending])):
+                    phases[i] = label
+        return [phase or self.default for phase in phases]
+
+    def classify_stream(self, lines, batch_size=1024):
+        """Yield ``(line, phase)`` for an iterable of queries, classified in batches."""
+        lines = iter(lines)
+        while True:
+            batch = [line.rstrip("\n") for line in islice(lines, batch_size)]
+            if not batch:
+                return
+            yield from zip(batch, self.classify_many(batch))
+
+
+_default_classifier = None
+
+
+def get_classifier():
+    """Process-wide classifier with the default rules and seed model, built on first use."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = PhaseClassifier(model=train_default_model())
+    return _default_classifier
+
+
+def classify_many(queries):
+    return get_classifier().classify_many(queries)
+
+
+# Equipment names operators use; the number/letter after the type is optional
+ASSET_RE = re.compile(
+    r"\b(hvac unit|hvac|ahu|air handler|pump|chiller|boiler|cooling tower|compressor|fan|"
+    r"fcu|vav|generator|meter)\b(?:\s*(?:#|no\.?)?\s*([a-z]\b|\d+\b))?")
+ASSET_NAMES = {"hvac": "HVAC", "hvac unit": "HVAC Unit", "ahu": "AHU", "fcu": "FCU", "vav": "VAV"}
+
+# Per-phase answer templates; {asset} falls back to the asset in DEFAULT_ASSETS
+RESPONSES = {
+    "Discover": "🚨 Alert: Anomaly detected in {asset}. You can investigate it for deeper insights.",
+    "Investigate": ("🔍 Based on past logs, the increase in vibration on {asset} was due to filter clogging. "
+                    "Recommend checking sensor logs and maintenance tickets from last 48 hours."),
+    "Implement": ("🛠️ Suggestion: Schedule a check for {asset} using QR-scan checklist. "
+                  "Assign task to on-ground technician via OpsManager."),
+    "Evaluate": ("📈 Evaluation: Your last maintenance action on {asset} reduced energy usage by 8% "
+                 "and improved MTBF. Great job!"),
+}
+DEFAULT_ASSETS = {"Discover": "HVAC Unit 3", "Investigate": "Pump A", "Implement": "Pump A", "Evaluate": "Pump A"}
+FALLBACK_RESPONSE = "🤖 I'm not sure how to respond. Please rephrase your request."
+
+
+def extract_asset(query):
+    """Display name of the first asset mentioned in ``query`` (e.g. "Pump A"), or None."""
+    m = ASSET_RE.search(query.lower())
+    if m is None:
+        return None
+    kind, ident = m.groups()
+    name = ASSET_NAMES.get(kind, kind.title())
+    return f"{name} {ident.upper()}" if ident else name
+
+
+def discover_response(query, feed):
+    """Discover answer from a live ``sensor_stream.AlertFeed``."""
+    asset = extract_asset(query)
+    alerts = feed.recent(asset, limit=3)
+    if alerts:
+        if len(alerts) == 1:
+            return f"🚨 Alert: {alerts[0].describe()}. You can investigate it for deeper insights."
+        listed = "; ".join(alert.describe() for alert in alerts)
+        return f"🚨 Alert: {len(alerts)} recent anomalies - {listed}. You can investigate them for deeper insights."
+    summary = feed.summary()
+    if asset:
+        return f"✅ No anomalies on {asset} in the live sensor feed ({summary['readings']:,} readings so far)."
+    return (f"✅ No anomalies in the live sensor feed ({summary['readings']:,} readings from "
+            f"{summary['assets']} assets so far).")
+
+
+def _days_ago(iso, now):
+    try:
+        return (now - datetime.fromisoformat(iso)).days
+    except (TypeError, ValueError):
+        return None
+
+
+def _plural(n, one, many):
+    return f"{n} {one if n == 1 else many}"
+
+
+def _ticket_line(row):
+    line = f"{row['occurred_at'][:10]} '{row['title']}'"
+    return f"{line} - {row['resolution']}" if row["resolution"] else line
+
+
+def investigate_response(query, store, k=3):
+    """Investigate answer from a ``knowledge_store.KnowledgeStore``: recent events plus similar past tickets."""
+    from knowledge_store import search_terms, time_window
+
+    now = datetime.now()
+    asset = extract_asset(query)
+    terms = search_terms(query, asset)
+    since, until = time_window(query, now)
+    parts = []
+    if asset and since:
+        events = store.search(asset, (), since, until, k, kind="event")
+        if events:
+            parts.append(f"{asset} logged {_plural(len(events), 'sensor anomaly', 'sensor anomalies')}"
+                         f"{' or more' if len(events) == k else ''} since {since[:10]} "
+                         f"(latest: {events[0]['body']}).")
+    similar = store.search(asset, terms, None, since, k, kind="ticket") if terms else ()
+    if not similar:
+        similar = store.search(asset, (), None, None, k, kind="ticket")
+        label = "Recent tickets"
+    else:
+        label = "Based on past logs, similar issues"
+    if similar:
+        parts.append(f"{label}{' on ' + asset if asset else ''}: " + "; ".join(_ticket_line(r) for r in similar) + ".")
+    if asset:
+        last = store.last_maintenance(asset)
+        days = _days_ago(last["occurred_at"], now) if last else None
+        if days is not None:
+            parts.append(f"Last maintenance was {days} days ago.")
+    if not parts:
+        return (f"🔍 No past tickets or sensor events{' for ' + asset if asset else ''} match this in the "
+                f"maintenance history. Recommend checking sensor logs and maintenance tickets from last 48 hours.")
+    return "🔍 " + " ".join(parts)
+
+
+def evaluate_response(query, store, baseline_days=30):
+    """Evaluate answer: anomalies since the asset's last maintenance against the period before it."""
+    now = datetime.now()
+    asset = extract_asset(query)
+    last = store.last_maintenance(asset)
+    if last is None:
+        return f"📈 No completed maintenance on record{' for ' + asset if asset else ''} yet to evaluate."
+    asset = asset or last["asset"]
+    done = last["closed_at"] or last["occurred_at"]
+    try:
+        before_start = (datetime.fromisoformat(done) - timedelta(days=baseline_days)).isoformat(timespec="seconds")
+    except ValueError:
+        return f"📈 Last maintenance on {asset}: {_ticket_line(last)}."
+    after = store.count(asset, since=done)
+    before = store.count(asset, since=before_start, until=done)
+    days = max(_days_ago(done, now) or 0, 1)
+    verdict = ("fewer anomalies since - it looks effective." if after * baseline_days < before * days else
+               "no drop in anomalies yet - worth a follow-up check." if before or after else
+               "no anomalies before or since.")
+    return (f"📈 Evaluation: after {_ticket_line(last)} on {asset}, it logged {_plural(after, 'anomaly', 'anomalies')} "
+            f"in {_plural(days, 'day', 'days')} vs {before} in the {baseline_days} days before: {verdict}")
+
+
+def respond(phase, query, alerts=None, history=None):
+    """Answer for ``phase``.
+
+    ``alerts`` is the live alert feed when a sensor monitor is running and
+    ``history`` the maintenance knowledge store when one has been loaded;
+    without them the canned prototype answers are used.
+    """
+    if phase == "Discover" and alerts is not None:
+        return discover_response(query, alerts)
+    if phase == "Investigate" and history is not None:
+        return investigate_response(query, history)
+    if phase == "Evaluate" and history is not None:
+        return evaluate_response(query, history)
+    template = RESPONSES.get(phase)
+    if template is None:
+        return FALLBACK_RESPONSE
+    return template.format(asset=extract_asset(query) or DEFAULT_ASSETS[phase])
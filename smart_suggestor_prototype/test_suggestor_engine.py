@@ -0,0 +1,69 @@
+# test_suggestor_engine.py - Phase classification of operator queries
+"""
+Pins the rule and seed-model classification of common phrasings, so a new
+keyword cannot quietly move a question into another phase:
+
+    python -m pytest test_suggestor_engine.py
+"""
+import unittest
+
+from suggestor_engine import SEED_EXAMPLES, PhaseClassifier, RuleClassifier, train_default_model
+
+CASES = [
+    ("Evaluate", "evaluate the repair"),
+    ("Evaluate", "what was the impact of the repair on pump A"),
+    ("Evaluate", "did the repair reduce energy use"),
+    ("Evaluate", "effect of the optimization"),
+    ("Evaluate", "did the new schedule help"),
+    ("Evaluate", "was the repair worth it"),
+    ("Investigate", "why did the repair not reduce energy use"),
+    ("Investigate", "what caused the spike on chiller 2"),
+    ("Implement", "how can we optimize pump A runtime"),
+    ("Implement", "schedule a repair for pump A"),
+    ("Implement", "reduce energy use on AHU 4"),
+    ("Implement", "what should we do about the impact on comfort"),
+    ("Discover", "show me the status of boiler 1"),
+    ("Discover", "any anomalies on the cooling tower"),
+]
+
+
+class PhaseClassifierTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.classifier = PhaseClassifier(model=train_default_model())
+
+    def test_common_phrasings(self):
+        for phase, query in CASES:
+            with self.subTest(query=query):
+                self.assertEqual(self.classifier.classify(query), phase)
+
+    def test_seed_examples(self):
+        for phase, query in SEED_EXAMPLES:
+            with self.subTest(query=query):
+                self.assertEqual(self.classifier.classify(query), phase)
+
+    def test_classify_many_matches_classify(self):
+        queries = [query for _, query in CASES + SEED_EXAMPLES]
+        self.assertEqual(self.classifier.classify_many(queries), [self.classifier.classify(q) for q in queries])
+
+
+class RuleClassifierTest(unittest.TestCase):
+    def test_cue_beats_topic_word(self):
+        rules = RuleClassifier({"Evaluate": ["evaluat*"]}, {"Implement": ["repair*"]})
+        self.assertEqual(rules.match("repair the pump"), "Implement")
+        self.assertEqual(rules.match("repairs to evaluate"), "Evaluate")
+
+    def test_priority_breaks_ties(self):
+        rules = RuleClassifier({"Evaluate": ["impact"], "Investigate": ["why"]}, {})
+        self.assertEqual(rules.match("why was the impact so small"), "Investigate")
+
+    def test_whole_words_stems_and_gaps(self):
+        rules = RuleClassifier({"Implement": ["how"], "Evaluate": ["did * help*"]}, {})
+        self.assertIsNone(rules.match("show me the chiller"))
+        self.assertEqual(rules.match("did the new filter help"), "Evaluate")
+        self.assertIsNone(rules.match("did the filter clog. help me find out"))
+        self.assertIsNone(rules.match("nothing matches here"))
+
+
+if __name__ == "__main__":
+    unittest.main()